@@ -0,0 +1,122 @@
+"""
+Test configuration: the server is started on a throwaway experiment database, in a working
+directory holding the test configuration (local toxicity scorer, offline translator).
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix="y_server_tests_")
+
+CONFIG = {
+    "name": "tests",
+    "host": "127.0.0.1",
+    "port": 5010,
+    "reset_db": "True",
+    "modules": [],
+    "perspective_api": None,
+    "database_uri": f"sqlite:///{os.path.join(WORKDIR, 'tests.db')}",
+    "toxicity_scorer": "local",
+    "localize_posts": "True",
+    "translator": "fake",
+}
+
+# the server reads config_files/ from the working directory
+os.makedirs(os.path.join(WORKDIR, "config_files"))
+with open(os.path.join(WORKDIR, "config_files", "exp_config.json"), "w") as f:
+    json.dump(CONFIG, f)
+shutil.copyfile(
+    os.path.join(ROOT, "config_files", "locales.json"), os.path.join(WORKDIR, "config_files", "locales.json")
+)
+os.chdir(WORKDIR)
+sys.path.insert(0, ROOT)
+
+from y_server import app  # noqa: E402
+
+
+class Api(object):
+    """
+    Client of the server routes, with the payloads of the YClient.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    def call(self, path, payload=None, method="post"):
+        """
+        Call a route, checking that it succeeds.
+
+        :param path: the route
+        :param payload: the request data
+        :param method: the HTTP method
+        :return: the decoded json response
+        """
+        response = getattr(self.client, method)(path, data=json.dumps(payload) if payload is not None else None)
+        assert response.status_code == 200, response.data
+        return json.loads(response.data)
+
+    def register(self, name, **fields):
+        """
+        Register a user.
+
+        :param name: the username
+        :return: the user id
+        """
+        data = {
+            "name": name, "email": f"{name}@y.social", "password": "pwd", "leaning": "neutral", "age": 30,
+            "user_type": "user", "oe": "a", "co": "a", "ex": "a", "ag": "a", "ne": "a", "language": "english",
+            "education_level": "high school", "joined_on": 0, "round_actions": 3, "owner": "tests",
+            "gender": "female", "nationality": "italian", "toxicity": "no", "original_id": None,
+            "toxicity_post_avg": 0, "toxicity_post_var": 0, "toxicity_comment": 0, "activity_post": 0,
+            "activity_comment": 0, "susceptibility": 0.5,
+        }
+        data.update(fields)
+        self.call("/register", data)
+        return self.call("/get_user_id", {"username": name})["id"]
+
+    def round(self, day, hour):
+        """
+        Move the simulation to a round.
+
+        :return: the round id
+        """
+        return self.call("/update_time", {"day": day, "round": hour})["id"]
+
+    def post(self, user_id, tid, text="a post about the news", hashtags=(), mentions=(), tgt_language="english"):
+        """
+        Publish a post.
+        """
+        return self.call("/post", {
+            "user_id": user_id, "tweet": text, "emotions": [], "hashtags": list(hashtags),
+            "mentions": list(mentions), "tid": tid, "src_language": "english", "tgt_language": tgt_language,
+        })
+
+    def comment(
+        self, user_id, post_id, tid, text="a comment on the post", hashtags=(), mentions=(), tgt_language="english"
+    ):
+        """
+        Comment on a post.
+        """
+        return self.call("/comment", {
+            "user_id": user_id, "post_id": post_id, "text": text, "emotions": [], "hashtags": list(hashtags),
+            "mentions": list(mentions), "tid": tid, "src_language": "english", "tgt_language": tgt_language,
+        })
+
+
+@pytest.fixture
+def api():
+    """
+    Client of the server, on an experiment emptied after the test.
+    """
+    yield Api(app.test_client())
+    app.test_client().post("/reset")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    os.chdir(ROOT)
+    shutil.rmtree(WORKDIR, ignore_errors=True)
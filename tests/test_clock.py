@@ -0,0 +1,83 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Rounds
+from y_server.utils.clock import SimulationClock, clock
+
+
+@pytest.fixture
+def clocks(tmp_path):
+    """
+    Two clocks mapping the same file, as two server processes would.
+    """
+    first, second = SimulationClock(), SimulationClock()
+    for c in (first, second):
+        c.attach(str(tmp_path / "tests.clock"))
+    yield first, second
+    for c in (first, second):
+        c.detach()
+
+
+def test_rounds_follow_the_database(api):
+    first = api.call("/current_time", method="get")
+    assert (first["day"], first["round"]) == (0, 0)
+    tid = api.round(0, 3)
+    assert api.round(0, 3) == tid
+    api.round(0, 1)
+
+    with app.app_context():
+        latest = Rounds.query.order_by(Rounds.id.desc()).first()
+    # an older round does not move the clock back
+    assert clock.current() == {"id": latest.id, "day": 0, "hour": 1}
+    assert not clock.advance(tid, 0, 3)
+
+    # the clock reloaded from the database
+    clock.reset()
+    with app.app_context():
+        assert clock.current() == {"id": latest.id, "day": 0, "hour": 1}
+
+
+def test_processes_share_the_round(clocks):
+    first, second = clocks
+
+    assert first.advance(5, 1, 4)
+    assert second.current() == {"id": 5, "day": 1, "hour": 4}
+    assert not second.advance(4, 1, 3)
+    assert second.advance(6, 1, 5) and first.round_id() == 6
+
+
+def test_processes_see_the_resets_rounds_and_writes_of_the_others(clocks):
+    first, second = clocks
+    calls = []
+    second.subscribe(lambda: calls.append("reset"))
+    second.subscribe(lambda: calls.append("round"), every_round=True)
+    second.subscribe(lambda: calls.append("write"), every_write=True)
+    first.advance(1, 0, 0)
+    second.sync()
+
+    first.written()
+    second.sync()
+    assert calls == ["write"]
+
+    first.advance(2, 0, 1)
+    second.sync()
+    assert calls == ["write", "round"]
+
+    # the writes of the process itself are not reported to it
+    second.written()
+    second.sync()
+    assert calls == ["write", "round"]
+
+    first.reset()
+    second.sync()
+    assert calls == ["write", "round", "reset", "round", "write"]
+    second.sync()
+    assert len(calls) == 5
+
+
+def test_drain_requests_are_shared(clocks):
+    first, second = clocks
+
+    assert first.request_drain() == 1 and second.request_drain() == 2
+    first.reset()
+    assert first.drain_requests() == second.drain_requests() == 2
@@ -0,0 +1,40 @@
+from y_server import app
+from y_server.modals import Post
+
+
+def comments(post_id):
+    with app.app_context():
+        return [post.tweet for post in Post.query.filter_by(comment_to=post_id)]
+
+
+def root_post(api):
+    author = api.register("alice")
+    tid = api.round(0, 0)
+    api.post(author, tid)
+    with app.app_context():
+        return author, tid, Post.query.filter_by(user_id=author).first().id
+
+
+def test_single_word_comment_is_stored(api):
+    author, tid, post_id = root_post(api)
+
+    assert api.comment(author, post_id, tid, text="Agreed")["status"] == 200
+    assert comments(post_id) == ["Agreed"]
+
+
+def test_unknown_mentions_are_dropped(api):
+    author, tid, post_id = root_post(api)
+    api.register("bob")
+
+    assert api.comment(author, post_id, tid, text="fully agree", mentions=["@bob", "@ghost"])["status"] == 200
+    stored = comments(post_id)
+    assert len(stored) == 1
+    assert "@bob" in stored[0] and "@ghost" not in stored[0]
+
+
+def test_comment_left_with_a_single_word_is_not_stored(api):
+    author, tid, post_id = root_post(api)
+
+    res = api.comment(author, post_id, tid, text="Agreed", mentions=["@ghost"])
+    assert res["status"] == 400
+    assert comments(post_id) == []
@@ -0,0 +1,111 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Post
+from y_server.routes.content_management import precompute_feeds
+from y_server.utils.feed_cache import feed_cache
+from y_server.utils.round_jobs import round_pipeline
+
+MODES = {"alice": "rchrono", "bob": "rchrono_popularity", "carol": "rchrono_followers", "dave": "random"}
+
+
+@pytest.fixture
+def feeds(api, monkeypatch):
+    """
+    Users with different recommendation modes, their posts and the feeds precomputed for a new round.
+    """
+    users = {}
+    for name, mode in MODES.items():
+        users[name] = api.register(name)
+        api.call("/update_user", {"username": name, "email": f"{name}@y.social", "recsys_type": mode})
+    tid = api.round(0, 0)
+    for i, uid in enumerate(list(users.values()) * 2):
+        api.post(uid, tid, text=f"post number {i}")
+    with app.app_context():
+        ids = [post.id for post in Post.query.order_by(Post.id)]
+    api.call("/reaction", {"user_id": users["alice"], "post_id": ids[1], "type": "like", "tid": tid})
+    api.call("/follow", {"user_id": users["carol"], "target": users["bob"], "action": "follow", "tid": tid})
+
+    monkeypatch.setitem(app.config, "round_jobs", [{"job": "feeds", "limit": 4, "visibility_rounds": 10}])
+    tid = api.round(0, 1)
+    assert round_pipeline.wait(10)
+    assert feed_cache.metrics()["feeds"] == len(users)
+    return users, tid, ids
+
+
+def read(api, uid, mode):
+    return api.call("/read", {"uid": uid, "mode": mode, "limit": 4, "visibility_rounds": 10})
+
+
+def test_hits_return_the_feeds_of_the_beginning_of_the_round(api, feeds):
+    users, _, _ = feeds
+
+    cached = {name: read(api, uid, MODES[name]) for name, uid in users.items()}
+    assert feed_cache.metrics()["hits"] == len(users)
+
+    # the same feeds computed on the fly, but the random ones
+    feed_cache.reset()
+    live = {name: read(api, uid, MODES[name]) for name, uid in users.items()}
+    assert {name: feed for name, feed in live.items() if name != "dave"} == {
+        name: feed for name, feed in cached.items() if name != "dave"
+    }
+
+
+def test_random_feeds(api, feeds):
+    users, tid, _ = feeds
+    cached = read(api, users["dave"], "random")
+
+    # the precomputed feeds are reproducible
+    with app.app_context():
+        precompute_feeds(tid, limit=4, visibility_rounds=10)
+    assert read(api, users["dave"], "random") == cached
+
+    # the feeds computed on the fly are drawn again at every read
+    feed_cache.reset()
+    live = {tuple(read(api, users["dave"], "random")) for _ in range(5)}
+    assert len(live) > 1
+
+
+def test_new_posts_drop_the_followers_feeds_of_the_followers(api, feeds):
+    users, tid, _ = feeds
+    api.post(users["dave"], tid, text="nobody follows dave")
+    assert feed_cache.metrics()["feeds"] == len(users)
+
+    api.post(users["bob"], tid, text="breaking news")
+    with app.app_context():
+        post_id = Post.query.filter_by(tweet="breaking news").first().id
+
+    assert feed_cache.metrics()["feeds"] == len(users) - 1
+    assert read(api, users["carol"], "rchrono_followers")[0] == post_id
+    # the feeds of the others stay a snapshot of the beginning of the round
+    assert post_id not in read(api, users["alice"], "rchrono")
+    assert feed_cache.metrics()["hits"] == 1
+
+
+def test_reactions_drop_the_popularity_feeds(api, feeds):
+    users, tid, ids = feeds
+    api.call("/reaction", {"user_id": users["carol"], "post_id": ids[2], "type": "like", "tid": tid})
+
+    assert feed_cache.metrics()["feeds"] == len(users) - 1
+    assert ids[2] in read(api, users["bob"], "rchrono_popularity")
+    read(api, users["alice"], "rchrono")
+    assert feed_cache.metrics()["hits"] == 1
+
+
+def test_follows_drop_the_followers_feeds_of_the_user(api, feeds):
+    users, tid, ids = feeds
+    api.call("/follow", {"user_id": users["carol"], "target": users["dave"], "action": "follow", "tid": tid})
+
+    assert feed_cache.metrics()["feeds"] == len(users) - 1
+    assert read(api, users["carol"], "rchrono_followers") == [ids[7], ids[5], ids[3], ids[1]]
+
+
+def test_writes_during_the_precomputation_drop_the_stale_feeds(api, feeds):
+    _, tid, _ = feeds
+    params = ("rchrono_followers", 4, 10, 1, False)
+    feed_cache.begin()
+    feed_cache.invalidate(uids=[1], modes=("rchrono_followers",))
+
+    feed_cache.store(tid, {1: (params, []), 2: (params, [])})
+    assert feed_cache.get(tid, 1, params) is None
+    assert feed_cache.get(tid, 2, params) == []
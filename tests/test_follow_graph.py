@@ -0,0 +1,62 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Follow
+from y_server.utils.follow_graph import follow_graph
+
+
+@pytest.fixture
+def users(api):
+    return {name: api.register(name) for name in ("alice", "bob", "carol", "dave")}
+
+
+def follow(api, users, source, target, action="follow", tid=1):
+    api.call("/follow", {"user_id": users[source], "target": users[target], "action": action, "tid": tid})
+
+
+def graph(users):
+    names = {uid: name for name, uid in users.items()}
+    return {
+        name: ({names[u] for u in follow_graph.following(uid)}, {names[u] for u in follow_graph.followers(uid)})
+        for name, uid in users.items()
+    }
+
+
+def test_graph_follows_the_actions(api, users):
+    api.round(0, 0)
+    for source, target in (("alice", "bob"), ("alice", "carol"), ("bob", "carol"), ("carol", "alice")):
+        follow(api, users, source, target)
+    follow(api, users, "alice", "bob", "unfollow")
+    # ignored: a repeated follow, an unfollow without follow, a self follow
+    follow(api, users, "bob", "carol")
+    follow(api, users, "dave", "alice", "unfollow")
+    follow(api, users, "dave", "dave")
+
+    expected = {
+        "alice": ({"carol"}, {"carol"}),
+        "bob": ({"carol"}, set()),
+        "carol": ({"alice"}, {"alice", "bob"}),
+        "dave": (set(), set()),
+    }
+    assert graph(users) == expected
+    assert (follow_graph.out_degree(users["carol"]), follow_graph.in_degree(users["carol"])) == (1, 2)
+    assert follow_graph.in_degrees() == {users["alice"]: 1, users["carol"]: 2}
+    with app.app_context():
+        assert Follow.query.count() == 5
+
+        # the graph replayed from the event log
+        follow_graph.reset()
+        assert graph(users) == expected
+
+
+def test_follow_again_after_unfollow(api, users):
+    tid = api.round(0, 0)
+    follow(api, users, "alice", "bob", tid=tid)
+    follow(api, users, "alice", "bob", "unfollow", tid=tid)
+    tid = api.round(0, 1)
+    follow(api, users, "alice", "bob", tid=tid)
+
+    with app.app_context():
+        follow_graph.reset()
+        assert follow_graph.following(users["alice"]) == {users["bob"]}
+    assert api.call("/follow_status", {"user_id": users["alice"], "target": users["bob"]}) == {"status": "follow"}
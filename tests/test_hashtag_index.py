@@ -0,0 +1,59 @@
+import pytest
+
+from y_server import app
+from y_server.utils.hashtag_index import hashtag_index
+
+# author, hashtags of the posts of each round
+ROUNDS = [
+    [("alice", ["#climate", "#news"]), ("bob", ["#climate"]), ("carol", ["#sport"]), ("bob", ["#news", "#vote"])],
+    [("carol", ["#climate", "#news", "#vote"]), ("alice", ["#vote"]), ("bob", []), ("carol", ["#news"])],
+    [("bob", ["#climate", "#vote"]), ("carol", ["#sport", "#news"]), ("alice", ["#sport"]), ("bob", ["#news"])],
+]
+
+
+@pytest.fixture
+def users(api):
+    users = {name: api.register(name) for name in ("alice", "bob", "carol")}
+    for hour, posts in enumerate(ROUNDS):
+        tid = api.round(0, hour)
+        for i, (author, hashtags) in enumerate(posts):
+            api.post(users[author], tid, text=f"post {i} of {author} in round {hour}", hashtags=hashtags)
+    return users
+
+
+def search(api, uid, rank, vround, limit=5):
+    res = api.call("/search", {"uid": uid, "visibility_rounds": vround, "rank": rank, "limit": limit})
+    return sorted(res) if rank == "random" else res
+
+
+def searches(api, users):
+    return {
+        (name, rank, vround): search(api, uid, rank, vround, limit=20 if rank == "random" else 5)
+        for name, uid in users.items()
+        for rank in ("recency", "overlap", "random")
+        for vround in (0, 1, 10)
+    }
+
+
+def test_index_and_database_find_the_same_posts(api, users, monkeypatch):
+    indexed = searches(api, users)
+    assert hashtag_index.loaded
+    monkeypatch.setitem(app.config, "post_index", False)
+    stored = searches(api, users)
+
+    assert indexed == stored
+    assert any(len(res) > 0 for res in indexed.values())
+
+
+def test_index_follows_the_new_posts_and_rounds(api, users, monkeypatch):
+    search(api, users["alice"], "recency", 10)
+    tid = api.round(0, 3)
+    api.post(users["bob"], tid, text="a new post of bob", hashtags=["#sport", "#climate"])
+    api.post(users["alice"], tid, text="a new post of alice", hashtags=["#news"])
+    monkeypatch.setattr(hashtag_index, "retention", 2)
+    api.round(0, 4)
+
+    indexed = searches(api, users)
+    monkeypatch.setitem(app.config, "post_index", False)
+
+    assert indexed == searches(api, users)
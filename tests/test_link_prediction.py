@@ -0,0 +1,73 @@
+import math
+
+import pytest
+
+from y_server.utils import link_prediction
+
+# users followed by each user
+GRAPH = {
+    "a": ("b", "c", "d"),
+    "b": ("e", "d", "f"),
+    "c": ("e", "a"),
+    "d": ("b", "c"),
+    "e": ("b", "c"),
+    "f": ("c", "d"),
+}
+
+MODES = ("common_neighbors", "jaccard", "adamic_adar")
+
+
+@pytest.fixture
+def users(api):
+    users = {name: api.register(name) for name in GRAPH}
+    tid = api.round(0, 0)
+    for source, targets in GRAPH.items():
+        for target in targets:
+            api.call("/follow", {"user_id": users[source], "target": users[target], "action": "follow", "tid": tid})
+    return users
+
+
+def test_scores_of_a_hand_computed_graph(users):
+    names = {uid: name for name, uid in users.items()}
+
+    common, jaccard, adamic_adar = (
+        {names[uid]: score for uid, score in link_prediction.scores(mode, [users["a"]])[0].items()}
+        for mode in MODES
+    )
+
+    # the candidates reached in two hops, but c (no users followed by both a and c)
+    assert common == {"e": 2, "d": 2, "f": 2, "a": 3, "b": 1}
+    assert jaccard == pytest.approx({"e": 2 / 3, "d": 2 / 3, "f": 2 / 3, "a": 1, "b": 1 / 5})
+    assert adamic_adar == pytest.approx({
+        "e": 1 / math.log(3) + 1 / math.log(2),
+        "d": 1 / math.log(3) + 1 / math.log(2),
+        "f": 2 / math.log(2),
+        "a": 1 / math.log(3) + 2 / math.log(2),
+        "b": 1 / math.log(2),
+    })
+
+
+def test_scores_follow_the_graph_changes(api, users):
+    link_prediction.scores("common_neighbors", [users["a"]])
+    api.call("/follow", {"user_id": users["a"], "target": users["e"], "action": "follow", "tid": 1})
+    api.call("/follow", {"user_id": users["b"], "target": users["f"], "action": "unfollow", "tid": 1})
+
+    scores = link_prediction.scores("common_neighbors", [users["a"]])[0]
+
+    # f is not reached anymore, and a now follows e, followed by c as well
+    assert users["f"] not in scores
+    assert scores[users["c"]] == 1
+
+
+@pytest.mark.parametrize("mode", MODES + ("preferential_attachment",))
+def test_batch_suggestions_are_the_single_ones(api, users, mode):
+    params = {"n_neighbors": 5, "leaning_biased": 1, "mode": mode}
+
+    batch = api.call("/follow_suggestions_batch", {"user_ids": list(users.values()), **params})
+
+    assert batch == {
+        str(uid): api.call("/follow_suggestions", {"user_id": uid, **params}) for uid in users.values()
+    }
+    if mode == "common_neighbors":
+        # the candidates not yet followed by a
+        assert batch[str(users["a"])] == {str(users["e"]): 0.5, str(users["f"]): 0.5}
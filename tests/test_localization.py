@@ -0,0 +1,76 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Post
+from y_server.translate import FakeBackend, GoogleBackend, backend, translate, translate_batch
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    Texts sent to the fake backend.
+    """
+    sent = []
+    fake = backend("fake")
+    translate_texts = fake.translate_batch
+
+    def record(texts, src_lang, tgt_lang):
+        sent.extend(texts)
+        return translate_texts(texts, src_lang, tgt_lang)
+
+    monkeypatch.setattr(fake, "translate_batch", record)
+    return sent
+
+
+def localized():
+    with app.app_context():
+        return {post.tweet: post.tweet_loc for post in Post.query}
+
+
+def test_backends():
+    assert isinstance(backend(), FakeBackend)
+    # unknown translators fall back to Google
+    assert isinstance(backend("babel"), GoogleBackend)
+    assert translate("good morning", "english", "italian") == "[it] good morning"
+
+
+def test_translations_are_cached(calls):
+    texts = ["cached text one", "cached text two", "cached text one"]
+
+    assert translate_batch(texts, "english", "german") == [f"[de] {text}" for text in texts]
+    assert calls == ["cached text one", "cached text two"]
+
+    assert translate_batch(["cached text two", "cached text three"], "english", "german") == [
+        "[de] cached text two", "[de] cached text three"
+    ]
+    assert calls == ["cached text one", "cached text two", "cached text three"]
+
+    # the cache is per language pair
+    translate_batch(["cached text one"], "english", "french")
+    assert calls[-1] == "cached text one"
+
+
+def test_same_language_is_not_translated(calls):
+    assert translate_batch(["no translation"], "english", "english") == ["no translation"]
+    assert calls == []
+
+
+def test_drain_fills_the_localized_text(api):
+    alice, bob = api.register("alice"), api.register("bob")
+    tid = api.round(0, 0)
+    api.post(alice, tid, text="the news of today", hashtags=["#news"], tgt_language="italian")
+    with app.app_context():
+        post_id = Post.query.filter_by(user_id=alice).first().id
+    api.comment(
+        bob, post_id, tid, text="thanks for sharing", hashtags=["#news"], mentions=["@alice", "@ghost"],
+        tgt_language="german",
+    )
+
+    res = api.call("/drain_localization", {"timeout": 10})
+
+    assert res["status"] == 200 and res["queued"] == 0
+    # the mentions and hashtags are kept untranslated, the unknown mentions are dropped
+    assert sorted(localized().values()) == [
+        "@alice [de] thanks for sharing #news",
+        "[it] the news of today #news",
+    ]
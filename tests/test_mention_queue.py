@@ -0,0 +1,84 @@
+import json
+import threading
+
+import pytest
+
+from y_server import app
+from y_server.modals import Mentions, Post
+from y_server.utils.mention_queue import mention_queue
+
+
+@pytest.fixture
+def mentions(api):
+    """
+    Posts and comments of alice mentioning bob over two rounds: the ids of the posts by round.
+    """
+    alice, bob = api.register("alice"), api.register("bob")
+    ids = []
+    for hour in range(2):
+        tid = api.round(0, hour)
+        for i in range(3):
+            api.post(alice, tid, text=f"post {i} for @bob in round {hour}", mentions=["@bob"])
+        with app.app_context():
+            root = Post.query.filter_by(round=tid).first().id
+        api.comment(alice, root, tid, text=f"a comment for @bob in round {hour}", mentions=["@bob"])
+        with app.app_context():
+            ids.append(sorted(post.id for post in Post.query.filter_by(round=tid)))
+    return alice, bob, ids
+
+
+def read(api, uid, vround=10):
+    res = api.call("/read_mentions", {"uid": uid, "visibility_rounds": vround})
+    return res if isinstance(res, list) else []
+
+
+@pytest.mark.parametrize("post_index", [True, False])
+def test_mentions_are_served_once(api, mentions, post_index, monkeypatch):
+    alice, bob, ids = mentions
+    monkeypatch.setitem(app.config, "post_index", post_index)
+
+    # the mentions of the last round only
+    latest = [post_id for _ in range(6) for post_id in read(api, bob, vround=0)]
+    assert sorted(latest) == ids[1]
+    # the older ones, the queue being rebuilt from the database meanwhile
+    mention_queue.reset()
+    older = [post_id for _ in range(6) for post_id in read(api, bob)]
+    assert sorted(older) == ids[0]
+
+    assert read(api, alice) == []
+    with app.app_context():
+        assert Mentions.query.filter_by(answered=0).count() == 0
+
+
+def test_concurrent_readers_share_the_mentions(api, mentions):
+    _, bob, ids = mentions
+    served, start = [], threading.Barrier(4)
+
+    def consume():
+        client = app.test_client()
+        start.wait()
+        for _ in range(4):
+            response = client.post("/read_mentions", data=json.dumps({"uid": bob, "visibility_rounds": 10}))
+            res = json.loads(response.data)
+            if isinstance(res, list):
+                served.extend(res)
+
+    threads = [threading.Thread(target=consume) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(served) == ids[0] + ids[1]
+
+
+def test_batches_consume_several_mentions(api, mentions):
+    alice, bob, ids = mentions
+
+    first = api.call("/read_mentions_batch", [
+        {"uid": bob, "visibility_rounds": 10, "limit": 5}, {"uid": alice, "visibility_rounds": 10},
+    ])
+    second = api.call("/read_mentions_batch", [{"uid": bob, "visibility_rounds": 10, "limit": 5}])
+
+    assert len(first[0]) == 5 and first[1] == [] and len(second[0]) == 3
+    assert sorted(first[0] + second[0]) == ids[0] + ids[1]
@@ -0,0 +1,156 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from y_server.modals import Emotions, Post, User_mgmt
+from y_server.utils import migrations, storage
+
+from conftest import ROOT
+
+LATEST = max(migrations.MIGRATIONS)
+
+
+class Recorder(object):
+    """
+    Connection of a PostgreSQL database recording the executed statements.
+    """
+
+    dialect = postgresql.dialect()
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append((str(statement), params))
+
+
+def old_database(path):
+    """
+    A database created before the migrations: the tables without their indexes, duplicated hashtags.
+    """
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for table in ("post", "follow", "reactions", "mentions", "post_hashtags", "hashtags"):
+            # the indexes are not part of the table statements
+            conn.exec_driver_sql(str(CreateTable(Post.metadata.tables[table])).strip())
+        conn.execute(text("INSERT INTO hashtags (hashtag) VALUES ('#news'), ('#news'), ('#vote')"))
+    return engine
+
+
+def test_migrations_remove_the_full_scans(tmp_path):
+    engine = old_database(os.path.join(tmp_path, "old.db"))
+    scans = migrations.full_scans(engine)
+    assert {"posts of a user", "thread", "follow actions", "unanswered mentions", "posts of a hashtag"} <= set(scans)
+
+    res = migrations.migrate(engine)
+
+    assert (res["previous"], res["version"], res["rewritten"]) == (0, LATEST, [])
+    assert {"post_round", "post_user_id", "mentions_user_answered_round"} <= set(res["created"])
+    # the missing tables and the unique index violated by the data
+    assert {"post_sentiment_post_id", "user_opinions_user_topic_round", "hashtags_hashtag"} <= set(res["skipped"])
+    assert migrations.full_scans(engine) == {}
+    # the migrations are applied once
+    assert migrations.migrate(engine) == {
+        "previous": LATEST, "version": LATEST, "created": [], "skipped": [], "rewritten": []
+    }
+    engine.dispose()
+
+
+def test_migrations_stop_at_the_target_version(tmp_path):
+    engine = old_database(os.path.join(tmp_path, "old.db"))
+
+    assert migrations.migrate(engine, target=1)["version"] == 1
+    res = migrations.migrate(engine)
+
+    assert (res["previous"], res["version"], res["created"]) == (1, LATEST, [])
+    engine.dispose()
+
+
+def test_migration_script(tmp_path):
+    database = os.path.join(tmp_path, "old.db")
+    old_database(database).dispose()
+    script = os.path.join(ROOT, "y_server_migrate.py")
+
+    checked = subprocess.run([sys.executable, script, "--check", database], capture_output=True, text=True, check=True)
+    migrated = subprocess.run([sys.executable, script, database], capture_output=True, text=True, check=True)
+
+    assert '"posts of a user"' in checked.stdout and '"version"' not in checked.stdout
+    assert f'"version": {LATEST}' in migrated.stdout and '"full_scans": {}' in migrated.stdout
+
+
+def test_text_news_ids_become_integers(tmp_path):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'old.db')}")
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS "post" ("id" INTEGER NOT NULL, "tweet" TEXT, '
+                          '"news_id" VARCHAR(50), "round" INTEGER, PRIMARY KEY("id"))'))
+        conn.execute(text("CREATE INDEX post_round ON post (round)"))
+        conn.execute(text("INSERT INTO post (tweet, news_id, round) VALUES ('a', '5', 0), ('b', '', 0), "
+                          "('c', '-1', 1)"))
+        conn.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (2)"))
+
+    res = migrations.migrate(engine)
+
+    assert res["version"] == LATEST and res["rewritten"] == ["post"]
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT tweet, news_id, typeof(news_id) FROM post ORDER BY id")).fetchall()
+        assert [tuple(row) for row in rows] == [("a", 5, "integer"), ("b", -1, "integer"), ("c", -1, "integer")]
+        assert conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars().all() == [
+            "post_round"
+        ]
+    # the current databases are left untouched
+    assert migrations.integer_news_ids(engine) == []
+    engine.dispose()
+
+
+def test_postgresql_schema():
+    post = str(CreateTable(Post.__table__).compile(dialect=postgresql.dialect()))
+    users = str(CreateTable(User_mgmt.__table__).compile(dialect=postgresql.dialect()))
+
+    assert "news_id INTEGER" in post
+    # SQLite never enforced the declared lengths
+    assert "username VARCHAR NOT NULL" in users and "VARCHAR(" not in users
+
+
+def test_template_rows_move_the_postgresql_sequences():
+    conn = Recorder()
+
+    storage.copy_template(conn, [Emotions.__table__, Post.__table__])
+
+    (insert, rows), (setval, _) = conn.statements
+    assert insert.startswith("INSERT INTO emotions") and len(rows) == 28
+    assert setval == "SELECT setval(pg_get_serial_sequence('emotions', 'id'), max(id)) FROM emotions"
+
+
+def test_template_is_up_to_date():
+    engine = create_engine(f"sqlite:///{storage.TEMPLATE}")
+    with engine.connect() as conn:
+        assert migrations.version(conn) == LATEST
+    assert migrations.full_scans(engine) == {}
+    assert migrations.integer_news_ids(engine) == []
+    engine.dispose()
+
+
+def test_reactions_of_every_type_are_counted(tmp_path):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp_path, 'old.db')}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE post_counters (id INTEGER PRIMARY KEY, post_id INTEGER, likes INTEGER, "
+                          "dislikes INTEGER, comments INTEGER, shares INTEGER)"))
+        conn.execute(text("CREATE TABLE reactions (id INTEGER PRIMARY KEY, post_id INTEGER, type TEXT)"))
+        conn.execute(text("INSERT INTO post_counters (post_id, likes, dislikes, comments, shares) VALUES "
+                          "(1, 1, 0, 0, 0), (2, 0, 0, 3, 0)"))
+        conn.execute(text("INSERT INTO reactions (post_id, type) VALUES (1, 'like'), (1, 'love'), (1, 'angry')"))
+        conn.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO schema_version (version) VALUES (3)"))
+
+    assert migrations.migrate(engine)["rewritten"] == ["post_counters"]
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT post_id, likes, reactions FROM post_counters ORDER BY post_id")).fetchall()
+    assert [tuple(row) for row in rows] == [(1, 1, 3), (2, 0, 0)]
+    assert migrations.reaction_counts(engine) == []
+    engine.dispose()
@@ -0,0 +1,80 @@
+import pytest
+
+from y_server import app, db
+from y_server.modals import Interests, Post
+from y_server.utils import opinion_dynamics, opinion_engine
+from y_server.utils.opinion_store import add_opinions
+
+SUSCEPTIBILITY = {"alice": 0.2, "bob": 0.5, "carol": 0.8, "dave": 0.3, "erin": 0.6}
+
+# round 0 and latest opinions, erin has none
+OPINIONS = {"alice": (0.1, 0.4), "bob": (-0.6, -0.2), "carol": (0.9, None), "dave": (-0.3, None)}
+
+
+@pytest.fixture
+def population(api):
+    """
+    Users with opinions on a topic, follows and reactions to the posts on the topic.
+    """
+    users = {name: api.register(name, susceptibility=value) for name, value in SUSCEPTIBILITY.items()}
+    tid = api.round(0, 0)
+    posts = {}
+    for name in ("bob", "carol", "erin"):
+        api.call("/post", {
+            "user_id": users[name], "tweet": f"climate post of {name}", "emotions": [], "hashtags": [],
+            "mentions": [], "topic_names": ["climate"], "tid": tid, "src_language": "english",
+            "tgt_language": "english",
+        })
+        with app.app_context():
+            posts[name] = Post.query.filter_by(user_id=users[name]).first().id
+
+    for source, targets in {"alice": ("bob", "carol", "erin"), "bob": ("alice",), "carol": ("dave",)}.items():
+        for target in targets:
+            api.call("/follow", {"user_id": users[source], "target": users[target], "action": "follow", "tid": tid})
+
+    with app.app_context():
+        topic = Interests.query.filter_by(interest="climate").first()
+        opinions = []
+        for name, (initial, latest) in OPINIONS.items():
+            opinions.append({"user_id": users[name], "topic_id": topic.iid, "round": 0, "score": initial,
+                             "score_llm": initial})
+            if latest is not None:
+                opinions.append({"user_id": users[name], "topic_id": topic.iid, "round": 1, "score": latest,
+                                 "score_llm": latest})
+        add_opinions(opinions)
+        db.session.commit()
+
+    # reactions given after the latest opinions
+    api.round(0, 1)
+    tid = api.round(0, 2)
+    for source, target, rtype in (("alice", "bob", "like"), ("alice", "erin", "dislike"), ("dave", "carol", "like")):
+        api.call("/reaction", {"user_id": users[source], "post_id": posts[target], "type": rtype, "tid": tid})
+    return users, tid
+
+
+@pytest.mark.parametrize("method", opinion_engine.METHODS)
+def test_engine_matches_the_per_user_models(api, population, method):
+    users, tid = population
+    with app.app_context():
+        topic = Interests.query.filter_by(interest="climate").first()
+        if method == "weighted_friedkin_johnsen":
+            ids, scores, _ = opinion_engine.weighted_friedkin_johnsen(topic)
+        else:
+            ids, scores, _ = opinion_engine.friedkin_johnsen(
+                topic, is_state_dependent=method == "state_dependent_fj"
+            )
+
+        expected = {}
+        for user_id in ids:
+            susceptibility = SUSCEPTIBILITY[next(name for name, uid in users.items() if uid == user_id)]
+            if method == "weighted_friedkin_johnsen":
+                expected[user_id] = opinion_dynamics.weighted_friedkin_johnsen(user_id, topic, susceptibility)
+            else:
+                expected[user_id] = opinion_dynamics.friedkin_johnsen(
+                    user_id, topic, tid, susceptibility, is_state_dependent=method == "state_dependent_fj"
+                )
+
+    assert sorted(ids) == sorted(users[name] for name in OPINIONS)
+    assert dict(zip(ids, scores)) == pytest.approx(expected)
+    # the opinions are actually updated
+    assert dict(zip(ids, scores))[users["alice"]] != pytest.approx(OPINIONS["alice"][1])
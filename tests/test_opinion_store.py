@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import desc
+
+from y_server import app, db
+from y_server.modals import Interests, User_opinions, User_opinions_latest
+from y_server.utils.opinion_store import add_opinion, add_opinions, sync_latest_opinions
+
+# (user, topic, round, score), not in round order
+OPINIONS = [
+    ("alice", "climate", 0, 0.1), ("alice", "climate", 2, 0.3), ("alice", "climate", 1, 0.2),
+    ("alice", "economy", 1, -0.5), ("bob", "climate", 3, 0.9), ("bob", "climate", 0, 0.6),
+    ("bob", "economy", 2, -0.1), ("bob", "economy", 2, -0.2),
+]
+
+
+@pytest.fixture
+def opinions(api):
+    """
+    Opinions of two users on two topics, recorded over several requests.
+    """
+    users = {name: api.register(name) for name in ("alice", "bob")}
+    api.call("/set_interests", ["climate", "economy"])
+    with app.app_context():
+        topics = {topic.interest: topic.iid for topic in Interests.query}
+        rows = [
+            {"user_id": users[user], "topic_id": topics[topic], "round": rnd, "score": score, "score_llm": score,
+             "description": f"{user} on {topic} at {rnd}"}
+            for user, topic, rnd, score in OPINIONS
+        ]
+        add_opinions(rows[:3])
+        db.session.commit()
+        add_opinions(rows[3:6])
+        db.session.commit()
+        for row in rows[6:]:
+            add_opinion(**row)
+            db.session.commit()
+    return users, topics
+
+
+def history_latest():
+    # the most recent opinion of each user on each topic, as read from the history
+    res = {}
+    for opinion in User_opinions.query.order_by(desc(User_opinions.round), desc(User_opinions.id)):
+        res.setdefault((opinion.user_id, opinion.topic_id), (opinion.round, opinion.score, opinion.description))
+    return res
+
+
+def latest():
+    return {
+        (opinion.user_id, opinion.topic_id): (opinion.round, opinion.score, opinion.description)
+        for opinion in User_opinions_latest.query
+    }
+
+
+def test_latest_opinions_match_the_history(api, opinions):
+    users, topics = opinions
+    with app.app_context():
+        assert latest() == history_latest()
+        # an older opinion recorded late does not replace the latest one
+        assert latest()[(users["alice"], topics["climate"])] == (2, 0.3, "alice on climate at 2")
+        assert latest()[(users["bob"], topics["economy"])] == (2, -0.2, "bob on economy at 2")
+
+    assert api.call("/get_opinions", {"user_id": users["bob"], "interests": ["climate", "economy"]}, method="get") == [
+        {"topic": "climate", "score": 0.9, "score_llm": 0.9, "description": "bob on climate at 3"},
+        {"topic": "economy", "score": -0.2, "score_llm": -0.2, "description": "bob on economy at 2"},
+    ]
+    assert api.call("/get_last_opinion_round", {"user_id": users["alice"]}, method="get") == {"round": 2}
+
+
+def test_latest_opinions_are_backfilled(api, opinions):
+    with app.app_context():
+        expected = latest()
+        User_opinions_latest.query.delete()
+        db.session.commit()
+
+        sync_latest_opinions()
+
+        assert latest() == expected == history_latest()
@@ -0,0 +1,98 @@
+import pytest
+
+from y_server import app, db
+from y_server.modals import Post, Post_counters
+from y_server.utils.post_counters import count_reaction, sync_post_counters
+from y_server.utils.post_index import post_index
+
+
+@pytest.fixture
+def posts(api):
+    """
+    Posts of three users, with their reactions: the ids of the posts by number of reactions.
+    """
+    users = [api.register(name) for name in ("alice", "bob", "carol")]
+    tid = api.round(0, 0)
+    for i in range(6):
+        api.post(users[i % 3], tid, text=f"post number {i}")
+    with app.app_context():
+        ids = [post.id for post in Post.query.order_by(Post.id)]
+
+    # post i gets i reactions
+    for i, post_id in enumerate(ids):
+        for j in range(i):
+            api.call("/reaction", {"user_id": users[j % 3], "post_id": post_id, "type": ["like", "dislike"][j % 2],
+                                   "tid": tid})
+    return users, tid, ids
+
+
+def feed(api, uid, mode, **params):
+    return api.call("/read", {"uid": uid, "mode": mode, "limit": 4, "visibility_rounds": 10, **params})
+
+
+def test_index_and_database_rank_the_same_posts(api, posts, monkeypatch):
+    users, tid, ids = posts
+    api.call("/follow", {"user_id": users[0], "target": users[1], "action": "follow", "tid": tid})
+
+    indexed = [feed(api, uid, mode) for uid in users for mode in ("rchrono_popularity", "rchrono_followers_popularity")]
+    monkeypatch.setitem(app.config, "post_index", False)
+    stored = [feed(api, uid, mode) for uid in users for mode in ("rchrono_popularity", "rchrono_followers_popularity")]
+
+    assert indexed == stored
+    # the most popular posts of the others, without the post having no reactions
+    assert indexed[0] == [ids[5], ids[4], ids[2], ids[1]]
+    assert indexed[1] == [ids[4], ids[1]]
+
+
+def test_rolled_back_reactions_are_not_counted(api, posts):
+    users, _, ids = posts
+    # load the post index
+    feed(api, users[0], "rchrono_popularity")
+    with app.app_context():
+        before = dict(post_index.reactions)
+
+        count_reaction(ids[0], "like")
+        db.session.rollback()
+        count_reaction(ids[1], "like")
+        db.session.commit()
+
+        assert post_index.reactions == {**before, ids[1]: before[ids[1]] + 1}
+        assert Post_counters.query.filter_by(post_id=ids[0]).first() is None
+
+
+def test_missing_counters_are_backfilled(api, posts):
+    _, _, ids = posts
+    with app.app_context():
+        expected = {row.post_id: (row.likes, row.dislikes, row.reactions) for row in Post_counters.query}
+        Post_counters.query.filter(Post_counters.post_id.in_(ids[3:])).delete(synchronize_session=False)
+        Post_counters.query.filter_by(post_id=ids[1]).update({"likes": 7})
+        db.session.commit()
+
+        sync_post_counters()
+
+        counters = {row.post_id: (row.likes, row.dislikes, row.reactions) for row in Post_counters.query}
+        # the rows kept are not recounted
+        assert counters == {**expected, ids[1]: (7, *expected[ids[1]][1:])}
+
+
+def test_every_reaction_type_ranks_the_popular_posts(api, posts, monkeypatch):
+    users, tid, ids = posts
+    # the post without likes nor dislikes gets more reactions than any other
+    for j in range(6):
+        api.call("/reaction", {"user_id": users[j % 3], "post_id": ids[0], "type": ["love", "angry"][j % 2],
+                               "tid": tid})
+
+    indexed = feed(api, users[1], "rchrono_popularity")
+    monkeypatch.setitem(app.config, "post_index", False)
+
+    assert feed(api, users[1], "rchrono_popularity") == indexed == [ids[0], ids[5], ids[3], ids[2]]
+    with app.app_context():
+        row = Post_counters.query.filter_by(post_id=ids[0]).first()
+        assert (row.likes, row.dislikes, row.reactions) == (0, 0, 6)
+        # and the backfill counts them as well
+        Post_counters.query.delete()
+        db.session.commit()
+        sync_post_counters()
+        assert {row.post_id: row.reactions for row in Post_counters.query} == {
+            post_id: i or 6 for i, post_id in enumerate(ids)
+        }
@@ -0,0 +1,82 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Post
+from y_server.utils.post_index import post_index
+
+
+@pytest.fixture
+def timeline(api):
+    """
+    Posts of four users over four rounds, alice following bob and carol.
+    """
+    users = {name: api.register(name) for name in ("alice", "bob", "carol", "dave")}
+    for hour in range(4):
+        tid = api.round(0, hour)
+        for name, uid in users.items():
+            api.post(uid, tid, text=f"post of {name} in round {hour}")
+    for target in ("bob", "carol"):
+        api.call("/follow", {"user_id": users["alice"], "target": users[target], "action": "follow", "tid": tid})
+    return users, tid
+
+
+def feed(api, uid, mode, vround, **params):
+    return api.call("/read", {"uid": uid, "mode": mode, "limit": 6, "visibility_rounds": vround, **params})
+
+
+def feeds(api, users):
+    return {
+        (name, mode, vround, fratio): feed(api, uid, mode, vround, followers_ratio=fratio)
+        for name, uid in users.items()
+        for mode in ("rchrono", "rchrono_followers")
+        for vround in (0, 1, 10)
+        for fratio in (1, 0.5)
+    }
+
+
+def test_index_and_database_serve_the_same_feeds(api, timeline, monkeypatch):
+    users, tid = timeline
+
+    indexed = feeds(api, users)
+    assert post_index.loaded
+    monkeypatch.setitem(app.config, "post_index", False)
+    stored = feeds(api, users)
+
+    assert indexed == stored
+    with app.app_context():
+        authors = {post.id: post.user_id for post in Post.query}
+    # the ten most recent posts of the others
+    latest = indexed[("alice", "rchrono", 10, 1)]
+    assert len(latest) == 10 and latest == sorted(latest, reverse=True)
+    assert users["alice"] not in {authors[post_id] for post_id in latest}
+    # the posts of the followed users in the visible rounds
+    followed = indexed[("alice", "rchrono_followers", 1, 1)]
+    assert {authors[post_id] for post_id in followed} == {users["bob"], users["carol"]} and len(followed) == 4
+
+
+def test_index_follows_the_writes(api, timeline, monkeypatch):
+    users, tid = timeline
+    feed(api, users["alice"], "rchrono", 0)
+
+    # a new post, and a new round dropping the posts of the first rounds out of the index
+    api.post(users["bob"], tid, text="a new post of bob")
+    monkeypatch.setattr(post_index, "retention", 2)
+    tid = api.round(0, 4)
+    api.post(users["carol"], tid, text="a post of carol in round 4")
+
+    assert min(post_index.rounds) == tid - 2
+    indexed = feeds(api, users)
+    monkeypatch.setitem(app.config, "post_index", False)
+    # the windows out of the index are read from the database
+    assert indexed == feeds(api, users)
+
+
+def test_random_feeds_sample_the_visible_posts(api, timeline):
+    users, tid = timeline
+    with app.app_context():
+        visible = {post.id for post in Post.query.filter(Post.round >= tid - 1, Post.user_id != users["alice"])}
+
+    samples = [feed(api, users["alice"], "random", 1) for _ in range(20)]
+
+    assert all(len(sample) == 6 == len(set(sample)) and set(sample) <= visible for sample in samples)
+    assert len({tuple(sample) for sample in samples}) > 1
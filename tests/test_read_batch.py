@@ -0,0 +1,53 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Post, Recommendations
+
+MODES = ("rchrono", "rchrono_popularity", "rchrono_followers", "rchrono_followers_popularity")
+
+
+@pytest.fixture
+def users(api):
+    """
+    Users posting over two rounds, following and liking each other.
+    """
+    users = [api.register(name) for name in ("alice", "bob", "carol")]
+    for hour in range(2):
+        tid = api.round(0, hour)
+        for i in range(6):
+            api.post(users[i % 3], tid, text=f"post {i} in round {hour}")
+    with app.app_context():
+        ids = [post.id for post in Post.query.order_by(Post.id)]
+    for i, post_id in enumerate(ids[::3]):
+        api.call("/reaction", {"user_id": users[i % 3], "post_id": post_id, "type": "like", "tid": tid})
+    api.call("/follow", {"user_id": users[0], "target": users[1], "action": "follow", "tid": tid})
+    api.call("/follow", {"user_id": users[2], "target": users[0], "action": "follow", "tid": tid})
+    return users
+
+
+@pytest.mark.parametrize("post_index", [True, False])
+def test_batch_serves_the_feeds_of_single_reads(api, users, post_index, monkeypatch):
+    monkeypatch.setitem(app.config, "post_index", post_index)
+    specs = [
+        {"uid": uid, "mode": mode, "limit": 4, "visibility_rounds": vround, "followers_ratio": fratio}
+        for uid in users
+        for mode in MODES
+        for vround in (0, 5)
+        for fratio in (1, 0.5)
+    ]
+
+    batch = api.call("/read_batch", specs)
+
+    assert batch == [api.call("/read", spec) for spec in specs]
+    assert any(len(feed) > 0 for feed in batch)
+
+
+def test_batch_saves_the_recommendations(api, users):
+    specs = [{"uid": uid, "mode": "random", "limit": 3, "visibility_rounds": 5} for uid in users]
+
+    batch = api.call("/read_batch", specs)
+
+    assert all(len(feed) == 3 for feed in batch)
+    with app.app_context():
+        saved = {rec.user_id: rec.post_ids for rec in Recommendations.query}
+    assert saved == {uid: "|".join(str(post_id) for post_id in feed) for uid, feed in zip(users, batch)}
@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+from y_server import app
+from y_server.modals import Post
+from y_server.utils import round_jobs
+from y_server.utils.round_jobs import round_pipeline
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    A job recording the rounds it runs for, slow enough to overlap the next rounds if it could.
+    """
+    calls = []
+    running = threading.Lock()
+
+    def record(round_id, label="job"):
+        assert running.acquire(blocking=False), "overlapping jobs"
+        try:
+            threading.Event().wait(0.02)
+            calls.append((label, round_id))
+        finally:
+            running.release()
+        return {"round": round_id}
+
+    monkeypatch.setitem(round_jobs.JOBS, "record", record)
+    return calls
+
+
+def jobs(api, round_id):
+    assert round_pipeline.wait(10)
+    return api.call("/round_jobs", {"round": round_id})
+
+
+def test_jobs_run_in_order_once_per_round(api, calls, monkeypatch):
+    monkeypatch.setitem(app.config, "round_jobs", [{"job": "record", "label": "first"}, "record"])
+
+    ids = [api.round(0, hour) for hour in range(4)]
+    # the current round again
+    api.round(0, 3)
+    assert round_pipeline.wait(10)
+
+    assert calls == [(label, tid) for tid in ids for label in ("first", "job")]
+    state = jobs(api, ids[-1])
+    assert state["finished"] and state["state"] == "done"
+    assert [(job["job"], job["status"], job["result"]) for job in state["jobs"]] == [
+        ("record", "done", {"round": ids[-1]}), ("record", "done", {"round": ids[-1]}),
+    ]
+    assert api.call("/round_jobs", {"round": ids[-1] + 1})["status"] == 404
+
+
+def test_failed_jobs_do_not_stop_the_pipeline(api, calls, monkeypatch):
+    monkeypatch.setitem(app.config, "round_jobs", ["missing", "record"])
+
+    tid = api.round(0, 0)
+
+    state = jobs(api, tid)
+    assert state["state"] == "failed"
+    assert [job["status"] for job in state["jobs"]] == ["failed", "done"]
+    assert "missing" in state["jobs"][0]["error"]
+    assert calls == [("job", tid)]
+
+
+def test_rollup_counts_the_previous_round(api, monkeypatch):
+    monkeypatch.setitem(app.config, "round_jobs", ["rollup"])
+    alice, bob = api.register("alice"), api.register("bob")
+    tid = api.round(0, 0)
+    for i in range(3):
+        api.post(alice, tid, text=f"post {i} of alice")
+    with app.app_context():
+        post_id = Post.query.filter_by(user_id=alice).first().id
+    api.comment(bob, post_id, tid, text="a comment of bob")
+    api.call("/reaction", {"user_id": bob, "post_id": post_id, "type": "like", "tid": tid})
+    api.call("/follow", {"user_id": bob, "target": alice, "action": "follow", "tid": tid})
+
+    nxt = api.round(0, 1)
+
+    assert jobs(api, nxt)["jobs"][0]["result"] == {
+        "round": tid, "posts": 4, "comments": 1, "shares": 0, "reactions": 1, "follows": 1,
+    }
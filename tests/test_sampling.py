@@ -0,0 +1,95 @@
+import random
+from collections import Counter
+
+import pytest
+from sqlalchemy import func
+
+from y_server import app, db
+from y_server.modals import Post
+from y_server.utils import sampling
+
+DRAWS = 2000
+
+
+def frequencies(draws):
+    counts = Counter(item for draw in draws for item in draw)
+    return {item: count / len(draws) for item, count in counts.items()}
+
+
+def test_samples_are_uniform_and_distinct():
+    rng = random.Random(1)
+    candidates = list(range(20))
+    draws = [sampling.sample(candidates, 4, exclude=lambda c: c % 4 == 0, rng=rng) for _ in range(DRAWS)]
+
+    assert all(len(draw) == 4 == len(set(draw)) for draw in draws)
+    # each of the 15 accepted candidates is drawn with probability 4 / 15
+    freqs = frequencies(draws)
+    assert set(freqs) == {c for c in candidates if c % 4 != 0}
+    assert all(abs(freq - 4 / 15) < 0.04 for freq in freqs.values())
+
+
+def test_mostly_excluded_candidates():
+    rng = random.Random(2)
+    draws = [sampling.sample(list(range(100)), 5, exclude=lambda c: c >= 3, rng=rng) for _ in range(20)]
+
+    assert all(sorted(draw) == [0, 1, 2] for draw in draws)
+    assert sampling.sample([], 3, rng=rng) == [] and sampling.sample([1, 2], 3, rng=rng) in ([1, 2], [2, 1])
+
+
+def test_seeding(monkeypatch):
+    monkeypatch.setitem(app.config, "seed", 7)
+    sampling.reset()
+    first = [sampling.sample(list(range(50)), 5) for _ in range(3)]
+    sampling.reset()
+    assert [sampling.sample(list(range(50)), 5) for _ in range(3)] == first
+
+    sampling.reset(8)
+    assert [sampling.sample(list(range(50)), 5) for _ in range(3)] != first
+    assert sampling.sample(list(range(50)), 5, rng=random.Random(3)) == sampling.sample(
+        list(range(50)), 5, rng=random.Random(3)
+    )
+    sampling.reset()
+
+
+@pytest.fixture
+def posts(api):
+    """
+    Posts of two users: the ids of the posts of bob.
+    """
+    alice, bob = api.register("alice"), api.register("bob")
+    tid = api.round(0, 0)
+    for i in range(30):
+        api.post(bob if i % 3 == 0 else alice, tid, text=f"post {i}")
+    with app.app_context():
+        return alice, bob, [post.id for post in Post.query.filter_by(user_id=bob)]
+
+
+def test_rows_are_sampled_uniformly_from_the_query(api, posts):
+    _, bob, ids = posts
+    rng = random.Random(4)
+    with app.app_context():
+        low, high = db.session.query(func.min(Post.id), func.max(Post.id)).one()
+        query = Post.query.filter(Post.user_id == bob)
+        draws = [[row.id for row in sampling.sample_rows(query, Post.id, 3, low, high, rng=rng)] for _ in range(500)]
+
+        assert sampling.sample_rows(query, Post.id, 3, None, None, rng=rng) == []
+        assert sorted(row.id for row in sampling.sample_rows(query, Post.id, 20, low, high, rng=rng)) == ids
+
+    assert all(len(draw) == 3 == len(set(draw)) for draw in draws)
+    freqs = frequencies(draws)
+    assert set(freqs) == set(ids)
+    assert all(abs(freq - 3 / len(ids)) < 0.08 for freq in freqs.values())
+
+
+@pytest.mark.parametrize("post_index", [True, False])
+def test_random_feeds_are_reproducible(api, posts, post_index, monkeypatch):
+    alice, _, _ = posts
+    monkeypatch.setitem(app.config, "post_index", post_index)
+
+    def feeds():
+        sampling.reset()
+        return [api.call("/read", {"uid": alice, "mode": "random", "limit": 5, "visibility_rounds": 1})
+                for _ in range(3)]
+
+    first = feeds()
+    assert feeds() == first and len({tuple(feed) for feed in first}) > 1
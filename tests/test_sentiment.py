@@ -0,0 +1,26 @@
+from y_server.content_analysis import textual_data
+from y_server.content_analysis import sentiment_analyzer, start_sentiment_pool, vader_sentiment_batch
+
+
+def test_sentiment_batch_ignores_the_client_processes(api):
+    texts = ["what a wonderful day", "this is awful", "what a wonderful day"]
+
+    res = api.call("/sentiment_batch", {"texts": texts, "processes": 64})
+
+    assert [sentiment["compound"] for sentiment in res["sentiments"]] == [
+        sentiment_analyzer().polarity_scores(text)["compound"] for text in texts
+    ]
+    assert textual_data.__pool is None
+
+
+def test_pool_scores_the_large_batches():
+    texts = [f"post {i} is {'great' if i % 2 else 'terrible'}" for i in range(2 * textual_data.SENTIMENT_CHUNK_SIZE)]
+    expected = [sentiment_analyzer().polarity_scores(text) for text in texts]
+
+    start_sentiment_pool(2)
+    pool = textual_data.__pool
+    # started once
+    start_sentiment_pool(4)
+
+    assert pool is not None and textual_data.__pool is pool
+    assert vader_sentiment_batch(texts) == expected
@@ -0,0 +1,51 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from y_server import app, db
+from y_server.modals import Recommendations
+from y_server.utils import storage
+
+
+@pytest.fixture
+def single_writer(monkeypatch):
+    monkeypatch.setitem(app.config, "sqlite", {**app.config["sqlite"], "single_writer": True, "busy_timeout": 200})
+
+
+def test_default_profile():
+    with app.app_context():
+        with db.engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            # NORMAL
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 30000
+
+
+def test_writer_gate_serializes_the_writers(single_writer):
+    first, second = {}, {}
+    storage.writer_gate.acquire(first)
+    try:
+        # a second writer gives up after the busy timeout
+        with pytest.raises(sqlite3.OperationalError):
+            storage.writer_gate.acquire(second)
+
+        # and gets the gate once the first transaction ends
+        threading.Timer(0.05, storage.writer_gate.release, (first,)).start()
+        storage.writer_gate.acquire(second)
+    finally:
+        storage.writer_gate.release(first)
+        storage.writer_gate.release(second)
+    assert second == {}
+
+
+def test_recommendations_are_group_committed(api, single_writer):
+    uid = api.register("alice")
+    api.round(0, 0)
+    for _ in range(3):
+        api.call("/read", {"uid": uid, "mode": "rchrono", "limit": 4, "visibility_rounds": 10})
+
+    assert storage.write_queue.drain(10)
+    with app.app_context():
+        assert Recommendations.query.filter_by(user_id=uid).count() == 3
@@ -0,0 +1,81 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Post, User_mgmt
+from y_server.utils.thread_store import thread_store
+
+
+@pytest.fixture
+def thread(api):
+    """
+    A post of alice with comments and replies: the ids of the posts by name.
+    """
+    users = {name: api.register(name) for name in ("alice", "bob", "carol")}
+    tid = api.round(0, 0)
+    api.post(users["alice"], tid, text="the root post")
+    api.post(users["bob"], tid, text="a post in another thread")
+    with app.app_context():
+        posts = {"root": Post.query.filter_by(user_id=users["alice"]).first().id}
+
+    for name, author, parent in (
+        ("bob on root", "bob", "root"), ("carol on bob", "carol", "bob on root"),
+        ("alice on carol", "alice", "carol on bob"), ("carol on root", "carol", "root"),
+    ):
+        api.comment(users[author], posts[parent], tid, text=f"the comment of {name}")
+        with app.app_context():
+            posts[name] = Post.query.filter_by(tweet=f"the comment of {name}").first().id
+    return users, tid, posts
+
+
+def expected_thread(post_id):
+    # the thread as rendered by the database queries of the original route
+    with app.app_context():
+        post = Post.query.filter_by(id=post_id).first()
+        tweets, latest = [], {}
+        for post in Post.query.filter_by(thread_id=post.thread_id).order_by(Post.id):
+            username = User_mgmt.query.filter_by(id=post.user_id).first().username
+            tweets.append(f"@{username} - {post.tweet}\n")
+            latest[username] = max(latest.get(username, post.id), post.id)
+    return {"tweets": tweets, "latest_post": latest}
+
+
+def post_thread(api, post_id):
+    return api.call("/post_thread", {"post_id": post_id})
+
+
+def test_thread_matches_the_database(api, thread):
+    users, tid, posts = thread
+
+    cold = post_thread(api, posts["carol on bob"])
+    assert {key: cold[key] for key in ("tweets", "latest_post")} == expected_thread(posts["root"])
+    depths = {post["tweet"]: (post["depth"], post["parent"]) for post in cold["posts"]}
+    assert depths == {
+        "the root post": (0, None),
+        "the comment of bob on root": (1, posts["root"]),
+        "the comment of carol on bob": (2, posts["bob on root"]),
+        "the comment of alice on carol": (3, posts["carol on bob"]),
+        "the comment of carol on root": (1, posts["root"]),
+    }
+
+    # a comment appended to the cached thread
+    api.comment(users["bob"], posts["alice on carol"], tid, text="the last comment of bob")
+    warm = post_thread(api, posts["root"])
+    assert {key: warm[key] for key in ("tweets", "latest_post")} == expected_thread(posts["root"])
+    assert warm["posts"][-1]["depth"] == 4
+
+    # and the same thread rebuilt from the database
+    thread_store.reset()
+    assert post_thread(api, posts["root"]) == warm
+
+
+def test_threads_are_evicted(api, thread, monkeypatch):
+    _, _, posts = thread
+    monkeypatch.setattr(thread_store, "max_threads", 1)
+    with app.app_context():
+        other = Post.query.filter_by(tweet="a post in another thread").first().id
+
+    first = post_thread(api, posts["root"])
+    post_thread(api, other)
+
+    assert list(thread_store.threads) == [other]
+    assert post_thread(api, posts["root"]) == first
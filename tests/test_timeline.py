@@ -0,0 +1,65 @@
+import pytest
+
+
+@pytest.fixture
+def timeline(api):
+    """
+    A user with five posts, one of them liked and commented.
+    """
+    alice, bob = api.register("alice"), api.register("bob")
+    tid = api.round(0, 0)
+    for i in range(5):
+        api.post(alice, tid, text=f"post {i} of alice")
+    posts = api.call("/timeline", {"user_id": alice}, method="get")
+    api.call("/reaction", {"user_id": bob, "post_id": posts[-1]["post_id"], "type": "like", "tid": tid})
+    api.comment(bob, posts[-1]["post_id"], tid, text="a comment of bob")
+    return alice, bob
+
+
+def test_whole_timeline(api, timeline):
+    alice, _ = timeline
+    posts = api.call("/timeline", {"user_id": alice}, method="get")
+
+    assert [post["post"] for post in posts] == [f"post {i} of alice" for i in reversed(range(5))]
+    assert (posts[-1]["likes"], posts[-1]["comments"]) == (1, 1)
+    assert all(post["likes"] == post["comments"] == 0 for post in posts[:-1])
+
+
+def test_pages_follow_the_cursor(api, timeline):
+    alice, _ = timeline
+    whole = api.call("/timeline", {"user_id": alice}, method="get")
+
+    pages, cursor = [], None
+    while True:
+        page = api.call("/timeline", {"user_id": alice, "limit": 2, "before": cursor}, method="get")
+        pages.append(page["posts"])
+        cursor = page["next"]
+        if cursor is None:
+            break
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [post for page in pages for post in page] == whole
+
+
+def test_a_full_last_page_ends_with_an_empty_one(api, timeline):
+    alice, _ = timeline
+    page = api.call("/timeline", {"user_id": alice, "limit": 5}, method="get")
+    assert len(page["posts"]) == 5
+
+    assert api.call("/timeline", {"user_id": alice, "before": page["next"]}, method="get") == {
+        "posts": [], "next": None
+    }
+
+
+def test_empty_timeline(api, timeline):
+    _, bob = timeline
+
+    assert api.call("/timeline", {"user_id": bob + 1}, method="get") == []
+    assert api.call("/timeline", {"user_id": bob + 1, "limit": 3}, method="get") == {"posts": [], "next": None}
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_invalid_limit(api, timeline, limit):
+    alice, _ = timeline
+
+    assert api.call("/timeline", {"user_id": alice, "limit": limit}, method="get")["status"] == 400
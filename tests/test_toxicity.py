@@ -0,0 +1,68 @@
+import pytest
+
+from y_server import app
+from y_server.modals import Post, Post_Toxicity
+from y_server.utils.toxicity_worker import LocalScorer, toxicity_worker
+
+
+class FailingScorer(LocalScorer):
+    """
+    Local scorer failing on the texts containing "boom".
+    """
+
+    def score(self, texts):
+        if any("boom" in text for text in texts):
+            raise ValueError("scorer failure")
+        return super().score(texts)
+
+
+@pytest.fixture
+def failing_scorer():
+    previous = toxicity_worker.scorer
+    toxicity_worker.set_scorer(FailingScorer())
+    yield
+    toxicity_worker.set_scorer(previous)
+
+
+def toxicity():
+    with app.app_context():
+        rows = Post_Toxicity.query.join(Post, Post.id == Post_Toxicity.post_id).with_entities(
+            Post.tweet, Post_Toxicity.toxicity
+        )
+        return {tweet: value for tweet, value in rows}
+
+
+def test_local_scorer():
+    toxic, neutral = LocalScorer().score(["You are an idiot!", "What a nice day"])
+
+    assert toxic["toxicity"] == pytest.approx(0.25)
+    assert set(toxic) == {"toxicity", "severe_toxicity", "identity_attack", "insult", "profanity", "threat",
+                          "sexually_explicit", "flirtation"}
+    assert neutral["toxicity"] == 0
+
+
+def test_drain_stores_the_scores(api):
+    uid = api.register("alice")
+    tid = api.round(0, 0)
+    api.post(uid, tid, text="what a nice day")
+    api.post(uid, tid, text="you are an idiot")
+
+    res = api.call("/drain_toxicity", {"timeout": 10})
+
+    assert res["status"] == 200 and res["queued"] == 0 and res["in_flight"] == 0
+    assert toxicity() == {"what a nice day": 0, "you are an idiot": 0.25}
+
+
+def test_failing_item_does_not_lose_the_batch(api, failing_scorer):
+    before = toxicity_worker.metrics()
+    uid = api.register("alice")
+    tid = api.round(0, 0)
+    for text in ("first post", "boom post", "last post"):
+        api.post(uid, tid, text=text)
+
+    res = api.call("/drain_toxicity", {"timeout": 10})
+
+    assert set(toxicity()) == {"first post", "last post"}
+    assert res["failed"] == before["failed"] + 1
+    assert res["processed"] == before["processed"] + 2
+    assert "scorer failure" in res["last_error"]
@@ -0,0 +1,65 @@
+import pytest
+
+from y_server import app
+from y_server.modals import User_mgmt
+from y_server.utils.user_cache import ATTRIBUTES, user_cache
+
+
+@pytest.fixture
+def users(api):
+    """
+    Users and news pages, updated and churned through the routes.
+    """
+    users = {
+        "alice": api.register("alice", leaning="left"),
+        "bob": api.register("bob", leaning="right", susceptibility=0.9),
+        "left news": api.register("left news", leaning="left", is_page=1),
+        "right news": api.register("right news", leaning="right", is_page=1),
+    }
+    # the cache is loaded, then follows the writes
+    with app.app_context():
+        assert user_cache.user_ids() == [user.id for user in User_mgmt.query.order_by(User_mgmt.id)]
+    users["carol"] = api.register("carol", leaning="left")
+    api.call("/update_user", {"username": "alice", "email": "alice@y.social", "recsys_type": "rchrono"})
+    api.call("/update_user", {"username": "carol", "email": "carol@y.social", "frecsys_type": "jaccard"})
+
+    tid = api.round(0, 0)
+    for name in ("alice", "bob", "carol"):
+        api.post(users[name], tid, text=f"a post of {name}")
+    api.call("/churn", {"n_users": 1, "left_on": tid})
+    return users
+
+
+def database():
+    return {
+        user.id: {attribute: getattr(user, attribute) for attribute in ATTRIBUTES} for user in User_mgmt.query
+    }
+
+
+def cached(user_ids):
+    return {
+        user_id: {attribute: user_cache.get(attribute, user_id) for attribute in ATTRIBUTES} for user_id in user_ids
+    }
+
+
+def test_cache_follows_the_writes(api, users):
+    with app.app_context():
+        stored = database()
+    assert cached(stored) == stored
+    assert stored[users["alice"]]["recsys_type"] == "rchrono" and stored[users["carol"]]["frecsys_type"] == "jaccard"
+    assert stored[users["alice"]]["left_on"] is not None
+
+    # the same columns loaded from the database
+    user_cache.reset()
+    assert cached(stored) == stored
+
+
+def test_derived_views(api, users):
+    with app.app_context():
+        active = [user.id for user in User_mgmt.query.filter_by(left_on=None, is_page=0).order_by(User_mgmt.id)]
+    assert active[-2:] == [users["bob"], users["carol"]]
+    assert user_cache.active_users() == active
+    assert user_cache.news_pages("left") == [users["left news"]]
+    assert user_cache.news_pages("right") == [users["right news"]]
+    assert user_cache.user_id("carol") == users["carol"] and user_cache.user_id("nobody") is None
+    assert user_cache.bulk("leaning", [users["bob"], 1000, users["alice"]]) == ["right", None, "left"]
@@ -0,0 +1,70 @@
+import json
+import threading
+
+from sqlalchemy import text
+
+from y_server import app, db
+from y_server.modals import Hashtags, Post_hashtags
+from y_server.utils import vocabulary
+
+TAGS = ["#climate", "#news", "#vote"]
+
+
+def test_concurrent_posts_share_the_hashtag_ids(api):
+    users = [api.register(f"user{i}") for i in range(8)]
+    tid = api.round(0, 0)
+    start = threading.Barrier(len(users))
+    errors = []
+
+    def publish(uid):
+        client = app.test_client()
+        start.wait()
+        for i in range(3):
+            response = client.post("/post", data=json.dumps({
+                "user_id": uid, "tweet": f"post {i} of {uid}", "emotions": [], "hashtags": TAGS, "mentions": [],
+                "tid": tid, "src_language": "english", "tgt_language": "english",
+            }))
+            if response.status_code != 200:
+                errors.append(response.data)
+
+    threads = [threading.Thread(target=publish, args=(uid,)) for uid in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with app.app_context():
+        ids = {tag.hashtag: tag.id for tag in Hashtags.query.filter(Hashtags.hashtag.in_(TAGS))}
+        assert Hashtags.query.filter(Hashtags.hashtag.in_(TAGS)).count() == len(TAGS)
+        # every post refers to the single row of each hashtag
+        used = db.session.query(Post_hashtags.hashtag_id).distinct()
+        assert sorted(hashtag_id for hashtag_id, in used) == sorted(ids.values())
+        assert Post_hashtags.query.count() == len(users) * 3 * len(TAGS)
+        assert vocabulary.hashtags.lookup(TAGS, create=False) == [ids[tag] for tag in TAGS]
+
+
+def test_names_added_by_another_process(api):
+    with app.app_context():
+        vocabulary.hashtags.lookup([])
+        # a row inserted behind the loaded vocabulary
+        db.session.execute(text("INSERT INTO hashtags (hashtag) VALUES ('#elsewhere')"))
+        db.session.commit()
+        key = db.session.query(Hashtags.id).filter_by(hashtag="#elsewhere").scalar()
+
+        assert vocabulary.hashtags.lookup(["#elsewhere", "#elsewhere"]) == [key, key]
+        db.session.commit()
+        assert Hashtags.query.filter_by(hashtag="#elsewhere").count() == 1
+        assert vocabulary.hashtags.name(key) == "#elsewhere"
+
+
+def test_rolled_back_names_are_forgotten(api):
+    with app.app_context():
+        key = vocabulary.hashtags.lookup(["#draft"])[0]
+        db.session.rollback()
+
+        assert vocabulary.hashtags.id("#draft") is None
+        assert vocabulary.hashtags.name(key) is None
+        created = vocabulary.hashtags.lookup(["#draft"])[0]
+        db.session.commit()
+        assert vocabulary.hashtags.id("#draft") == created
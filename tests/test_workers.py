@@ -0,0 +1,150 @@
+"""
+The multi-worker mode: y_server_run.py serving a throwaway experiment with several gunicorn workers.
+"""
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+from conftest import CONFIG, ROOT
+
+pytest.importorskip("gunicorn")
+
+WORKERS = 3
+# enough requests to reach every worker
+REPEAT = 12
+
+
+@pytest.fixture(scope="module")
+def workdir(tmp_path_factory):
+    return tmp_path_factory.mktemp("workers")
+
+
+@pytest.fixture(scope="module")
+def server(workdir):
+    """
+    URL of a server running several workers.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    os.makedirs(workdir / "config_files")
+    config = {
+        **CONFIG,
+        "port": port,
+        "database_uri": f"sqlite:///{workdir / 'workers.db'}",
+        "localize_posts": "False",
+        "round_jobs": ["rollup"],
+    }
+    with open(workdir / "config_files" / "exp_config.json", "w") as f:
+        json.dump(config, f)
+    shutil.copyfile(os.path.join(ROOT, "config_files", "locales.json"), workdir / "config_files" / "locales.json")
+
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "y_server_run.py"), "--workers", str(WORKERS), "--timeout", "10"],
+        cwd=workdir, env={**os.environ, "PYTHONPATH": ROOT}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            urllib.request.urlopen(f"{url}/current_time", timeout=1)
+            break
+        except OSError:
+            time.sleep(0.1)
+    else:
+        process.kill()
+        pytest.fail("the multi-worker server did not start")
+
+    yield url
+    process.terminate()
+    process.wait(30)
+
+
+def call(url, path, payload=None, method="POST"):
+    request = urllib.request.Request(
+        f"{url}{path}", data=json.dumps(payload or {}).encode("utf-8"), method=method
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def register(url, name):
+    data = {
+        "name": name, "email": f"{name}@y.social", "password": "pwd", "leaning": "neutral", "age": 30,
+        "user_type": "user", "oe": "a", "co": "a", "ex": "a", "ag": "a", "ne": "a", "language": "english",
+        "education_level": "high school", "joined_on": 0, "round_actions": 3, "owner": "tests",
+        "gender": "female", "nationality": "italian", "toxicity": "no", "original_id": None,
+        "toxicity_post_avg": 0, "toxicity_post_var": 0, "toxicity_comment": 0, "activity_post": 0,
+        "activity_comment": 0, "susceptibility": 0.5,
+    }
+    call(url, "/register", data)
+    return call(url, "/get_user_id", {"username": name})["id"]
+
+
+def post(url, user_id, tid, text, mentions=()):
+    call(url, "/post", {
+        "user_id": user_id, "tweet": text, "emotions": [], "hashtags": [], "mentions": list(mentions),
+        "tid": tid, "src_language": "english", "tgt_language": "english",
+    })
+
+
+def test_workers_see_the_writes_of_the_others(server):
+    alice, bob, carol = (register(server, name) for name in ("alice", "bob", "carol"))
+    tid = call(server, "/update_time", {"day": 0, "round": 0})["id"]
+    post(server, carol, tid, "a post of carol")
+
+    # every worker reads the posts, follows and mentions written by the others within the round
+    call(server, "/follow", {"user_id": alice, "target": bob, "action": "follow", "tid": tid})
+    for i in range(REPEAT):
+        post(server, bob, tid, f"post {i} of bob", mentions=["@alice"] if i == 0 else [])
+        feed = call(server, "/read", {"uid": alice, "mode": "rchrono_followers", "limit": 1, "visibility_rounds": 10})
+        latest = call(server, "/read", {"uid": carol, "mode": "rchrono", "limit": 1, "visibility_rounds": 10})
+        assert feed == latest[:1]
+        # the follow is not repeated
+        call(server, "/follow", {"user_id": alice, "target": bob, "action": "follow", "tid": tid})
+    assert len(call(server, "/followers", {"user_id": alice}, method="GET")) == 1
+
+    mentions = [
+        call(server, "/read_mentions", {"uid": alice, "visibility_rounds": 10}) for _ in range(REPEAT)
+    ]
+    # a mention is served once
+    assert sum(len(ids) for ids in mentions if isinstance(ids, list)) == 1
+
+
+def test_round_jobs_are_reported_by_every_worker(server):
+    tid = call(server, "/update_time", {"day": 0, "round": 1})["id"]
+
+    for _ in range(100):
+        state = call(server, "/round_jobs", {"round": tid})
+        if state.get("finished"):
+            break
+        time.sleep(0.1)
+    states = [call(server, "/round_jobs", {"round": tid}) for _ in range(REPEAT)]
+
+    assert all(state["status"] == 200 and state["state"] == "done" for state in states)
+
+
+def test_drains_reach_every_worker(server, workdir):
+    users = [register(server, name) for name in ("dave", "erin")]
+    tid = call(server, "/update_time", {"day": 0, "round": 2})["id"]
+    for i in range(REPEAT):
+        post(server, users[i % 2], tid, f"post {i} to score")
+
+    assert call(server, "/drain_toxicity", {"timeout": 20})["status"] == 200
+
+    # the posts received by every worker are scored
+    database = sqlite3.connect(workdir / "workers.db")
+    try:
+        posts = database.execute("SELECT count(*) FROM post").fetchone()[0]
+        scored = database.execute("SELECT count(*) FROM post_toxicity").fetchone()[0]
+    finally:
+        database.close()
+    assert scored == posts
@@ -13,7 +13,8 @@ parser.add_argument(
     default=f"config_files{os.sep}exp_config.json",
     help="JSON file describing the simulation configuration",
 )
-args = parser.parse_args()
+# the other arguments belong to the launcher (e.g., the serving options of y_server_run.py)
+args = parser.parse_known_args()[0]
 config_file = args.config_file
 
 try:
@@ -25,7 +26,7 @@ try:
         os.mkdir(f".{os.sep}experiments")
 
 
-    if (
+    if "database_uri" not in config and (
         not os.path.exists(f"experiments{os.sep}{config['name']}.db")
         or config["reset_db"] == "True"
     ):
@@ -33,14 +34,23 @@ try:
         shutil.copyfile(
             f"data_schema{os.sep}database_clean_server.db", f"experiments{os.sep}{config['name']}.db"
         )
+        # the write-ahead log left by a previous run belongs to the replaced database
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(f"experiments{os.sep}{config['name']}.db{suffix}"):
+                os.remove(f"experiments{os.sep}{config['name']}.db{suffix}")
 
     app = Flask(__name__)
     app.config["SECRET_KEY"] = "4YrzfpQ4kGXjuP6w"
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///../experiments/{config['name']}.db"
+    # the experiment database: a copy of the clean template, or any SQLAlchemy URI (e.g., PostgreSQL)
+    app.config["SQLALCHEMY_DATABASE_URI"] = config.get(
+        "database_uri", f"sqlite:///../experiments/{config['name']}.db"
+    )
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db = SQLAlchemy(app)
 
 except: # Y Web subprocess
+    config = {}
+
     # base path
     BASE_DIR = os.path.dirname(os.path.abspath(__file__)).split("y_server")[0]
 
@@ -57,4 +67,54 @@ except: # Y Web subprocess
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     db = SQLAlchemy(app)
 
+# in-memory index of the recent posts serving the /read feeds
+app.config["post_index"] = str(config.get("post_index", "True")) == "True"
+app.config["post_index_rounds"] = int(config.get("post_index_rounds", 72))
+
+# toxicity scorer of the background worker: "perspective" (requires perspective_api) or "local"
+app.config["toxicity_scorer"] = config.get("toxicity_scorer", "perspective")
+
+# processes scoring the large /sentiment_batch requests, started by y_server_run.py (0: in the request thread)
+app.config["sentiment_processes"] = int(config.get("sentiment_processes", 0))
+
+# translate the new posts in the background to fill their localized text
+app.config["localize_posts"] = str(config.get("localize_posts", "False")) == "True"
+
+# ordered jobs run in the background when the simulation moves to a new round (see utils/round_jobs.py)
+app.config["round_jobs"] = config.get("round_jobs", [])
+
+# seed of the reproducible random selections (random feeds, searches, mentions and suggestions)
+app.config["seed"] = config.get("seed", 0)
+
+# SQLite storage profile: pragmas set on every connection (see utils/storage.py) and single writer mode,
+# WAL journal (readers never wait for the writer) and lock waits instead of errors unless configured otherwise
+sqlite = {"journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 30000, **config.get("sqlite", {})}
+app.config["sqlite"] = {
+    pragma: sqlite.get(pragma)
+    for pragma in ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store", "busy_timeout")
+}
+app.config["sqlite"]["single_writer"] = str(sqlite.get("single_writer", "False")) == "True"
+
+# connection pool of the database servers (see utils/storage.py, SQLite databases use the default pool)
+app.config["pool"] = config.get("pool", {})
+
+# number of server processes sharing the database, set by y_server_run.py (see utils/serving.py)
+app.config["workers"] = 1
+
+from y_server.utils import storage
+
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = storage.engine_options()
 from y_server.routes import *
+from y_server.utils.opinion_store import sync_latest_opinions
+from y_server.utils.post_counters import sync_post_counters
+from y_server.utils import vocabulary
+from y_server.utils.clock import clock
+
+with app.app_context():
+    # create the tables and the indexes missing from the database (e.g., added after the template)
+    storage.bootstrap(reset="database_uri" in config and config.get("reset_db") == "True")
+    sync_latest_opinions()
+    sync_post_counters()
+    vocabulary.setup()
+    # the database may have been replaced since the last run
+    clock.reset()
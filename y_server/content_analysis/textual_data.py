@@ -1,13 +1,103 @@
+import hashlib
+import multiprocessing
+import os
+import signal
+import threading
+from collections import OrderedDict
 from nltk.sentiment import SentimentIntensityAnalyzer
 from perspective import PerspectiveAPI
 from y_server.modals import Post_Toxicity
 
+SENTIMENT_CACHE_SIZE = 50000
+# minimum number of texts scored by each process of the pool
+SENTIMENT_CHUNK_SIZE = 256
+
+__lock = threading.RLock()
+__analyzer = None
+__cache = OrderedDict()
+__pool = None
+__pool_pid = None
+__processes = None
+
+
+def sentiment_analyzer():
+    """
+    Get the VADER analyzer shared by the process (the lexicon is loaded once).
+
+    :return: the SentimentIntensityAnalyzer
+    """
+    global __analyzer
+    with __lock:
+        if __analyzer is None:
+            __analyzer = SentimentIntensityAnalyzer()
+        return __analyzer
+
 
 def vader_sentiment(text):
+    """
+    Compute the VADER sentiment of a text.
+
+    :param text: the text
+    :return: a dictionary with the pos, neg, neu and compound scores
+    """
+    return vader_sentiment_batch([text])[0]
+
+
+def start_sentiment_pool(processes):
+    """
+    Start the pool of processes scoring the large sentiment batches, once per server process.
+
+    The pool processes are forked from the caller, which must not be running other threads
+    yet (e.g., y_server_run.py starts it before serving, in each worker right after the fork).
+    Without a pool, or on the platforms that cannot fork, the batches are scored in the
+    calling thread.
+
+    :param processes: the number of processes, no pool if less than 2
+    """
+    global __pool, __pool_pid, __processes
+    with __lock:
+        if __pool_pid == os.getpid() or processes < 2 or "fork" not in multiprocessing.get_all_start_methods():
+            return
+        # the processes share the lexicon loaded here; a pool inherited from the parent process belongs to the parent
+        sentiment_analyzer()
+        __pool = multiprocessing.get_context("fork").Pool(processes, initializer=__ignore_interrupts)
+        __pool_pid = os.getpid()
+        __processes = processes
+
 
-    sia = SentimentIntensityAnalyzer()
-    sentiment = sia.polarity_scores(text)
-    return sentiment
+def vader_sentiment_batch(texts):
+    """
+    Compute the VADER sentiment of a list of texts.
+    Scores are memoized in a bounded LRU cache keyed by the hash of the text.
+
+    :param texts: the list of texts
+    :return: the list of sentiments, in the same order
+    """
+    keys = [hashlib.sha1(text.encode("utf-8")).digest() for text in texts]
+
+    with __lock:
+        found = {}
+        for key in keys:
+            if key in __cache and key not in found:
+                __cache.move_to_end(key)
+                found[key] = __cache[key]
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing[key] = text
+
+    if len(missing) > 0:
+        scores = __score(list(missing.values()))
+        with __lock:
+            for key, sentiment in zip(missing, scores):
+                found[key] = sentiment
+                __cache[key] = sentiment
+                __cache.move_to_end(key)
+            while len(__cache) > SENTIMENT_CACHE_SIZE:
+                __cache.popitem(last=False)
+
+    return [dict(found[key]) for key in keys]
 
 
 def toxicity(text, api_key, post_id, db):
@@ -37,3 +127,24 @@ def toxicity(text, api_key, post_id, db):
             print(e)
             return
 
+
+def __score_chunk(texts):
+    sia = sentiment_analyzer()
+    return [sia.polarity_scores(text) for text in texts]
+
+
+def __score(texts):
+    with __lock:
+        pool = __pool if __pool_pid == os.getpid() else None
+        processes = __processes
+    if pool is None or len(texts) < 2 * SENTIMENT_CHUNK_SIZE:
+        return __score_chunk(texts)
+
+    size = max(SENTIMENT_CHUNK_SIZE, -(-len(texts) // processes))
+    chunks = [texts[i:i + size] for i in range(0, len(texts), size)]
+    return [sentiment for scores in pool.map(__score_chunk, chunks) for sentiment in scores]
+
+
+def __ignore_interrupts():
+    # the server process handles Ctrl+C and stops the pool
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
@@ -40,6 +40,12 @@ class User_mgmt(UserMixin, db.Model):
     liked = db.relationship("Reactions", backref="liked_by", lazy=True)
 
 class Post(db.Model):
+    __table_args__ = (
+        db.Index("post_round", "round"),
+        db.Index("post_user_id", "user_id"),
+        db.Index("post_thread_id", "thread_id"),
+        db.Index("post_comment_to", "comment_to"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     tweet = db.Column(db.String(500), nullable=False)
     tweet_loc = db.Column(db.String(50), nullable=False)
@@ -48,17 +54,19 @@ class Post(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey("user_mgmt.id"), nullable=False)
     comment_to = db.Column(db.Integer, default=-1)
     thread_id = db.Column(db.Integer)
-    news_id = db.Column(db.String(50), db.ForeignKey("articles.id"), default=None)
+    news_id = db.Column(db.Integer, db.ForeignKey("articles.id"), default=None)
     image_id = db.Column(db.Integer(), db.ForeignKey("images.id"), default=None)
     shared_from = db.Column(db.Integer, default=-1)
 
 
 class Hashtags(db.Model):
+    __table_args__ = (db.Index("hashtags_hashtag", "hashtag", unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     hashtag = db.Column(db.String(20), nullable=False)
 
 
 class Emotions(db.Model):
+    __table_args__ = (db.Index("emotions_emotion", "emotion", unique=True),)
     id = db.Column(db.Integer, primary_key=True)
     emotion = db.Column(db.String(20), nullable=False)
 
@@ -70,12 +78,17 @@ class Post_emotions(db.Model):
 
 
 class Post_hashtags(db.Model):
+    __table_args__ = (
+        db.Index("post_hashtags_post_id", "post_id"),
+        db.Index("post_hashtags_hashtag_id", "hashtag_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
     hashtag_id = db.Column(db.Integer, db.ForeignKey("hashtags.id"), nullable=False)
 
 
 class Mentions(db.Model):
+    __table_args__ = (db.Index("mentions_user_answered_round", "user_id", "answered", "round"),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user_mgmt.id"), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
@@ -84,6 +97,7 @@ class Mentions(db.Model):
 
 
 class Reactions(db.Model):
+    __table_args__ = (db.Index("reactions_post_id", "post_id"),)
     id = db.Column(db.Integer, primary_key=True)
     round = db.Column(db.Integer, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user_mgmt.id"), nullable=False)
@@ -92,6 +106,7 @@ class Reactions(db.Model):
 
 
 class Follow(db.Model):
+    __table_args__ = (db.Index("follow_user_follower_round", "user_id", "follower_id", "round"),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user_mgmt.id"), nullable=False)
     follower_id = db.Column(db.Integer, db.ForeignKey("user_mgmt.id"), nullable=False)
@@ -142,6 +157,7 @@ class Voting(db.Model):
 
 
 class Interests(db.Model):
+    __table_args__ = (db.Index("interests_interest", "interest", unique=True),)
     iid = db.Column(db.Integer, primary_key=True)
     interest = db.Column(db.String(20), nullable=False)
 
@@ -154,6 +170,7 @@ class User_interest(db.Model):
 
 
 class Post_topics(db.Model):
+    __table_args__ = (db.Index("post_topics_post_id", "post_id"),)
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
     topic_id = db.Column(db.Integer, db.ForeignKey("interests.iid"), nullable=False)
@@ -174,6 +191,7 @@ class Article_topics(db.Model):
 
 class Post_Sentiment(db.Model):
     __tablename__ = "post_sentiment"
+    __table_args__ = (db.Index("post_sentiment_post_id", "post_id"),)
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user_mgmt.id"), nullable=False)
@@ -217,6 +235,7 @@ class Coalition_Opinion(db.Model):
 
 class User_opinions(db.Model):
     __tablename__ = "user_opinions"
+    __table_args__ = (db.Index("user_opinions_user_topic_round", "user_id", "topic_id", "round"),)
     id = db.Column(db.Integer, primary_key=True)
     score = db.Column(db.REAL, default=0) 
     score_llm = db.Column(db.REAL, default=0)
@@ -224,3 +243,27 @@ class User_opinions(db.Model):
     topic_id = db.Column(db.Integer, db.ForeignKey("interests.iid"), nullable=False)
     round = db.Column(db.Integer, nullable=False)
     description = db.Column(db.String(500), nullable=True)
+
+
+class User_opinions_latest(db.Model):
+    __tablename__ = "user_opinions_latest"
+    __table_args__ = (db.UniqueConstraint("user_id", "topic_id", name="user_opinions_latest_user_topic"),)
+    id = db.Column(db.Integer, primary_key=True)
+    score = db.Column(db.REAL, default=0)
+    score_llm = db.Column(db.REAL, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey("user_mgmt.id"), nullable=False)
+    topic_id = db.Column(db.Integer, db.ForeignKey("interests.iid"), nullable=False)
+    round = db.Column(db.Integer, nullable=False)
+    description = db.Column(db.String(500), nullable=True)
+
+
+class Post_counters(db.Model):
+    __tablename__ = "post_counters"
+    __table_args__ = (db.UniqueConstraint("post_id", name="post_counters_post"),)
+    id = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey("post.id"), nullable=False)
+    likes = db.Column(db.Integer, default=0)
+    dislikes = db.Column(db.Integer, default=0)
+    comments = db.Column(db.Integer, default=0)
+    shares = db.Column(db.Integer, default=0)
+    reactions = db.Column(db.Integer, default=0)
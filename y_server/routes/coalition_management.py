@@ -1,7 +1,8 @@
 import json
 from flask import request
 from y_server import app, db
-from y_server.modals import Coalitions, Coalition_Opinion, Interests
+from y_server.modals import Coalitions, Coalition_Opinion
+from y_server.utils import vocabulary
 
 @app.route("/set_coalition_opinion", methods=["POST"])
 def set_coalition_opinion():
@@ -21,19 +22,15 @@ def set_coalition_opinion():
         db.session.add(coalition_obj)
         db.session.commit()
 
-    # for each topic, set the coalition sentiment
-    for topic, score in topic_opinions.items():
-        # Create topic if it does not exist
-        topic_obj = Interests.query.filter_by(interest=topic).first()
-        if not topic_obj:
-            topic_obj = Interests(interest=topic)
-            db.session.add(topic_obj)
-            db.session.commit()
+    # Create the topics that do not exist
+    topic_ids = vocabulary.interests.lookup(topic_opinions.keys())
 
+    # for each topic, set the coalition sentiment
+    for (topic, score), topic_id in zip(topic_opinions.items(), topic_ids):
         # Set opinion
         coalition_opinion = Coalition_Opinion(
             coalition_id=coalition_obj.id, 
-            interest_id=topic_obj.iid, 
+            interest_id=topic_id, 
             score=score,
             description=topic_descriptions[topic])
         
@@ -5,23 +5,29 @@ from y_server import app, db
 from sqlalchemy import desc
 from sqlalchemy.sql.expression import func
 from y_server.modals import (
-    Hashtags,
     Post_hashtags,
-    Rounds,
     Post,
     Recommendations,
-    Follow,
     Reactions,
-    Mentions,
     User_mgmt,
-    Emotions,
-    Post_emotions,
     Post_topics,
     Post_Sentiment,
-    Interests,
+    Post_counters,
 )
-from y_server.content_analysis import vader_sentiment, toxicity
-from y_server.translate import translate
+from y_server.content_analysis import vader_sentiment, vader_sentiment_batch
+from y_server.utils.post_index import post_index
+from y_server.utils.hashtag_index import hashtag_index
+from y_server.utils.mention_queue import read_mentions
+from y_server.utils.follow_graph import follow_graph
+from y_server.utils.user_cache import user_cache
+from y_server.utils import ingestion, sampling, storage, vocabulary
+from y_server.utils.toxicity_worker import toxicity_worker
+from y_server.utils.localizer import localizer
+from y_server.utils.thread_store import thread_store
+from y_server.utils.post_counters import REACTIONS, count_reaction
+from y_server.utils.clock import clock
+from y_server.utils.feed_cache import feed_cache, feed_rng
+from y_server.utils.round_jobs import round_job
 
 
 @app.route("/read", methods=["POST"])
@@ -32,6 +38,76 @@ def read():
     :return: a json object with the post ids
     """
     data = json.loads(request.get_data())
+    uid, mode, limit, vround, fratio, articles = __feed_params(data)
+
+    # visibility
+    current_round = clock.round_id()
+    visibility = current_round - vround
+
+    # feed precomputed at the beginning of the round, if requested with the same parameters
+    res = feed_cache.get(current_round, uid, (mode, limit, vround, fratio, articles))
+    if res is None:
+        res = __feed(uid, mode, limit, fratio, visibility, articles, current_round)
+
+    # save recommendations
+    storage.insert(
+        Recommendations, [{"user_id": uid, "post_ids": "|".join([str(x) for x in res]), "round": current_round}]
+    )
+    db.session.commit()
+    return json.dumps(res)
+
+
+@app.route("/read_batch", methods=["POST"])
+def read_batch():
+    """
+    Return the candidate posts for a batch of users as filtered by the content recommendation system.
+
+    The request is a list of {uid, mode, limit, visibility_rounds, followers_ratio} objects:
+    the current round, the visible posts and the followed users are loaded once for the whole batch.
+
+    :return: a json list with the post ids of each request, in the same order
+    """
+    data = json.loads(request.get_data())
+    params = [__feed_params(spec) for spec in data]
+
+    # current round
+    current_round = clock.round_id()
+
+    # get followers of all the users of the batch
+    follower_ids = {
+        uid: list(follow_graph.following(uid) - {uid})
+        for uid, mode, _, _, _, _ in params
+        if mode in ("rchrono_followers", "rchrono_followers_popularity")
+    }
+
+    candidates = {}
+    res, recs = [], []
+    for uid, mode, limit, vround, fratio, articles in params:
+        visibility = current_round - vround
+        posts = feed_cache.get(current_round, uid, (mode, limit, vround, fratio, articles))
+        if posts is None:
+            posts = __feed(
+                uid, mode, limit, fratio, visibility, articles, current_round,
+                follower_ids=follower_ids.get(uid), candidates=candidates,
+            )
+        res.append(posts)
+        recs.append(
+            {"user_id": uid, "post_ids": "|".join([str(x) for x in posts]), "round": current_round}
+        )
+
+    # save recommendations
+    storage.insert(Recommendations, recs)
+    db.session.commit()
+    return json.dumps(res)
+
+
+def __feed_params(data):
+    """
+    Parse the parameters of a feed request.
+
+    :param data: the request data
+    :return: the user id, the mode, the limit, the visibility rounds, the followers ratio and the article flag
+    """
     limit = data["limit"]
     mode = data["mode"]
     vround = int(data["visibility_rounds"])
@@ -43,22 +119,127 @@ def read():
         fratio = float(data["followers_ratio"])
     except:
         fratio = 1
-    articles = False
-    if "article" in data:
-        articles = True
-        # get the user
-        us = User_mgmt.query.filter_by(id=uid).first()
+    articles = "article" in data
+    return uid, mode, limit, vround, fratio, articles
+
+
+def __feed(
+    uid, mode, limit, fratio, visibility, articles, current_round, follower_ids=None, candidates=None, rng=None
+):
+    """
+    Compute the feed of a user, from the post index when possible and from the database otherwise.
+
+    :param uid: the user id
+    :param mode: the recommendation mode
+    :param limit: the number of posts to return
+    :param fratio: the ratio of posts coming from followed users
+    :param visibility: the first visible round
+    :param articles: whether to restrict the feed to news articles
+    :param current_round: the current round id
+    :param follower_ids: the users followed by the user, loaded if not given
+    :param candidates: visible post ids by visibility round, shared across the feeds of a batch
+    :param rng: the random.Random generator of the random feeds, the global one if None
+    :return: the list of post ids
+    """
+    if app.config["post_index"] and not articles:
+        res = __read_indexed(mode, uid, limit, fratio, visibility, current_round, follower_ids, candidates, rng)
+        if res is not None:
+            return res
+
+    pages = []
+    if articles:
         # get news pages ids having the same user leaning
-        pages = User_mgmt.query.filter_by(is_page=1, leaning=us.leaning).all()
-        if pages is not None:
-            pages = [x.id for x in pages]
+        pages = user_cache.news_pages(user_cache.get("leaning", uid))
+
+    posts = __read_sql(mode, uid, limit, fratio, visibility, articles, pages, follower_ids, rng)
+
+    res = []
+    for post_type in posts:
+        for post in post_type:
+            try:
+                post_id = post.id if hasattr(post, "id") else post[0].id
+
+                if db.session.query(Post).filter_by(id=post_id).first() is not None:
+                    res.append(post_id)
+            except:
+                pass
+    return res
+
+
+def __read_indexed(
+    mode, uid, limit, fratio, visibility, current_round, follower_ids=None, candidates=None, rng=None
+):
+    """
+    Compute the feed of a user from the in-memory post index.
+
+    :param mode: the recommendation mode
+    :param uid: the user id
+    :param limit: the number of posts to return
+    :param fratio: the ratio of posts coming from followed users
+    :param visibility: the first visible round
+    :param current_round: the current round id
+    :param follower_ids: the users followed by the user, loaded if not given
+    :param candidates: visible post ids by visibility round, shared across the feeds of a batch
+    :param rng: the random.Random generator of the random feeds, the global one if None
+    :return: the list of post ids, None if the feed has to be computed on the database
+    """
+    if not post_index.loaded:
+        post_index.load(current_round)
+    else:
+        # the clock may have been advanced by another server process
+        post_index.advance(current_round)
+    if not post_index.covers(visibility):
+        return None
+
+    if mode == "rchrono":
+        return post_index.latest(visibility, 10, exclude=uid)
+
+    elif mode == "rchrono_popularity":
+        return post_index.popular(visibility, limit, exclude=uid)
+
+    elif mode in ("rchrono_followers", "rchrono_followers_popularity"):
+        if fratio < 1:
+            follower_posts_limit = int(limit * fratio)
+            additional_posts_limit = limit - follower_posts_limit
         else:
-            pages = []
+            follower_posts_limit = limit
+            additional_posts_limit = 0
 
-    # visibility
-    current_round = Rounds.query.order_by(desc(Rounds.id)).first()
-    visibility = current_round.id - vround
+        # get followers
+        if follower_ids is None:
+            follower_ids = list(follow_graph.following(uid) - {uid})
+
+        if mode == "rchrono_followers":
+            res = post_index.latest(visibility, follower_posts_limit, authors=follower_ids)
+        else:
+            res = post_index.popular(visibility, follower_posts_limit, authors=follower_ids)
+        if additional_posts_limit != 0:
+            res += post_index.latest(visibility, additional_posts_limit, exclude=uid)
+        return res
+
+    visible = None
+    if candidates is not None:
+        if candidates.get(visibility) is None:
+            candidates[visibility] = post_index.visible(visibility)
+        visible = candidates[visibility]
+    return post_index.sample(visibility, limit, exclude=uid, candidates=visible, rng=rng)
 
+
+def __read_sql(mode, uid, limit, fratio, visibility, articles, pages, follower_ids=None, rng=None):
+    """
+    Build the queries selecting the feed of a user.
+
+    :param mode: the recommendation mode
+    :param uid: the user id
+    :param limit: the number of posts to return
+    :param fratio: the ratio of posts coming from followed users
+    :param visibility: the first visible round
+    :param articles: whether to restrict the feed to news articles
+    :param pages: the ids of the news pages having the user leaning
+    :param follower_ids: the users followed by the user, loaded if not given
+    :param rng: the random.Random generator of the random feeds, the shared one if None
+    :return: the list of queries (or lists of posts) to read the posts from
+    """
     if mode == "rchrono":
         # get posts in reverse chronological order
         if articles:
@@ -81,24 +262,23 @@ def read():
         if articles:
             posts = [
                 (
-                    db.session.query(Post, func.count(Reactions.user_id).label("total"))
+                    db.session.query(Post, REACTIONS.label("total"))
+                    .join(Post_counters, Post_counters.post_id == Post.id)
                     .filter(
                         Post.round >= visibility,
                         Post.news_id != -1,
                         Post.user_id in pages,
+                        REACTIONS > 0,
                     )
-                    .join(Reactions)
-                    .group_by(Post)
                     .order_by(desc("total"), desc(Post.id))
                 ).limit(limit)
             ]
         else:
             posts = [
                 (
-                    db.session.query(Post, func.count(Reactions.user_id).label("total"))
-                    .filter(Post.round >= visibility, Post.user_id != uid)
-                    .join(Reactions)
-                    .group_by(Post)
+                    db.session.query(Post, REACTIONS.label("total"))
+                    .join(Post_counters, Post_counters.post_id == Post.id)
+                    .filter(Post.round >= visibility, Post.user_id != uid, REACTIONS > 0)
                     .order_by(desc("total"), desc(Post.id))
                 ).limit(limit)
             ]
@@ -112,8 +292,8 @@ def read():
             additional_posts_limit = 0
 
         # get followers
-        follower = Follow.query.filter_by(action="follow", user_id=uid)
-        follower_ids = [f.follower_id for f in follower if f.follower_id != uid]
+        if follower_ids is None:
+            follower_ids = list(follow_graph.following(uid) - {uid})
 
         # get posts from followers in reverse chronological order
         if articles:
@@ -155,6 +335,8 @@ def read():
                 )
 
             posts = [posts, additional_posts]
+        else:
+            posts = [posts]
 
     elif mode == "rchrono_followers_popularity":
         if fratio < 1:
@@ -165,29 +347,28 @@ def read():
             additional_posts_limit = 0
 
         # get followers
-        follower = Follow.query.filter_by(action="follow", user_id=uid)
-        follower_ids = [f.follower_id for f in follower if f.follower_id != uid]
+        if follower_ids is None:
+            follower_ids = list(follow_graph.following(uid) - {uid})
 
         # get posts from followers ordered by likes and reverse chronologically
         if articles:
             posts = (
-                db.session.query(Post, func.count(Reactions.user_id).label("total"))
-                .join(Reactions)
+                db.session.query(Post, REACTIONS.label("total"))
+                .join(Post_counters, Post_counters.post_id == Post.id)
                 .filter(
                     Post.round >= visibility,
                     Post.news_id != -1,
                     Post.user_id in pages,
+                    REACTIONS > 0,
                 )
-                .group_by(Post)
                 .order_by(desc("total"), desc(Post.id))
                 .limit(follower_posts_limit)
             )
         else:
             posts = (
-                db.session.query(Post, func.count(Reactions.user_id).label("total"))
-                .join(Reactions)
-                .filter(Post.round >= visibility, Post.user_id.in_(follower_ids))
-                .group_by(Post)
+                db.session.query(Post, REACTIONS.label("total"))
+                .join(Post_counters, Post_counters.post_id == Post.id)
+                .filter(Post.round >= visibility, Post.user_id.in_(follower_ids), REACTIONS > 0)
                 .order_by(desc("total"), desc(Post.id))
                 .limit(follower_posts_limit)
             )
@@ -207,43 +388,68 @@ def read():
                 )
 
             posts = [posts, additional_posts]
+        else:
+            posts = [posts]
 
     else:
-        # get posts in random order
+        # get posts in random order, sampled over the ids of the visible posts
+        low, high = db.session.query(func.min(Post.id), func.max(Post.id)).filter(Post.round >= visibility).one()
         if articles:
-            posts = [
-                (
-                    Post.query.filter(Post.round >= visibility, Post.news_id != -1, Post.user_id in pages)
-                    .order_by(func.random())
-                    .limit(limit)
-                )
-            ]
+            visible = Post.query.filter(Post.round >= visibility, Post.news_id != -1, Post.user_id in pages)
         else:
-            posts = [
-                (
-                    Post.query.filter(Post.round >= visibility, Post.user_id != uid)
-                    .order_by(func.random())
-                    .limit(limit)
-                )
-            ]
+            visible = Post.query.filter(Post.round >= visibility, Post.user_id != uid)
+        posts = [sampling.sample_rows(visible, Post.id, limit, low, high, rng=rng)]
 
-    res = []
-    for post_type in posts:
-        for post in post_type:
-            try:
-                post_id = post.id if hasattr(post, "id") else post[0].id
+    return posts
 
-                if db.session.query(Post).filter_by(id=post_id).first() is not None:
-                    res.append(post_id)
-            except:
-                pass
 
-    # save recommendations
-    current_round = Rounds.query.order_by(desc(Rounds.id)).first()
-    recs = Recommendations(user_id=uid, post_ids="|".join([str(x) for x in res]), round=current_round.id)
-    db.session.add(recs)
-    db.session.commit()
-    return json.dumps(res)
+@round_job("feeds")
+def precompute_feeds(current_round, limit=10, visibility_rounds=36, followers_ratio=1, article=False):
+    """
+    Precompute the feeds of the active users for a new round, with their recommendation mode.
+
+    Random feeds are drawn from a generator seeded with the experiment seed, the round and the
+    user id, so that they are reproducible. The writes committed while the feeds are computed
+    drop the ones they make stale. The feeds are not precomputed with several server
+    processes, whose writes would not invalidate them.
+
+    :param current_round: the new round
+    :param limit: the number of posts of each feed
+    :param visibility_rounds: the number of visible rounds
+    :param followers_ratio: the ratio of posts coming from followed users
+    :param article: whether to restrict the feeds to news articles
+    :return: the number of precomputed feeds
+    """
+    if app.config["workers"] > 1:
+        return {"feeds": 0}
+
+    uids = user_cache.active_users()
+    modes = user_cache.bulk("recsys_type", uids)
+    visibility = current_round - int(visibility_rounds)
+    fratio = float(followers_ratio)
+    seed = app.config["seed"]
+    feed_cache.begin()
+
+    feeds, candidates = {}, {}
+    for uid, mode in zip(uids, modes):
+        posts = __feed(
+            uid, mode, limit, fratio, visibility, article, current_round,
+            candidates=candidates, rng=feed_rng(seed, current_round, uid),
+        )
+        feeds[uid] = ((mode, limit, int(visibility_rounds), fratio, article), posts)
+    feed_cache.store(current_round, feeds)
+
+    return {"feeds": len(feeds)}
+
+
+@app.route("/feed_cache", methods=["GET"])
+def feed_cache_metrics():
+    """
+    Get the metrics of the precomputed feeds.
+
+    :return: a json object with the cached round, the number of feeds, hits and misses
+    """
+    return json.dumps({"status": 200, **feed_cache.metrics()})
 
 
 @app.route("/search", methods=["POST"])
@@ -251,51 +457,73 @@ def search():
     """
     Search posts based on the most recently used hashtags for the user.
 
+    The posts can be ranked by recency, by number of shared hashtags or sampled at random (default).
+
     :return: a json object with the post ids
     """
     data = json.loads(request.get_data())
     uid = int(data["uid"])
     vround = int(data["visibility_rounds"])
+    rank = data.get("rank", "random")
+    limit = int(data.get("limit", 10))
 
     # visibility
-    current_round = Rounds.query.order_by(desc(Rounds.id)).first()
-    visibility = current_round.id - vround
-
-    recent_user_hashtags = Hashtags.query.filter(
-        Hashtags.id
-        == db.session.query(Post_hashtags.hashtag_id).filter(
-            Post_hashtags.post_id
-            == db.session.query(Post.id).filter(
-                Post.user_id == uid, Post.round >= visibility
-            )
-        )
-    ).limit(10)
+    current_round = clock.round_id()
+    visibility = current_round - vround
 
-    if recent_user_hashtags is not None:
-        hashtag_ids = []
-        for hashtag in recent_user_hashtags:
-            hashtag_ids.append(hashtag.id)
+    if app.config["post_index"]:
+        if not hashtag_index.loaded:
+            hashtag_index.load(current_round)
+        else:
+            # the clock may have been advanced by another server process
+            hashtag_index.advance(current_round)
 
-        hashtag_ids = list(set(hashtag_ids))
+    if app.config["post_index"] and hashtag_index.covers(visibility):
+        hashtag_ids = hashtag_index.user_hashtags(uid, visibility, 10)
 
-        recent_posts_with_hashtags = (
-            Post_hashtags.query.filter(Post_hashtags.hashtag_id.in_(hashtag_ids))
-            .filter(
-                Post.id == Post_hashtags.post_id,
-                Post.user_id != uid,
-                Post.round >= visibility,
-            )
-            .order_by(func.random())
-            .limit(10)
-        )
+        if rank == "recency":
+            res = hashtag_index.latest(hashtag_ids, visibility, limit, exclude=uid)
+        elif rank == "overlap":
+            res = hashtag_index.overlap(hashtag_ids, visibility, limit, exclude=uid)
+        else:
+            res = sampling.sample(hashtag_index.candidates(hashtag_ids, visibility, exclude=uid), limit)
+        return json.dumps(res)
 
-        res = []
-        for post in recent_posts_with_hashtags:
-            res.append(post.post_id)
+    # hashtags of the most recent posts of the user
+    recent_user_hashtags = (
+        db.session.query(Post_hashtags.hashtag_id, func.max(Post.id).label("latest"))
+        .join(Post, Post.id == Post_hashtags.post_id)
+        .filter(Post.user_id == uid, Post.round >= visibility)
+        .group_by(Post_hashtags.hashtag_id)
+        .order_by(desc("latest"))
+        .limit(10)
+    )
+    hashtag_ids = [hashtag_id for hashtag_id, _ in recent_user_hashtags]
+
+    recent_posts_with_hashtags = (
+        db.session.query(Post_hashtags.post_id, func.count(Post_hashtags.hashtag_id).label("overlap"))
+        .join(Post, Post.id == Post_hashtags.post_id)
+        .filter(
+            Post_hashtags.hashtag_id.in_(hashtag_ids),
+            Post.user_id != uid,
+            Post.round >= visibility,
+        )
+        .group_by(Post_hashtags.post_id)
+    )
 
-        return json.dumps(res)
+    if rank == "recency":
+        res = [
+            post_id for post_id, _ in recent_posts_with_hashtags.order_by(desc(Post_hashtags.post_id)).limit(limit)
+        ]
+    elif rank == "overlap":
+        res = [
+            post_id
+            for post_id, _ in recent_posts_with_hashtags.order_by(desc("overlap"), desc(Post_hashtags.post_id)).limit(limit)
+        ]
+    else:
+        res = sampling.sample([post_id for post_id, _ in recent_posts_with_hashtags], limit)
 
-    json.dumps({"status": 404})
+    return json.dumps(res)
 
 
 @app.route("/read_mentions", methods=["POST"])
@@ -310,27 +538,43 @@ def read_mention():
     vround = int(data["visibility_rounds"])
 
     # visibility
-    current_round = Rounds.query.order_by(desc(Rounds.id)).first()
-    visibility = current_round.id - vround
-
-    mention = (
-        Mentions.query.filter(
-            Mentions.user_id == uid,
-            Mentions.round >= visibility,
-            Mentions.answered == 0,
-        )
-        .order_by(func.random())
-        .first()
-    )
+    current_round = clock.round_id()
+    visibility = current_round - vround
 
-    if mention is not None:
-        mention.answered = 1
-        db.session.commit()
-        return json.dumps([mention.post_id])
+    post_ids = read_mentions(uid, visibility, current_round)
+    db.session.commit()
+
+    if len(post_ids) > 0:
+        return json.dumps(post_ids)
 
     else:
         return json.dumps({"status": 404})
 
+
+@app.route("/read_mentions_batch", methods=["POST"])
+def read_mentions_batch():
+    """
+    Search for recent mentions for a batch of users.
+
+    The request is a list of {uid, visibility_rounds, limit} objects, limit (default 1) being
+    the number of mentions to consume for the user.
+
+    :return: a json list with the post ids mentioning each user, in the same order
+    """
+    data = json.loads(request.get_data())
+
+    # visibility
+    current_round = clock.round_id()
+
+    res = []
+    for spec in data:
+        visibility = current_round - int(spec["visibility_rounds"])
+        res.append(read_mentions(int(spec["uid"]), visibility, current_round, int(spec.get("limit", 1))))
+
+    db.session.commit()
+    return json.dumps(res)
+
+
 @app.route("/post", methods=["POST"])
 def add_post():
     """
@@ -355,9 +599,9 @@ def add_post():
     #text_en = translate(text, src_language, "english", translator="google")
     sentiment = vader_sentiment(text)
 
-    #text_loc = translate(text, src_language, tgt_language)
+    # the localized text is filled in the background
+    body = text
     text = f"{text} {' '.join(hashtags)}".strip()
-    #text_loc = f"{text_loc} {' '.join(hashtags)}".strip()
 
     post = Post(
         tweet=text,
@@ -367,82 +611,29 @@ def add_post():
         comment_to=-1,
     )
 
-    db.session.add(post)
-    db.session.commit()
-
-    #toxicity(text, app.config["perspective_api"], post.id, db)
-
-    post.thread_id = post.id
-    db.session.commit()
-
     # if topics are provided by name, get ids
     if len(topic_names) > 0:
-        topic_ids = []
-        for topic_name in topic_names:
-            tp = Interests.query.filter_by(interest=topic_name).first()
-            if tp is None:
-                tp = Interests(interest=topic_name)
-                db.session.add(tp)
-                db.session.commit()
-                tp = Interests.query.filter_by(interest=topic_name).first()
-
-            topic_ids.append(tp.iid)
-
-    for topic_id in topic_ids:
-        tp = Post_topics(post_id=post.id, topic_id=topic_id)
-        db.session.add(tp)
-        db.session.commit()
-
-        post_sentiment = Post_Sentiment(
-            post_id=post.id,
-            user_id=user.id,
-            pos=sentiment["pos"],
-            neg=sentiment["neg"],
-            neu=sentiment["neu"],
-            compound=sentiment["compound"],
-            round=tid,
-            is_post=1,
-            topic_id=topic_id
-        )
-        db.session.add(post_sentiment)
-        db.session.commit()
-
-    for emotion in emotions:
-        if len(emotion) < 1:
-            continue
-
-        em = Emotions.query.filter_by(emotion=emotion).first()
-        if em is not None:
-            post_emotion = Post_emotions(post_id=post.id, emotion_id=em.id)
-            db.session.add(post_emotion)
-            db.session.commit()
-
-    for tag in hashtags:
-        if len(tag) < 4:
-            continue
-
-        ht = Hashtags.query.filter_by(hashtag=tag).first()
-        if ht is None:
-            ht = Hashtags(hashtag=tag)
-            db.session.add(ht)
-            db.session.commit()
-            ht = Hashtags.query.filter_by(hashtag=tag).first()
-
-        post_tag = Post_hashtags(post_id=post.id, hashtag_id=ht.id)
-        db.session.add(post_tag)
-        db.session.commit()
-
-    for mention in mentions:
-        if len(mention) < 1:
-            continue
-
-        us = User_mgmt.query.filter_by(username=mention.strip("@")).first()
+        topic_ids = ingestion.topic_ids(topic_names)
+
+    # existing users and not self
+    mentioned = [
+        us
+        for us in ingestion.mentioned_users([m for m in mentions if len(m) > 0])
+        if us is not None and us != user.id
+    ]
+
+    ingestion.ingest_post(
+        post,
+        topics=topic_ids,
+        sentiment=sentiment,
+        emotions=ingestion.emotion_ids(emotions),
+        hashtags=ingestion.hashtag_ids([tag for tag in hashtags if len(tag) >= 4]),
+        mentions=mentioned,
+        is_post=1,
+    )
 
-        # existing user and not self
-        if us is not None and us.id != user.id:
-            mn = Mentions(user_id=us.id, post_id=post.id, round=tid)
-            db.session.add(mn)
-            db.session.commit()
+    toxicity_worker.submit(post.id, text)
+    localizer.submit(post.id, body, src_language, tgt_language, suffix=" ".join(hashtags))
 
     return json.dumps({"status": 200})
 
@@ -485,10 +676,23 @@ def add_comment():
     #text_en = translate(text, src_language, "english", translator="google")
     sentiment = vader_sentiment(text)
     
-    #text_loc = translate(text, src_language, tgt_language)
-
+    # the localized text is filled in the background
+    body = text
     text = f"{' '.join(mentions)} {text} {' '.join(hashtags)}".strip()
-    #text_loc = f"{' '.join(mentions)} {text_loc} {' '.join(hashtags)}".strip()
+
+    mentions = [mention for mention in mentions if len(mention) > 0]
+    mentioned = ingestion.mentioned_users(mentions)
+
+    # drop the mentions of unknown users from the comment
+    stripped = False
+    for mention, us in zip(mentions, mentioned):
+        if us is None:
+            text = text.replace(mention, "").strip()
+            stripped = True
+
+    # more than one word must be left once the unknown mentions are dropped
+    if stripped and len(text.split(" ")) <= 1:
+        return json.dumps({"status": 400, "error": "Comment not stored: a single word is left once the unknown mentions are dropped"})
 
     new_post = Post(
         tweet=text,
@@ -499,80 +703,31 @@ def add_comment():
         thread_id=post.thread_id,
     )
 
-    db.session.add(new_post)
-    db.session.commit()
-
-    #toxicity(text, app.config["perspective_api"], new_post.id, db)
-
-    post_topics = Post_topics.query.filter_by(post_id=post.thread_id).all()
-    for topic in post_topics:
-        # Add post topic
-        tp = Post_topics(post_id=new_post.id, topic_id=topic.topic_id)
-        db.session.add(tp)
-        db.session.commit()
-
-        # Add sentiment to the comment
-        post_sentiment = Post_Sentiment(
-            post_id=new_post.id,
-            user_id=user.id,
-            pos=sentiment["pos"],
-            neg=sentiment["neg"],
-            neu=sentiment["neu"],
-            compound=sentiment["compound"],
-            sentiment_parent=sentiment_parent,
-            round=tid,
-            is_comment=1,
-            topic_id=topic.topic_id
-        )
-        db.session.add(post_sentiment)
-        db.session.commit()
-
-    for emotion in emotions:
-        if len(emotion) < 1:
-            continue
-
-        em = Emotions.query.filter_by(emotion=emotion).first()
-        if em is not None:
-            post_emotion = Post_emotions(post_id=new_post.id, emotion_id=em.id)
-            db.session.add(post_emotion)
-            db.session.commit()
-
-    for tag in hashtags:
-        if len(tag) < 1:
-            continue
-
-        ht = Hashtags.query.filter_by(hashtag=tag).first()
-        if ht is None:
-            ht = Hashtags(hashtag=tag)
-            db.session.add(ht)
-            db.session.commit()
-            ht = Hashtags.query.filter_by(hashtag=tag).first()
-
-        post_tag = Post_hashtags(post_id=new_post.id, hashtag_id=ht.id)
-        db.session.add(post_tag)
-        db.session.commit()
-
-    for mention in mentions:
-        if len(mention) < 1:
-            continue
-
-        us = User_mgmt.query.filter_by(username=mention.strip("@")).first()
-        if us is not None:
-            mn = Mentions(user_id=us.id, post_id=new_post.id, round=tid)
-            db.session.add(mn)
-            db.session.commit()
-        else:
-            text = text.replace(mention, "")
-
-            # update post
-            post.tweet = text.lstrip().rstrip()
+    topics = [
+        topic_id
+        for (topic_id,) in db.session.query(Post_topics.topic_id).filter_by(post_id=post.thread_id)
+    ]
+
+    ingestion.ingest_post(
+        new_post,
+        topics=topics,
+        sentiment=sentiment,
+        emotions=ingestion.emotion_ids(emotions),
+        hashtags=ingestion.hashtag_ids([tag for tag in hashtags if len(tag) >= 1]),
+        mentions=[us for us in mentioned if us is not None],
+        sentiment_parent=sentiment_parent,
+        is_comment=1,
+    )
 
-            # more than one word
-            if len(post.tweet.split(" ")) > 1:
-                db.session.commit()
-            else:
-                db.session.delete(post)
-                db.session.commit()
+    toxicity_worker.submit(new_post.id, text)
+    localizer.submit(
+        new_post.id,
+        body,
+        src_language,
+        tgt_language,
+        prefix=" ".join(m for m, us in zip(mentions, mentioned) if us is not None),
+        suffix=" ".join(hashtags),
+    )
 
     return json.dumps({"status": 200})
 
@@ -582,30 +737,34 @@ def post_thread():
     """
     Get the thread of a post.
 
-    :return: a json object with the thread
+    :return: a json object with the thread lines, the latest post of each author and the posts with their parent and depth
     """
     data = json.loads(request.get_data())
     post_id = data["post_id"]
 
     post = Post.query.filter_by(id=post_id).first()
-    thread_id = Post.query.filter_by(thread_id=post.thread_id)
+    thread = thread_store.get(post.thread_id)
 
-    tweets = []
-    author_latest_post = {}
+    return json.dumps(
+        {"tweets": thread["lines"], "latest_post": thread["latest_post"], "posts": thread["posts"]}
+    )
 
-    for post in thread_id:
-        user = post.user_id
-        username = User_mgmt.query.filter_by(id=user).first().username
-        tweets.append(f"@{username} - {post.tweet}\n")
 
-        # Save post id for the author if most recent
-        if username not in author_latest_post:
-            author_latest_post[username] = post.id
-        else:
-            if post.id > author_latest_post[username]:
-                author_latest_post[username] = post.id
+@app.route("/sentiment_batch", methods=["POST"])
+def sentiment_batch():
+    """
+    Compute the sentiment of a list of texts, e.g., to pre-score the texts of the next posts.
+
+    Large batches are spread over the sentiment_processes of the server.
+
+    :return: a json object with the sentiments, in the same order
+    """
+    data = json.loads(request.get_data())
+    texts = data["texts"]
+
+    sentiments = vader_sentiment_batch(texts)
 
-    return json.dumps({"tweets": tweets, "latest_post": author_latest_post})
+    return json.dumps({"sentiments": sentiments})
 
 
 @app.route("/get_sentiment", methods=["POST", "GET"])
@@ -622,8 +781,8 @@ def get_sentiment():
     res = []
 
     for interest in interests:
-        topic = Interests.query.filter_by(interest=interest).first()
-        post_sentiment = Post_Sentiment.query.filter_by(user_id=user_id, topic_id=topic.iid).order_by(desc(Post_Sentiment.id)).first()
+        topic_id = vocabulary.interests.id(interest)
+        post_sentiment = Post_Sentiment.query.filter_by(user_id=user_id, topic_id=topic_id).order_by(desc(Post_Sentiment.id)).first()
         if post_sentiment is not None:
             # thresholding compound
             if post_sentiment.compound > 0.05:
@@ -672,10 +831,11 @@ def add_reaction():
     react = Reactions(post_id=post_id, user_id=user.id, round=tid, type=rtype)
 
     db.session.add(react)
+    count_reaction(int(post_id), rtype)
     try:
         db.session.commit()
     except:
-        pass
+        db.session.rollback()
 
     # get compound sentiment of post
     post_sentiment = Post_Sentiment.query.filter_by(post_id=int(post_id)).all()
@@ -723,9 +883,9 @@ def get_post_topics():
 
     res = []
     for topic in post_topics:
-        tp = Interests.query.filter_by(iid=topic.topic_id).first()
-        if tp is not None:
-            res.append({"id": topic.topic_id, "name": tp.interest})
+        name = vocabulary.interests.name(topic.topic_id)
+        if name is not None:
+            res.append({"id": topic.topic_id, "name": name})
 
     return json.dumps(res)
 
@@ -1,17 +1,11 @@
 import json
 from flask import request
 from y_server import app, db
-from y_server.modals import (
-    Images,
-    Post,
-    Emotions,
-    Post_emotions,
-    Hashtags,
-    Post_hashtags,
-    Post_Sentiment,
-)
+from y_server.modals import Images, Post
 
-from y_server.content_analysis import vader_sentiment, toxicity
+from y_server.content_analysis import vader_sentiment
+from y_server.utils import ingestion
+from y_server.utils.toxicity_worker import toxicity_worker
 
 
 @app.route("/comment_image", methods=["POST"])
@@ -43,66 +37,27 @@ def post_image():
             article_id=article_id,
         )
         db.session.add(image)
-        db.session.commit()
-
-    # get image id
-    image_id = Images.query.filter_by(url=image_url).first().id
+        db.session.flush()
 
     post = Post(
         tweet=text,
         round=tid,
         user_id=account_id,
-        image_id=image_id,
+        image_id=image.id,
         comment_to=-1,
     )
 
-    db.session.add(post)
-    db.session.commit()
-
     sentiment = vader_sentiment(text)
 
-    toxicity(text, app.config["perspective_api"], post.id, db)
-
-    post_sentiment = Post_Sentiment(
-        post_id=post.id,
-        user_id=account_id,
-        pos=sentiment["pos"],
-        neg=sentiment["neg"],
-        neu=sentiment["neu"],
-        compound=sentiment["compound"],
-        round=tid,
+    ingestion.ingest_post(
+        post,
+        sentiment=sentiment,
+        sentiment_topics=[-1],
+        emotions=ingestion.emotion_ids(emotions),
+        hashtags=ingestion.hashtag_ids([tag for tag in hashtags if len(tag) >= 1]),
         is_post=1,
-        topic_id=-1,
     )
-    db.session.add(post_sentiment)
-    db.session.commit()
-
-    post.thread_id = post.id
-    db.session.commit()
-
-    for emotion in emotions:
-        if len(emotion) < 1:
-            continue
-
-        em = Emotions.query.filter_by(emotion=emotion).first()
-        if em is not None:
-            post_emotion = Post_emotions(post_id=post.id, emotion_id=em.id)
-            db.session.add(post_emotion)
-            db.session.commit()
-
-    for tag in hashtags:
-        if len(tag) < 1:
-            continue
-
-        ht = Hashtags.query.filter_by(hashtag=tag).first()
-        if ht is None:
-            ht = Hashtags(hashtag=tag)
-            db.session.add(ht)
-            db.session.commit()
-            ht = Hashtags.query.filter_by(hashtag=tag).first()
 
-        post_tag = Post_hashtags(post_id=post.id, hashtag_id=ht.id)
-        db.session.add(post_tag)
-        db.session.commit()
+    toxicity_worker.submit(post.id, text)
 
     return json.dumps({"status": 200})
@@ -1,5 +1,5 @@
 from flask import request
-from sqlalchemy.sql.expression import func
+import heapq
 import json
 from y_server import app, db
 import numpy as np
@@ -7,6 +7,13 @@ from y_server.modals import (
     User_mgmt,
     Follow,
 )
+from y_server.utils.follow_graph import follow_graph
+from y_server.utils.feed_cache import feed_cache, FOLLOWERS_MODES
+from y_server.utils.user_cache import user_cache
+from y_server.utils.clock import clock
+from y_server.utils import link_prediction, sampling
+
+LINK_PREDICTION = ("common_neighbors", "jaccard", "adamic_adar")
 
 
 @app.route("/follow", methods=["POST"])
@@ -29,18 +36,13 @@ def add_follow():
     if user_id.id == target.id:
         return json.dumps({"status": 200})
 
-    exiting_rel = (
-        Follow.query.filter_by(user_id=user_id.id, follower_id=target.id)
-        .order_by(Follow.round.desc())
-        .first()
-    )
+    following = target.id in follow_graph.following(user_id.id)
 
-    if exiting_rel is not None:
-        # cannot perform the same action twice in a row
-        if exiting_rel.action == action:
-            return json.dumps({"status": 200})
+    # cannot perform the same action twice in a row
+    if action == "follow" and following:
+        return json.dumps({"status": 200})
     # cannot unfollow if there is no follow
-    elif exiting_rel is None and action == "unfollow":
+    elif action == "unfollow" and not following:
         return json.dumps({"status": 200})
 
     rel = Follow(user_id=user_id.id, follower_id=target.id, round=tid, action=action)
@@ -48,6 +50,10 @@ def add_follow():
     db.session.add(rel)
     db.session.commit()
 
+    follow_graph.update(user_id.id, target.id, action)
+    feed_cache.invalidate(uids=[user_id.id], modes=FOLLOWERS_MODES)
+    clock.written()
+
     return json.dumps({"status": 200})
 
 @app.route("/follow_status", methods=["POST"])
@@ -123,7 +129,32 @@ def get_follow_suggestions():
     return json.dumps(res)
 
 
-def __follow_suggestions(rectype, user_id, n_neighbors, leaning_biased):
+@app.route("/follow_suggestions_batch", methods=["POST"])
+def get_follow_suggestions_batch():
+    """
+    Get follow suggestions for many users based on the follow recommender system.
+    Link prediction scores are computed for all the users at once.
+
+    :return: a json object with the follow suggestions of each user
+    """
+    data = json.loads(request.get_data())
+    user_ids = [int(user_id) for user_id in data["user_ids"]]
+    n_neighbors = int(data["n_neighbors"])
+    leaning_biased = int(data["leaning_biased"])
+    rectype = data.get("mode", "random")
+
+    scores = [None] * len(user_ids)
+    if rectype in LINK_PREDICTION:
+        scores = link_prediction.scores(rectype, user_ids)
+
+    res = {}
+    for user_id, user_scores in zip(user_ids, scores):
+        res[user_id] = __follow_suggestions(rectype, user_id, n_neighbors, leaning_biased, user_scores)
+
+    return json.dumps(res)
+
+
+def __follow_suggestions(rectype, user_id, n_neighbors, leaning_biased, scores=None):
     """
     Get follow suggestions for a user based on the follow recommender system.
 
@@ -131,6 +162,7 @@ def __follow_suggestions(rectype, user_id, n_neighbors, leaning_biased):
     :param user_id:
     :param n_neighbors:
     :param leaning_biased:
+    :param scores: the link prediction scores of the candidates, computed if not given
     :return:
     """
 
@@ -138,70 +170,29 @@ def __follow_suggestions(rectype, user_id, n_neighbors, leaning_biased):
 
     if rectype == "random":
         # get random users
-        users = User_mgmt.query.order_by(func.random()).limit(n_neighbors)
-
-        for user in users:
-            res[user.id] = 1 / n_neighbors
+        for uid in sampling.sample(user_cache.user_ids(), n_neighbors):
+            res[uid] = 1 / n_neighbors
 
     if rectype == "preferential_attachment":
-        # get random nodes ordered by degree
-        followers = (
-            (
-                db.session.query(
-                    Follow, func.count(Follow.user_id).label("total")
-                ).filter(Follow.action == "follow")
-            )
-            .group_by(Follow.follower_id)
-            .order_by(func.count(Follow.user_id).desc())
-        ).limit(n_neighbors)
-
-        for follower in followers:
-            res[follower[0].follower_id] = int(follower[1])
+        # get nodes ordered by degree
+        degrees = follow_graph.in_degrees()
+        for node in heapq.nlargest(n_neighbors, degrees, key=degrees.get):
+            res[node] = degrees[node]
 
         # normalize pa to probabilities
         total_degree = sum(res.values())
         res = {k: v / total_degree for k, v in res.items()}
 
-    if rectype == "common_neighbors":
-        first_order_followers, candidates = __get_two_hops_neighbors(user_id)
+    if rectype in LINK_PREDICTION:
+        # score the two hops neighbors
+        if scores is None:
+            scores = link_prediction.scores(rectype, [user_id])[0]
 
-        for target, neighbors in candidates.items():
-            res[target] = len(neighbors & first_order_followers)
+        # normalize scores to probabilities
+        total = sum([v for v in scores.values() if v != np.inf])
+        res = {k: v / total for k, v in scores.items() if v > 0 and v != np.inf}
 
-        total = sum(res.values())
-        # normalize cn to probabilities
-        res = {k: v / total for k, v in res.items() if v > 0}
-
-    if rectype == "jaccard":
-        first_order_followers, candidates = __get_two_hops_neighbors(user_id)
-
-        for candidate in candidates:
-            res[candidate] = len(first_order_followers & candidates[candidate]) / len(
-                first_order_followers | candidates[candidate]
-            )
-
-        total = sum(res.values())
-        res = {k: v / total for k, v in res.items() if v > 0}
-
-    elif rectype == "adamic_adar":
-        first_order_followers, candidates = __get_two_hops_neighbors(user_id)
-
-        res = {}
-        for target, neighbors in candidates.items():
-            res[target] = neighbors & first_order_followers
-
-        for target in res:
-            res[target] = sum(
-                [
-                    1 / np.log(len(Follow.query.filter_by(user_id=neighbor).all()))
-                    for neighbor in res[target]
-                ]
-            )
-
-        total = sum([v for v in res.values() if v != np.inf])
-        res = {k: v / total for k, v in res.items() if v > 0 and v != np.inf}
-
-    l_source = User_mgmt.query.filter_by(id=user_id).first().leaning
+    l_source = user_cache.get("leaning", user_id)
     leanings = __get_users_leanings(res.keys())
     for user in res:
         if leanings[user] == l_source:
@@ -223,50 +214,7 @@ def __get_current_following(user_id):
     :param user_id: the user id
     :return: the current following of the user
     """
-    follows = (Follow.query.filter(Follow.user_id == user_id).order_by(Follow.follower_id, Follow.round.desc()).all())
-
-    followed_ids = set()
-    latest_seen = set()
-
-    for f in follows:
-        if f.follower_id not in latest_seen:
-            latest_seen.add(f.follower_id)
-            if f.action == "follow":
-                followed_ids.add(f.follower_id)
-    return followed_ids
-
-
-def __get_two_hops_neighbors(node_id):
-    """
-    Get the two hops neighbors of a user.
-
-    :param node_id: the user id
-    :return: the two hops neighbors
-    """
-    # (node_id, direct_neighbors)
-    first_order_followers = set(
-        [
-            f.follower_id
-            for f in Follow.query.filter_by(user_id=node_id, action="follow")
-        ]
-    )
-    # (direct_neighbors, second_order_followers)
-    second_order_followers = Follow.query.filter(
-        Follow.user_id.in_(first_order_followers), Follow.action == "follow"
-    )
-    # (second_order_followers, third_order_followers)
-    third_order_followers = Follow.query.filter(
-        Follow.user_id.in_([f.follower_id for f in second_order_followers]),
-        Follow.action == "follow",
-    )
-
-    candidate_to_follower = {}
-    for node in third_order_followers:
-        if node.user_id not in candidate_to_follower:
-            candidate_to_follower[node.user_id] = set()
-        candidate_to_follower[node.user_id].add(node.follower_id)
-
-    return first_order_followers, candidate_to_follower
+    return follow_graph.following(user_id)
 
 
 def __get_users_leanings(agents):
@@ -276,7 +224,5 @@ def __get_users_leanings(agents):
     :param agents: the list of users
     :return: the political leaning of the users
     """
-    leanings = {}
-    for agent in agents:
-        leanings[agent] = User_mgmt.query.filter_by(id=agent).first().leaning
-    return leanings
+    agents = list(agents)
+    return dict(zip(agents, user_cache.bulk("leaning", agents)))
@@ -4,20 +4,16 @@ from y_server import app, db
 from y_server.modals import (
     Post,
     User_mgmt,
-    Emotions,
-    Post_emotions,
-    Hashtags,
-    Post_hashtags,
-    Mentions,
     Articles,
     Websites,
-    Interests,
     Article_topics,
     Post_topics,
     Post_Sentiment,
 )
 
-from y_server.content_analysis import vader_sentiment, toxicity
+from y_server.content_analysis import vader_sentiment
+from y_server.utils import ingestion
+from y_server.utils.toxicity_worker import toxicity_worker
 
 
 @app.route("/news", methods=["POST"])
@@ -60,9 +56,9 @@ def comment_news():
             last_fetched=fetched_on,
         )
         db.session.add(website)
-        db.session.commit()
+        db.session.flush()
 
-    website_id = Websites.query.filter_by(rss=rss).first().id
+    website_id = website.id
 
     # check if article exists
     article = Articles.query.filter_by(link=link, website_id=website_id).first()
@@ -75,104 +71,57 @@ def comment_news():
             fetched_on=fetched_on,
         )
         db.session.add(article)
-        db.session.commit()
-    article_id = Articles.query.filter_by(link=link, website_id=website_id).first().id
+        db.session.flush()
+    article_id = article.id
 
     # add post only if the text is not empty
     # (this might happen if the method is called to save the article for image processing)
     if len(text) == 0:
-        post = None
-
-    else:
-        post = Post(
-            tweet=text,
-            round=tid,
-            user_id=user.id,
-            comment_to=-1,
-            news_id=article_id,
-        )
-
-        db.session.add(post)
-        db.session.commit()
-
-        post.thread_id = post.id
         db.session.commit()
+        return json.dumps({"status": 200, "article_id": article_id})
 
-        for emotion in emotions:
-            if len(emotion) < 1:
-                continue
-
-            em = Emotions.query.filter_by(emotion=emotion).first()
-            if em is not None:
-                post_emotion = Post_emotions(post_id=post.id, emotion_id=em.id)
-                db.session.add(post_emotion)
-                db.session.commit()
-
-        for tag in hastags:
-            if len(tag) < 4:
-                continue
-
-            ht = Hashtags.query.filter_by(hashtag=tag).first()
-            if ht is None:
-                ht = Hashtags(hashtag=tag)
-                db.session.add(ht)
-                db.session.commit()
-                ht = Hashtags.query.filter_by(hashtag=tag).first()
-
-            post_tag = Post_hashtags(post_id=post.id, hashtag_id=ht.id)
-            db.session.add(post_tag)
-            db.session.commit()
+    post = Post(
+        tweet=text,
+        round=tid,
+        user_id=user.id,
+        comment_to=-1,
+        news_id=article_id,
+    )
 
-        for mention in mentions:
-            if len(mention) < 1:
-                continue
+    topics, sentiment = [], None
+    if "topics" in data:
+        # compute sentiment
+        sentiment = vader_sentiment(text)
 
-            us = User_mgmt.query.filter_by(username=mention.strip("@")).first()
-            if us is not None:
-                mention = Mentions(user_id=us.id, post_id=post.id, round=tid)
-                db.session.add(mention)
-                db.session.commit()
+        topics = ingestion.topic_ids([topic for topic in data["topics"] if len(topic) >= 1])
+
+        known = {
+            topic_id
+            for (topic_id,) in db.session.query(Article_topics.topic_id).filter_by(article_id=article_id)
+        }
+        db.session.bulk_insert_mappings(
+            Article_topics,
+            [
+                {"article_id": article_id, "topic_id": topic_id}
+                for topic_id in dict.fromkeys(topics)
+                if topic_id not in known
+            ],
+        )
 
-    if post is not None and "topics" in data:
+    mentioned = ingestion.mentioned_users([m for m in mentions if len(m) > 0])
 
-        # compute sentiment
-        sentiment = vader_sentiment(text)
+    ingestion.ingest_post(
+        post,
+        topics=topics,
+        sentiment=sentiment,
+        emotions=ingestion.emotion_ids(emotions),
+        hashtags=ingestion.hashtag_ids([tag for tag in hastags if len(tag) >= 4]),
+        mentions=[us for us in mentioned if us is not None],
+        is_post=1,
+    )
 
-        toxicity(text, app.config["perspective_api"], post.id, db)
-
-        for topic in data["topics"]:
-            if len(topic) < 1:
-                continue
-
-            interests = Interests.query.filter_by(interest=topic).first()
-            if interests is None:
-                interests = Interests(interest=topic)
-                db.session.add(interests)
-                db.session.commit()
-
-            interests = Interests.query.filter_by(interest=topic).first()
-
-            at = Article_topics.query.filter_by(article_id=article_id, topic_id=interests.iid).first()
-            if at is None:
-                at = Article_topics(article_id=article_id, topic_id=interests.iid)
-                db.session.add(at)
-
-            pt = Post_topics(post_id=post.id, topic_id=interests.iid)
-            db.session.add(pt)
-
-            post_sentiment = Post_Sentiment(
-                post_id=post.id,
-                user_id=user.id,
-                pos=sentiment["pos"],
-                neg=sentiment["neg"],
-                neu=sentiment["neu"],
-                compound=sentiment["compound"],
-                round=tid,
-                is_post=1,
-                topic_id=interests.iid,
-            )
-            db.session.add(post_sentiment)
-            db.session.commit()
+    if "topics" in data:
+        toxicity_worker.submit(post.id, text)
 
     return json.dumps({"status": 200, "article_id": article_id})
 
@@ -247,17 +196,11 @@ def share():
         news_id=post.news_id,
     )
 
-    db.session.add(post)
-    db.session.commit()
-
-    post.thread_id = post.id
-    db.session.commit()
-
     sentiment = vader_sentiment(text)
 
-    toxicity(text, app.config["perspective_api"], post.id, db)
-
-    topics = Post_topics.query.filter_by(post_id=post_id).all()
+    topics = [
+        topic_id for (topic_id,) in db.session.query(Post_topics.topic_id).filter_by(post_id=post_id)
+    ]
 
     sentiment_parent = Post_Sentiment.query.filter_by(post_id=post_id).first()
     if sentiment_parent is not None:
@@ -272,55 +215,20 @@ def share():
     else:
         sentiment_parent = ""
 
-    for topic in topics:
-        post_sentiment = Post_Sentiment(
-            post_id=post.id,
-            user_id=user.id,
-            pos=sentiment["pos"],
-            neg=sentiment["neg"],
-            neu=sentiment["neu"],
-            compound=sentiment["compound"],
-            sentiment_parent=sentiment_parent,
-            round=tid,
-            is_post=1,
-            topic_id=topic.topic_id,
-        )
-        db.session.add(post_sentiment)
-        db.session.commit()
-
-    for emotion in emotions:
-        if len(emotion) < 1:
-            continue
-
-        em = Emotions.query.filter_by(emotion=emotion).first()
-        if em is not None:
-            post_emotion = Post_emotions(post_id=post.id, emotion_id=em.id)
-            db.session.add(post_emotion)
-            db.session.commit()
-
-    for tag in hastags:
-        if len(tag) < 1:
-            continue
-
-        ht = Hashtags.query.filter_by(hashtag=tag).first()
-        if ht is None:
-            ht = Hashtags(hashtag=tag)
-            db.session.add(ht)
-            db.session.commit()
-            ht = Hashtags.query.filter_by(hashtag=tag).first()
-
-        post_tag = Post_hashtags(post_id=post.id, hashtag_id=ht.id)
-        db.session.add(post_tag)
-        db.session.commit()
-
-    for mention in mentions:
-        if len(mention) < 1:
-            continue
+    mentioned = ingestion.mentioned_users([m for m in mentions if len(m) > 0])
+
+    # the share is not annotated with the topics of the shared post, only its sentiment is
+    ingestion.ingest_post(
+        post,
+        sentiment=sentiment,
+        sentiment_topics=topics,
+        emotions=ingestion.emotion_ids(emotions),
+        hashtags=ingestion.hashtag_ids([tag for tag in hastags if len(tag) >= 1]),
+        mentions=[us for us in mentioned if us is not None],
+        sentiment_parent=sentiment_parent,
+        is_post=1,
+    )
 
-        us = User_mgmt.query.filter_by(username=mention.strip("@")).first()
-        if us is not None:
-            mention = Mentions(user_id=us.id, post_id=post.id, round=tid)
-            db.session.add(mention)
-            db.session.commit()
+    toxicity_worker.submit(post.id, text)
 
     return json.dumps({"status": 200})
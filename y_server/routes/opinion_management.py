@@ -8,9 +8,11 @@ from y_server.modals import (
     Coalitions,
     Coalition_Opinion,
     User_mgmt,
-    User_opinions
+    User_opinions_latest,
 )
 from y_server.utils.opinion_dynamics import weighted_mean, median, friedkin_johnsen, weighted_friedkin_johnsen
+from y_server.utils.opinion_store import add_opinion, add_opinions, latest_opinion
+from y_server.utils import opinion_engine
 
 
 @app.route("/init_opinions", methods=["POST"])
@@ -28,19 +30,22 @@ def init_opinions():
     coalition_opinions = Coalition_Opinion.query.filter_by(coalition_id=coalition_obj.id).all()
     user = User_mgmt.query.filter_by(id=user_id).first()
 
+    opinions = []
     for coalition_opinion in coalition_opinions:
-        user_opinion = User_opinions(
-            score=coalition_opinion.score,
-            score_llm=coalition_opinion.score,
-            user_id=user_id,
-            topic_id=coalition_opinion.interest_id,
-            round=user.joined_on,
-            description=coalition_opinion.description,
+        opinions.append(
+            {
+                "score": coalition_opinion.score,
+                "score_llm": coalition_opinion.score,
+                "user_id": user_id,
+                "topic_id": coalition_opinion.interest_id,
+                "round": user.joined_on,
+                "description": coalition_opinion.description,
+            }
         )
 
-        db.session.add(user_opinion)
-        db.session.commit()
-        
+    add_opinions(opinions)
+    db.session.commit()
+
     return json.dumps({"status": 200})
 
 
@@ -75,19 +80,19 @@ def update_opinion ():
             score = median(user_id, topic)
 
         elif method == "friedkin_johnsen":
-            score = friedkin_johnsen(user_id, topic, susceptibility=susceptibility)
+            score = friedkin_johnsen(user_id, topic, tid, susceptibility=susceptibility)
 
         elif method == "state_dependent_fj":
-            score = friedkin_johnsen(user_id, topic, susceptibility=susceptibility, is_state_dependent=True)
+            score = friedkin_johnsen(user_id, topic, tid, susceptibility=susceptibility, is_state_dependent=True)
 
         elif method == "weighted_friedkin_johnsen":
             score = weighted_friedkin_johnsen(user_id, topic, susceptibility=susceptibility)
 
         if llm_scores[i] is None:
-            last_opinion = User_opinions.query.filter_by(user_id=user_id, topic_id=topic.iid).order_by(desc(User_opinions.round)).first()
+            last_opinion = latest_opinion(user_id, topic.iid)
             llm_scores[i] = last_opinion.score_llm
 
-        opinion = User_opinions(
+        add_opinion(
             score=round(score, 3),
             score_llm=round(llm_scores[i], 3),
             user_id=user_id,
@@ -95,11 +100,43 @@ def update_opinion ():
             round=tid,
             description=descriptions[i],
         )
-        db.session.add(opinion)
         db.session.commit()
 
     return json.dumps({"status": 200})
 
+@app.route("/update_opinions_round", methods=["POST"])
+def update_opinions_round():
+    """
+    Compute the opinions of all the users on the given topics in a single step.
+    Available methods:
+    - friedkin_johnsen: Friedkin-Johnsen model
+    - state_dependent_fj: state-dependent Friedkin-Johnsen model
+    - weighted_friedkin_johnsen: Friedkin-Johnsen model with follow and reaction weights
+
+    The susceptibility is read from the user profiles unless given in the request.
+
+    :return: a json object with the status and the number of updated opinions
+    """
+    data = json.loads(request.get_data())
+    method = data.get("method", "friedkin_johnsen")
+    tid = int(data["tid"])
+    susceptibility = data.get("susceptibility", None)
+    user_ids = data.get("user_ids", None)
+
+    if "interests" in data:
+        topics = Interests.query.filter(Interests.interest.in_(data["interests"])).all()
+    else:
+        topics = Interests.query.all()
+
+    try:
+        updated = opinion_engine.update_opinions(topics, method, tid, susceptibility, user_ids)
+    except ValueError as e:
+        return json.dumps({"status": 400, "error": str(e)})
+    db.session.commit()
+
+    return json.dumps({"status": 200, "updated": updated})
+
+
 @app.route("/get_opinions", methods=["GET"])
 def get_opinions():
     """
@@ -115,7 +152,7 @@ def get_opinions():
 
     for interest in interests:
         topic = Interests.query.filter_by(interest=interest).first()
-        opinion = User_opinions.query.filter_by(user_id=user_id, topic_id=topic.iid).order_by(desc(User_opinions.round)).first()
+        opinion = latest_opinion(user_id, topic.iid)
         if opinion is not None:
             data = {
                 "topic": interest,
@@ -137,6 +174,6 @@ def get_last_opinion_round():
     data = json.loads(request.get_data())
     user_id = data["user_id"]
 
-    opinion = User_opinions.query.filter_by(user_id=user_id).order_by(desc(User_opinions.round)).first()
+    opinion = User_opinions_latest.query.filter_by(user_id=user_id).order_by(desc(User_opinions_latest.round)).first()
 
     return json.dumps({"round": opinion.round}) if opinion else json.dumps({"round": 0})
\ No newline at end of file
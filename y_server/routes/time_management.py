@@ -1,10 +1,14 @@
 import json
 from flask import request
 from y_server import app, db
-from sqlalchemy import desc
 from y_server.modals import (
     Rounds,
 )
+from y_server.utils.post_index import post_index
+from y_server.utils.hashtag_index import hashtag_index
+from y_server.utils.mention_queue import mention_queue
+from y_server.utils.clock import clock
+from y_server.utils.round_jobs import round_pipeline
 
 
 @app.route("/current_time", methods=["GET"])
@@ -14,14 +18,15 @@ def current_time():
 
     :return: a json object with the current time
     """
-    cround = Rounds.query.order_by(desc(Rounds.id)).first()
+    cround = clock.current()
     if cround is None:
         cround = Rounds(day=0, hour=0)
         db.session.add(cround)
         db.session.commit()
-        cround = Rounds.query.order_by(desc(Rounds.id)).first()
+        clock.advance(cround.id, cround.day, cround.hour)
+        cround = clock.current()
 
-    return json.dumps({"id": cround.id, "day": cround.day, "round": cround.hour})
+    return json.dumps({"id": cround["id"], "day": cround["day"], "round": cround["hour"]})
 
 
 @app.route("/update_time", methods=["POST"])
@@ -35,11 +40,35 @@ def update_time():
     day = int(data["day"])
     hour = int(data["round"])
 
+    cround = clock.current()
+    if cround is not None and cround["day"] == day and cround["hour"] == hour:
+        return json.dumps({"id": cround["id"], "day": day, "round": hour})
+
     cround = Rounds.query.filter_by(day=day, hour=hour).first()
     if cround is None:
         cround = Rounds(day=day, hour=hour)
         db.session.add(cround)
         db.session.commit()
-        cround = Rounds.query.filter_by(day=day, hour=hour).first()
+
+    if clock.advance(cround.id, cround.day, cround.hour):
+        round_pipeline.trigger(cround.id)
+    post_index.advance(clock.round_id())
+    hashtag_index.advance(clock.round_id())
+    mention_queue.advance(clock.round_id())
 
     return json.dumps({"id": cround.id, "day": cround.day, "round": cround.hour})
+
+
+@app.route("/round_jobs", methods=["GET", "POST"])
+def round_jobs():
+    """
+    Get the status of the round-boundary jobs.
+
+    :return: a json object with the round, whether its jobs have finished and the status and timing of each job
+    """
+    data = json.loads(request.get_data() or "{}")
+    state = round_pipeline.status(data.get("round"))
+    if state is None:
+        return json.dumps({"status": 404, "error": "No jobs for this round"})
+
+    return json.dumps({"status": 200, "finished": state["state"] in ("done", "failed"), **state})
@@ -2,7 +2,10 @@ import json
 from flask import request
 from y_server import app, db
 from sqlalchemy import desc
-from y_server.modals import Post, Post_topics, User_mgmt, Reactions, User_interest, Interests
+from y_server.modals import Post, Post_topics, User_mgmt, Reactions, User_interest, Interests, Post_counters
+from y_server.utils.user_cache import user_cache
+from y_server.utils.clock import clock
+from y_server.utils import vocabulary
 
 
 @app.route("/get_user_id", methods=["GET", "POST"])
@@ -125,6 +128,9 @@ def register():
         except:
             return json.dumps({"status": 404})
 
+        user_cache.add(user)
+        clock.written()
+
     return json.dumps({"status": 200})
 
 
@@ -153,8 +159,12 @@ def churn_agents():
         user = User_mgmt.query.filter_by(id=user_id).first()
         user.left_on = left_on
         db.session.commit()
+        user_cache.update(user_id, left_on=left_on)
         removed[user_id] = None
 
+    if len(removed) > 0:
+        clock.written()
+
     return json.dumps({"status": 200, "removed": removed})
 
 
@@ -176,11 +186,15 @@ def update_user():
             recsys_type = data["recsys_type"]
             user.recsys_type = recsys_type
             db.session.commit()
+            user_cache.update(user.id, recsys_type=recsys_type)
 
         if "frecsys_type" in data:
             frecsys_type = data["frecsys_type"]
             user.frecsys_type = frecsys_type
             db.session.commit()
+            user_cache.update(user.id, frecsys_type=frecsys_type)
+
+        clock.written()
 
     return json.dumps({"status": 200})
 
@@ -221,32 +235,58 @@ def get_user_from_post():
 @app.route("/timeline", methods=["GET"])
 def get_timeline():
     """
-    Get the timeline of a user.
+    Get the timeline of a user, most recent posts first.
+
+    Without a page size (limit) nor a cursor (before) the whole timeline is returned as a list.
+    Otherwise the timeline is read one page at a time: limit (default 100) posts older than the
+    cursor returned with the previous page.
 
-    :return: a json object with the timeline
+    :return: a json list of the posts, or a json object with the posts of the page and the cursor
+        of the next page (None on the last page)
     """
     data = json.loads(request.get_data())
     user_id = data["user_id"]
+    paginated = "limit" in data or "before" in data
+    limit = int(data.get("limit", 100))
+    before = data.get("before", None)
+
+    if limit <= 0:
+        return json.dumps({"status": 400, "error": "The limit must be positive"})
+
+    posts = (
+        db.session.query(
+            Post.id, Post.tweet, Post.round,
+            Post_counters.likes, Post_counters.dislikes, Post_counters.comments, Post_counters.shares,
+        )
+        .outerjoin(Post_counters, Post_counters.post_id == Post.id)
+        .filter(Post.user_id == user_id)
+    )
+    if before is not None:
+        posts = posts.filter(Post.id < int(before))
+    posts = posts.order_by(desc(Post.id))
+    if paginated:
+        posts = posts.limit(limit)
 
-    user = User_mgmt.query.filter_by(id=user_id).first()
-    all_posts = Post.query.filter_by(user_id=user.id).order_by(desc(Post.id))
     res = []
-    for post in all_posts:
+    for post_id, tweet, rnd, likes, dislikes, comments, shares in posts:
         res.append(
             {
-                "post_id": post.id,
-                "post": post.tweet,
-                "round": post.round,
-                "reposts": len(post.retweets),
-                "likes": len(list(Reactions.query.filter_by(id=post.id, type="like"))),
-                "dislikes": len(
-                    list(Reactions.query.filter_by(id=post.id, type="dislike"))
-                ),
-                "comments": len(list(Post.query.filter_by(comment_to=post.id))),
+                "post_id": post_id,
+                "post": tweet,
+                "round": rnd,
+                "reposts": shares or 0,
+                "likes": likes or 0,
+                "dislikes": dislikes or 0,
+                "comments": comments or 0,
             }
         )
 
-    return json.dumps(res)
+    if not paginated:
+        return json.dumps(res)
+
+    next_cursor = res[-1]["post_id"] if 0 < len(res) == limit else None
+
+    return json.dumps({"posts": res, "next": next_cursor})
 
 
 @app.route("/set_interests", methods=["POST"])
@@ -258,12 +298,8 @@ def set_interests():
     """
     data = json.loads(request.get_data())
 
-    for interest in data:
-        ints = Interests(
-            interest=interest,
-        )
-        db.session.add(ints)
-        db.session.commit()
+    vocabulary.interests.lookup(data)
+    db.session.commit()
 
     return json.dumps({"status": 200})
 
@@ -284,16 +320,8 @@ def set_user_interests():
         # check if the interest is specified as id or by name
         iid = None
         if isinstance(interest, str):
-            try:
-                iid = Interests.query.filter_by(interest=interest).first().iid
-            except:
-                # add interest to the interest table
-                ints = Interests(
-                    interest=interest,
-                )
-                db.session.add(ints)
-                db.session.commit()
-                iid = Interests.query.filter_by(interest=interest).first().iid
+            # add interest to the interest table if missing
+            iid = vocabulary.interests.lookup([interest])[0]
 
         else:
             iid = interest
@@ -334,7 +362,7 @@ def get_user_interests():
             User_interest.round_id >= base_rounds,
             User_interest.round_id <= round_id,
         )
-        .group_by(User_interest.interest_id)
+        .group_by(User_interest.interest_id, Interests.interest)
         .order_by(db.desc(db.func.count(User_interest.interest_id)))
         .limit(n_interests)
         .all()
@@ -380,10 +408,7 @@ def get_active_topics():
             Reactions.round <= end_round,
         )
     )
-    all_topic_names = (
-        post_topics.union(reaction_topics)
-        .distinct()
-        .all()
-    )
+    # the union removes the duplicated topics
+    all_topic_names = post_topics.union(reaction_topics).all()
     topic_names = [topic[0] for topic in all_topic_names]
     return json.dumps(topic_names)
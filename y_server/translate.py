@@ -1,44 +1,175 @@
 import os
 import re
 import json
+import threading
+from collections import OrderedDict
 import deepl
 from deep_translator import GoogleTranslator
 
+TRANSLATION_CACHE_SIZE = 20000
+
+__lock = threading.RLock()
+__settings = None
+__backends = {}
+__cache = OrderedDict()
+
+
+class GoogleBackend(object):
+    """
+    Translator backend based on Google Translate.
+    """
+
+    def translate_batch(self, texts, src_lang, tgt_lang):
+        """
+        Translate a list of texts.
+
+        :param texts: the list of texts
+        :param src_lang: the source language code
+        :param tgt_lang: the target language code
+        :return: the list of translations, in the same order
+        """
+        translator = GoogleTranslator(source=src_lang, target=tgt_lang)
+        return [
+            re.sub(r'\brdc\b', 'il reddito di cittadinanza', text_loc, flags=re.IGNORECASE)
+            for text_loc in translator.translate_batch(texts)
+        ]
+
+
+class DeepLBackend(object):
+    """
+    Translator backend based on DeepL (the key and the glossary are read from DEEPL_API_KEY and DEEPL_GLOSSARY_ID).
+    """
+
+    def __init__(self):
+        self.client = deepl.DeepLClient(os.getenv("DEEPL_API_KEY"))
+        self.glossary_id = os.getenv("DEEPL_GLOSSARY_ID")
+
+    def translate_batch(self, texts, src_lang, tgt_lang):
+        """
+        Translate a list of texts.
+
+        :param texts: the list of texts
+        :param src_lang: the source language code
+        :param tgt_lang: the target language code
+        :return: the list of translations, in the same order
+        """
+        if self.glossary_id:
+            results = self.client.translate_text(texts, source_lang=src_lang, target_lang=tgt_lang, glossary=self.glossary_id)
+        else:
+            results = self.client.translate_text(texts, source_lang=src_lang, target_lang=tgt_lang)
+        return [result.text for result in results]
+
+
+class FakeBackend(object):
+    """
+    Offline translator backend for tests: the text is prefixed with the target language code.
+    """
+
+    def translate_batch(self, texts, src_lang, tgt_lang):
+        """
+        Translate a list of texts.
+
+        :param texts: the list of texts
+        :param src_lang: the source language code
+        :param tgt_lang: the target language code
+        :return: the list of translations, in the same order
+        """
+        return [f"[{tgt_lang}] {text}" for text in texts]
+
+
+BACKENDS = {"google": GoogleBackend, "deepl": DeepLBackend, "fake": FakeBackend}
+
+
+def settings():
+    """
+    Get the translation settings, read once from the configuration files.
+
+    :return: a dictionary with the default translator and the locales (language name -> code)
+    """
+    global __settings
+    with __lock:
+        if __settings is None:
+            try:
+                config = json.load(open(f"config_files{os.sep}exp_config.json"))
+            except (OSError, ValueError):
+                config = {}
+            locales = json.load(open(f"config_files{os.sep}locales.json", "r", encoding="utf-8"))
+            __settings = {"translator": config.get("translator", "google"), "locales": locales}
+        return __settings
+
+
+def backend(translator=None):
+    """
+    Get the translator backend.
+
+    :param translator: the translator name, the configured one if None
+    :return: the backend object
+    """
+    translator = (settings()["translator"] if translator is None else translator).lower()
+    if translator not in BACKENDS:
+        print(f"Translator {translator} not supported. Using Google as default.")
+        translator = "google"
+    with __lock:
+        if translator not in __backends:
+            __backends[translator] = BACKENDS[translator]()
+        return __backends[translator]
+
+
 def translate(text, src_lang="english", tgt_lang="italian", translator=None):
-    config = json.load(open(f"config_files{os.sep}exp_config.json"))
-    translator = config.get("translator", "google") if translator is None else translator
+    """
+    Translate a text.
+
+    :param text: the text
+    :param src_lang: the source language name
+    :param tgt_lang: the target language name
+    :param translator: the translator name, the configured one if None
+    :return: the translated text
+    """
+    return translate_batch([text], src_lang, tgt_lang, translator)[0]
+
 
-    locales = json.load(open("config_files/locales.json", "r", encoding="utf-8"))
+def translate_batch(texts, src_lang="english", tgt_lang="italian", translator=None):
+    """
+    Translate a list of texts with a single backend call.
+    Translations are cached by (text, source language, target language), the least recently used are evicted.
+
+    :param texts: the list of texts
+    :param src_lang: the source language name
+    :param tgt_lang: the target language name
+    :param translator: the translator name, the configured one if None
+    :return: the list of translated texts, in the same order
+    """
+    locales = settings()["locales"]
     src_lang = locales[src_lang]
     tgt_lang = locales[tgt_lang]
 
     if src_lang == tgt_lang:
-        return text
-    
-    if translator.lower() == "google":
-        text_loc = translate_google(text, src_lang, tgt_lang)
-    elif translator.lower() == "deepl":
-        text_loc = translate_deepl(text, src_lang, tgt_lang)
-    else:
-        print(f"Translator {translator} not supported. Using Google as default.")
-        text_loc = translate_google(text, src_lang, tgt_lang)
-    
-    return text_loc
+        return list(texts)
 
-def translate_google(text, src_lang="en", tgt_lang="it"):
-    text_loc = GoogleTranslator(source=src_lang, target=tgt_lang).translate(text)
-    text_loc = re.sub(r'\brdc\b', 'il reddito di cittadinanza', text_loc, flags=re.IGNORECASE)
-    return text_loc
+    found = {}
+    with __lock:
+        for text in texts:
+            key = (text, src_lang, tgt_lang)
+            if key in __cache:
+                __cache.move_to_end(key)
+                found[text] = __cache[key]
 
-def translate_deepl(text, src_lang="en", tgt_lang="it"):
-    auth_key = os.getenv("DEEPL_API_KEY")
-    glossary_id = os.getenv("DEEPL_GLOSSARY_ID")
-    deepl_client = deepl.DeepLClient(auth_key)
+    missing = [text for text in dict.fromkeys(texts) if text not in found]
+    if len(missing) > 0:
+        translations = backend(translator).translate_batch(missing, src_lang, tgt_lang)
+        with __lock:
+            for text, text_loc in zip(missing, translations):
+                found[text] = text_loc
+                __cache[(text, src_lang, tgt_lang)] = text_loc
+            while len(__cache) > TRANSLATION_CACHE_SIZE:
+                __cache.popitem(last=False)
+
+    return [found[text] for text in texts]
 
-    if glossary_id:
-        result = deepl_client.translate_text(text, source_lang=src_lang, target_lang=tgt_lang, glossary=glossary_id)
-    else:
-        result = deepl_client.translate_text(text, source_lang=src_lang, target_lang=tgt_lang)
 
-    #print(f"\n{print(result.billed_characters)}\n")
-    return result.text
\ No newline at end of file
+def translate_google(text, src_lang="en", tgt_lang="it"):
+    return BACKENDS["google"]().translate_batch([text], src_lang, tgt_lang)[0]
+
+
+def translate_deepl(text, src_lang="en", tgt_lang="it"):
+    return BACKENDS["deepl"]().translate_batch([text], src_lang, tgt_lang)[0]
@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWorker(object):
+    """
+    Background worker processing queued items in batches.
+
+    Request handlers only enqueue the items: a daemon thread, started on the first submit,
+    takes them in batches (up to `batch_size`, or what arrived within `interval` seconds)
+    and hands them to `process`. Subclasses implement `process`.
+
+    If a batch fails, its items are processed again one at a time, so that a single bad
+    item does not lose the others; the items failing alone are logged, counted and skipped.
+    """
+
+    name = "batch-worker"
+
+    def __init__(self, batch_size=32, interval=0.5):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.condition = threading.Condition()
+        self.queue = deque()
+        self.thread = None
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.last_error = None
+
+    def submit(self, item):
+        """
+        Enqueue an item.
+
+        :param item: the item to process
+        """
+        with self.condition:
+            self.queue.append(item)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.__run, name=self.name, daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def drain(self, timeout=None):
+        """
+        Wait until every enqueued item has been processed.
+
+        :param timeout: the maximum waiting time in seconds, None to wait indefinitely
+        :return: True if the queue has been drained
+        """
+        with self.condition:
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: len(self.queue) == 0 and self.in_flight == 0, timeout)
+
+    def clear(self):
+        """
+        Drop the items waiting to be processed (e.g., when the database is reset).
+        """
+        with self.condition:
+            self.queue.clear()
+            self.condition.notify_all()
+
+    def metrics(self):
+        """
+        Get the worker metrics.
+
+        :return: a dictionary with the queue depth, the items being processed, the processed, retried and failed items and the last error
+        """
+        with self.condition:
+            return {
+                "queued": len(self.queue),
+                "in_flight": self.in_flight,
+                "processed": self.processed,
+                "failed": self.failed,
+                "retried": self.retried,
+                "last_error": self.last_error,
+            }
+
+    def process(self, batch):
+        """
+        Process a batch of items.
+
+        :param batch: the list of items
+        :return: the number of items successfully processed
+        """
+        raise NotImplementedError
+
+    def __run(self):
+        while True:
+            with self.condition:
+                # wait for a full batch, or for the interval to elapse
+                self.condition.wait_for(lambda: len(self.queue) > 0)
+                deadline = time.monotonic() + self.interval
+                while len(self.queue) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self.condition.wait(remaining):
+                        break
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+                self.in_flight = len(batch)
+
+            # the queue may have been cleared while waiting
+            done = self.__process(batch) if len(batch) > 0 else 0
+
+            with self.condition:
+                self.processed += done
+                self.failed += len(batch) - done
+                self.in_flight = 0
+                self.condition.notify_all()
+
+    def __process(self, batch):
+        try:
+            return self.process(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                self.__failure(e)
+                return 0
+            logger.warning("%s: batch of %d items failed (%r), retrying them one at a time", self.name, len(batch), e)
+
+        with self.condition:
+            self.retried += len(batch)
+        done = 0
+        for item in batch:
+            try:
+                done += self.process([item])
+            except Exception as e:
+                self.__failure(e)
+        return done
+
+    def __failure(self, error):
+        logger.error("%s: item skipped", self.name, exc_info=error)
+        with self.condition:
+            self.last_error = repr(error)
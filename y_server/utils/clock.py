@@ -0,0 +1,274 @@
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from sqlalchemy import desc
+from y_server import app
+from y_server.modals import Rounds
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+# version, round id, day, hour, epoch, writes, drain requests
+LAYOUT = struct.Struct("<qqqqqqq")
+
+
+class SimulationClock(object):
+    """
+    Process-wide copy of the current round of the simulation (the latest Rounds row).
+
+    The round is kept in a small memory-mapped file next to the database, so that all the
+    server processes serving the same database share it: /update_time publishes the new
+    round and every handler reads it without querying the database. Writes follow a
+    sequence lock (the version is odd while a write is in progress); a version of zero
+    means that the clock has to be loaded from the Rounds table, which stays the persistent
+    record.
+
+    The epoch counts the resets of the clock (i.e., of the experiment data) and the writes
+    count the changes of the data cached by every process (e.g., the follows): processes calling
+    sync() notice the resets, the new rounds and the writes published by the others and run the
+    subscribed callbacks, so that their in-memory caches are dropped. The drain requests count
+    the requests to complete the background work of every process (see utils/serving.py).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.path = None
+        self.file = None
+        self.shared = None
+        self.pid = None
+        self.listeners = []
+        self.epoch = None
+        self.round = None
+        self.writes = None
+
+    def attach(self, path=None):
+        """
+        Map the shared clock file of the current database.
+
+        :param path: the clock file, derived from the database URI if None
+        """
+        with self.lock:
+            self.detach()
+            self.path = self.__default_path() if path is None else path
+            self.file = open(self.path, "a+b")
+            if os.path.getsize(self.path) < LAYOUT.size:
+                self.file.truncate(LAYOUT.size)
+            self.shared = mmap.mmap(self.file.fileno(), LAYOUT.size)
+            self.pid = os.getpid()
+
+    def detach(self):
+        """
+        Unmap the shared clock file.
+        """
+        with self.lock:
+            if self.shared is not None:
+                self.shared.close()
+                self.file.close()
+            self.shared, self.file = None, None
+
+    def reset(self):
+        """
+        Invalidate the clock of every process: it will be reloaded from the database on the next use.
+        """
+        with self.lock:
+            self.__ensure_attached()
+            with self.__file_lock():
+                _, _, _, _, epoch, writes, drains = LAYOUT.unpack_from(self.shared, 0)
+                LAYOUT.pack_into(self.shared, 0, 0, 0, 0, 0, epoch + 1, writes, drains)
+            # the caller resets its own caches
+            self.epoch, self.round, self.writes = epoch + 1, None, writes
+
+    def written(self):
+        """
+        Publish a committed write to the data cached by every process (e.g., a follow), so that the
+        other processes drop their copy on their next sync().
+        """
+        with self.lock:
+            self.__ensure_attached()
+            with self.__file_lock():
+                writes = LAYOUT.unpack_from(self.shared, 0)[5]
+                struct.pack_into("<q", self.shared, 40, writes + 1)
+            # the caches of this process already hold the write
+            if self.writes == writes:
+                self.writes = writes + 1
+
+    def request_drain(self):
+        """
+        Ask every process to complete its background work.
+
+        :return: the number of the request
+        """
+        with self.lock:
+            self.__ensure_attached()
+            with self.__file_lock():
+                drains = LAYOUT.unpack_from(self.shared, 0)[6] + 1
+                struct.pack_into("<q", self.shared, 48, drains)
+            return drains
+
+    def drain_requests(self):
+        """
+        Get the number of the last drain request.
+
+        :return: the number of drain requests
+        """
+        with self.lock:
+            self.__ensure_attached()
+            return LAYOUT.unpack_from(self.shared, 0)[6]
+
+    def subscribe(self, callback, every_round=False, every_write=False):
+        """
+        Register a callback run by sync() when another process resets the clock.
+
+        :param callback: the function to call, without arguments
+        :param every_round: run the callback on every new round as well
+        :param every_write: run the callback on every write published by another process as well
+        """
+        with self.lock:
+            self.listeners.append((callback, every_round, every_write))
+
+    def sync(self):
+        """
+        Run the subscribed callbacks if the clock has been reset, moved to a new round or
+        written by another process since the last call in this process.
+        """
+        with self.lock:
+            self.__ensure_attached()
+            version, round_id, _, _, epoch, writes, _ = LAYOUT.unpack_from(self.shared, 0)
+            round_id = round_id if version != 0 else self.round
+            if self.epoch is None:
+                # first call in this process
+                callbacks = []
+            elif epoch != self.epoch:
+                callbacks = [callback for callback, _, _ in self.listeners]
+            elif round_id != self.round:
+                callbacks = [callback for callback, every_round, _ in self.listeners if every_round]
+            elif writes != self.writes:
+                callbacks = [callback for callback, _, every_write in self.listeners if every_write]
+            else:
+                callbacks = []
+            self.epoch, self.round, self.writes = epoch, round_id, writes
+
+        for callback in callbacks:
+            callback()
+
+    def current(self):
+        """
+        Get the current round.
+
+        :return: a dictionary with the round id, day and hour, None if no round exists yet
+        """
+        with self.lock:
+            self.__ensure_attached()
+            while True:
+                version, round_id, day, hour, _, _, _ = LAYOUT.unpack_from(self.shared, 0)
+                if version == 0:
+                    return self.__load()
+                # retry if a write was in progress
+                if version % 2 == 0 and struct.unpack_from("<q", self.shared, 0)[0] == version:
+                    return {"id": round_id, "day": day, "hour": hour}
+
+    def round_id(self):
+        """
+        Get the id of the current round.
+
+        :return: the round id
+        """
+        return self.current()["id"]
+
+    def advance(self, round_id, day, hour):
+        """
+        Publish a new round, if more recent than the current one.
+
+        :param round_id: the Rounds id
+        :param day: the day
+        :param hour: the hour
+        :return: True if the clock moved to the given round
+        """
+        with self.lock:
+            self.__ensure_attached()
+            with self.__file_lock():
+                version, current_id, _, _, _, _, _ = LAYOUT.unpack_from(self.shared, 0)
+                if version != 0 and current_id >= round_id:
+                    return False
+                self.__write(version, round_id, day, hour)
+                return True
+
+    def shared_file(self, suffix):
+        """
+        Get the path of a file shared by the processes serving the current database, next to the clock.
+
+        :param suffix: the file extension
+        :return: the file path
+        """
+        with self.lock:
+            self.__ensure_attached()
+            return f"{os.path.splitext(self.path)[0]}.{suffix}"
+
+    def exclusive(self):
+        """
+        Lock the clock file against the other processes, e.g. to update a shared file.
+
+        :return: the lock, a context manager
+        """
+        with self.lock:
+            self.__ensure_attached()
+            return self.__file_lock()
+
+    def __load(self):
+        with self.__file_lock():
+            cround = Rounds.query.order_by(desc(Rounds.id)).first()
+            if cround is None:
+                return None
+            version = LAYOUT.unpack_from(self.shared, 0)[0]
+            self.__write(version, cround.id, cround.day, cround.hour)
+            return {"id": cround.id, "day": cround.day, "hour": cround.hour}
+
+    def __write(self, version, round_id, day, hour):
+        struct.pack_into("<q", self.shared, 0, version + 1)
+        struct.pack_into("<qqq", self.shared, 8, round_id, day, hour)
+        struct.pack_into("<q", self.shared, 0, version + 2)
+
+    def __ensure_attached(self):
+        # forked processes map the file again, the file lock is per open file
+        if self.shared is None or self.pid != os.getpid():
+            self.attach(self.path)
+
+    def __file_lock(self):
+        return _FileLock(self.file)
+
+    @staticmethod
+    def __default_path():
+        uri = app.config["SQLALCHEMY_DATABASE_URI"]
+        if uri.startswith("sqlite:///"):
+            path = uri[len("sqlite:///"):]
+            if not os.path.isabs(path):
+                path = os.path.join(app.root_path, path)
+            return f"{os.path.normpath(path)}.clock"
+        digest = hashlib.sha1(uri.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(tempfile.gettempdir(), f"y_server_{digest}.clock")
+
+
+class _FileLock(object):
+    """
+    Exclusive lock on a file, shared by the server processes (no-op where fcntl is not available).
+    """
+
+    def __init__(self, file):
+        self.file = file
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *args):
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+
+
+clock = SimulationClock()
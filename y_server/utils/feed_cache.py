@@ -0,0 +1,131 @@
+import random
+import threading
+
+# the recommendation modes whose feeds depend on the reactions and on the follows
+POPULARITY_MODES = ("rchrono_popularity", "rchrono_followers_popularity")
+FOLLOWERS_MODES = ("rchrono_followers", "rchrono_followers_popularity")
+
+
+class FeedCache(object):
+    """
+    Feeds precomputed for the current round, keyed by user id.
+
+    Each feed is stored with the parameters it was computed for (mode, limit, visibility
+    rounds, followers ratio and article flag): a /read asking for the same parameters in the
+    same round gets the stored feed, any other request is computed on the fly. Storing the
+    feeds of a new round drops the ones of the previous rounds.
+
+    Within the round the feeds are a snapshot: the reverse-chronological and random feeds do
+    not include the posts published later. The feeds that a write changes the most are dropped
+    as soon as the write is committed: the popularity feeds on a reaction, the followers feeds
+    of the followers of the author on a new post and those of a user on a follow.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the cached feeds.
+        """
+        with self.lock:
+            self.round = None
+            self.feeds = {}
+            self.hits = 0
+            self.misses = 0
+            self.invalidated = 0
+            # invalidations committed while feeds are being computed
+            self.pending = None
+
+    def begin(self):
+        """
+        Start computing the feeds of a round: the writes committed until they are stored drop
+        the stale ones.
+        """
+        with self.lock:
+            self.pending = []
+
+    def store(self, current_round, feeds):
+        """
+        Store the feeds of a round.
+
+        :param current_round: the round id
+        :param feeds: a dictionary user id -> (parameters, list of post ids)
+        """
+        with self.lock:
+            feeds = dict(feeds)
+            for uids, modes in self.pending or ():
+                for uid in self.__stale(feeds, uids, modes):
+                    del feeds[uid]
+            self.pending = None
+            if self.round is not None and current_round < self.round:
+                return
+            if current_round != self.round:
+                self.round = current_round
+                self.feeds = {}
+            self.feeds.update(feeds)
+
+    def invalidate(self, uids=None, modes=None):
+        """
+        Drop the feeds made stale by a committed write.
+
+        :param uids: the users whose feeds are dropped, None for all the users
+        :param modes: the recommendation modes whose feeds are dropped, None for all the modes
+        """
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append((uids, modes))
+            stale = self.__stale(self.feeds, uids, modes)
+            for uid in stale:
+                del self.feeds[uid]
+            self.invalidated += len(stale)
+
+    def get(self, current_round, uid, params):
+        """
+        Get the precomputed feed of a user.
+
+        :param current_round: the current round id
+        :param uid: the user id
+        :param params: the feed parameters (mode, limit, visibility rounds, followers ratio, article flag)
+        :return: the list of post ids, None if no valid feed is cached
+        """
+        with self.lock:
+            feed = self.feeds.get(uid) if current_round == self.round else None
+            if feed is None or feed[0] != params:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(feed[1])
+
+    @staticmethod
+    def __stale(feeds, uids, modes):
+        users = feeds if uids is None else [uid for uid in uids if uid in feeds]
+        return [uid for uid in users if modes is None or feeds[uid][0][0] in modes]
+
+    def metrics(self):
+        """
+        Get the cache metrics.
+
+        :return: a dictionary with the cached round, the number of feeds, hits, misses and invalidated feeds
+        """
+        with self.lock:
+            return {
+                "round": self.round, "feeds": len(self.feeds), "hits": self.hits, "misses": self.misses,
+                "invalidated": self.invalidated,
+            }
+
+
+def feed_rng(seed, current_round, uid):
+    """
+    Get the random generator of a precomputed feed, so that random feeds are reproducible.
+
+    :param seed: the experiment seed
+    :param current_round: the round id
+    :param uid: the user id
+    :return: a random.Random object
+    """
+    return random.Random(f"{seed}:{current_round}:{uid}")
+
+
+feed_cache = FeedCache()
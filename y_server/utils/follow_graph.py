@@ -0,0 +1,145 @@
+import threading
+from y_server import db
+from y_server.modals import Follow
+
+
+class FollowGraph(object):
+    """
+    In-memory view of the current follow relationships.
+
+    The Follow table is an event log of follow/unfollow actions: the graph replays it once
+    and keeps, for each user, the set of users currently followed (out-adjacency) and the set
+    of users currently following them (in-adjacency). The version is incremented on every
+    change, so that structures derived from the graph can be cached.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the graph content: it will be reloaded from the database on the next use.
+        """
+        with self.lock:
+            self.loaded = False
+            self.version = getattr(self, "version", 0) + 1
+            self.out_adj = {}
+            self.in_adj = {}
+
+    def load(self):
+        """
+        Rebuild the current follow relationships from the Follow event log.
+        """
+        with self.lock:
+            self.out_adj, self.in_adj = {}, {}
+
+            events = (
+                db.session.query(Follow.user_id, Follow.follower_id, Follow.action)
+                .order_by(Follow.round, Follow.id)
+                .all()
+            )
+            for user_id, target_id, action in events:
+                self.__apply(user_id, target_id, action)
+
+            self.loaded = True
+            self.version += 1
+
+    def update(self, user_id, target_id, action):
+        """
+        Apply a new follow/unfollow action.
+
+        :param user_id: the user performing the action
+        :param target_id: the followed/unfollowed user
+        :param action: either "follow" or "unfollow"
+        """
+        with self.lock:
+            if self.loaded:
+                self.__apply(user_id, target_id, action)
+                self.version += 1
+
+    def following(self, user_id):
+        """
+        Get the users currently followed by a user.
+
+        :param user_id: the user id
+        :return: the set of followed user ids
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return set(self.out_adj.get(user_id, ()))
+
+    def followers(self, user_id):
+        """
+        Get the users currently following a user.
+
+        :param user_id: the user id
+        :return: the set of follower ids
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return set(self.in_adj.get(user_id, ()))
+
+    def out_degree(self, user_id):
+        """
+        Get the number of users currently followed by a user.
+
+        :param user_id: the user id
+        :return: the out-degree of the user
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return len(self.out_adj.get(user_id, ()))
+
+    def in_degree(self, user_id):
+        """
+        Get the number of users currently following a user.
+
+        :param user_id: the user id
+        :return: the in-degree of the user
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return len(self.in_adj.get(user_id, ()))
+
+    def in_degrees(self):
+        """
+        Get the in-degree of every user having at least one follower.
+
+        :return: a dictionary user id -> in-degree
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return {user_id: len(users) for user_id, users in self.in_adj.items() if len(users) > 0}
+
+    def edges(self):
+        """
+        Get the current follow relationships.
+
+        :return: the list of (user id, followed user id) pairs
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return [(user_id, target_id) for user_id, users in self.out_adj.items() for target_id in users]
+
+    def ensure_loaded(self):
+        """
+        Load the graph if needed.
+        """
+        with self.lock:
+            self.__ensure_loaded()
+
+    def __ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def __apply(self, user_id, target_id, action):
+        if action == "follow":
+            self.out_adj.setdefault(user_id, set()).add(target_id)
+            self.in_adj.setdefault(target_id, set()).add(user_id)
+        else:
+            self.out_adj.get(user_id, set()).discard(target_id)
+            self.in_adj.get(target_id, set()).discard(user_id)
+
+
+follow_graph = FollowGraph()
@@ -0,0 +1,206 @@
+import bisect
+import heapq
+import itertools
+import threading
+from y_server import app, db
+from y_server.modals import Post, Post_hashtags
+
+
+class HashtagIndex(object):
+    """
+    In-memory inverted index from hashtag id to the recent posts using it.
+
+    The postings of each hashtag are kept in per-round buckets of ascending post ids,
+    together with the hashtags and the author of each indexed post, covering the last
+    `retention` rounds (the same window as the post index). Searches only visit the
+    postings of the requested hashtags.
+    """
+
+    def __init__(self, retention=72):
+        self.retention = retention
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the index content: it will be reloaded from the database on the next use.
+        """
+        with self.lock:
+            self.loaded = False
+            self.horizon = None
+            self.postings = {}
+            self.post_hashtags = {}
+            self.post_author = {}
+            self.post_round = {}
+            self.authors = {}
+
+    def load(self, current_round):
+        """
+        Load the hashtags of the posts of the last rounds from the database.
+
+        :param current_round: the current round id
+        """
+        with self.lock:
+            self.postings, self.post_hashtags, self.authors = {}, {}, {}
+            self.post_author, self.post_round = {}, {}
+            self.horizon = current_round - self.retention
+
+            rows = (
+                db.session.query(Post.id, Post.user_id, Post.round, Post_hashtags.hashtag_id)
+                .join(Post_hashtags, Post_hashtags.post_id == Post.id)
+                .filter(Post.round >= self.horizon)
+                .order_by(Post.id)
+            )
+            for post_id, group in itertools.groupby(rows, key=lambda row: row[0]):
+                group = list(group)
+                self.__insert(post_id, group[0][1], group[0][2], [row[3] for row in group])
+
+            self.loaded = True
+
+    def covers(self, visibility):
+        """
+        Check whether the index holds every post visible from the given round.
+
+        :param visibility: the first visible round
+        :return: True if the search can be computed from memory
+        """
+        return self.loaded and visibility >= self.horizon
+
+    def add(self, post_id, user_id, rnd, hashtag_ids):
+        """
+        Index the hashtags of a new post.
+
+        :param post_id: the post id
+        :param user_id: the author id
+        :param rnd: the round of the post
+        :param hashtag_ids: the hashtag ids of the post
+        """
+        with self.lock:
+            if not self.loaded or len(hashtag_ids) == 0 or post_id in self.post_round or rnd < self.horizon:
+                return
+            self.__insert(post_id, user_id, rnd, list(dict.fromkeys(hashtag_ids)))
+
+    def advance(self, current_round):
+        """
+        Move the visibility window forward, dropping the postings that fell out of it.
+
+        :param current_round: the current round id
+        """
+        with self.lock:
+            if not self.loaded or current_round - self.retention <= self.horizon:
+                return
+            self.horizon = current_round - self.retention
+
+            for hashtag_id in list(self.postings):
+                buckets = self.postings[hashtag_id]
+                for rnd in [r for r in buckets if r < self.horizon]:
+                    for post_id in buckets.pop(rnd):
+                        if self.post_hashtags.pop(post_id, None) is not None:
+                            del self.post_round[post_id]
+                            user_id = self.post_author.pop(post_id)
+                            self.authors[user_id].discard(post_id)
+                            if len(self.authors[user_id]) == 0:
+                                del self.authors[user_id]
+                if len(buckets) == 0:
+                    del self.postings[hashtag_id]
+
+    def user_hashtags(self, user_id, visibility, limit):
+        """
+        Get the hashtags most recently used by a user.
+
+        :param user_id: the user id
+        :param visibility: the first visible round
+        :param limit: the maximum number of hashtags
+        :return: the list of hashtag ids, the most recent first
+        """
+        with self.lock:
+            res = {}
+            for post_id in sorted(self.authors.get(user_id, ()), reverse=True):
+                if self.post_round[post_id] < visibility:
+                    break
+                for hashtag_id in self.post_hashtags[post_id]:
+                    res.setdefault(hashtag_id, None)
+                if len(res) >= limit:
+                    break
+            return list(res)[:limit]
+
+    def candidates(self, hashtag_ids, visibility, exclude=None):
+        """
+        Get the visible posts using any of the given hashtags.
+
+        :param hashtag_ids: the hashtag ids
+        :param visibility: the first visible round
+        :param exclude: if given, posts of this user are skipped
+        :return: the list of post ids, in ascending order
+        """
+        with self.lock:
+            return sorted(
+                {
+                    post_id
+                    for post_id in self.__postings(hashtag_ids, visibility)
+                    if self.post_author[post_id] != exclude
+                }
+            )
+
+    def latest(self, hashtag_ids, visibility, limit, exclude=None):
+        """
+        Get the most recent visible posts using any of the given hashtags.
+
+        :param hashtag_ids: the hashtag ids
+        :param visibility: the first visible round
+        :param limit: the maximum number of posts
+        :param exclude: if given, posts of this user are skipped
+        :return: the list of post ids, the most recent first
+        """
+        with self.lock:
+            lists = [
+                reversed(bucket)
+                for hashtag_id in hashtag_ids
+                for rnd, bucket in self.postings.get(hashtag_id, {}).items()
+                if rnd >= visibility
+            ]
+            res = []
+            for post_id in heapq.merge(*lists, reverse=True):
+                if len(res) == limit:
+                    break
+                if (len(res) == 0 or res[-1] != post_id) and self.post_author[post_id] != exclude:
+                    res.append(post_id)
+            return res
+
+    def overlap(self, hashtag_ids, visibility, limit, exclude=None):
+        """
+        Get the visible posts sharing the most hashtags with the given ones, the most recent first on ties.
+
+        :param hashtag_ids: the hashtag ids
+        :param visibility: the first visible round
+        :param limit: the maximum number of posts
+        :param exclude: if given, posts of this user are skipped
+        :return: the list of post ids
+        """
+        with self.lock:
+            counts = {}
+            for post_id in self.__postings(hashtag_ids, visibility):
+                if self.post_author[post_id] != exclude:
+                    counts[post_id] = counts.get(post_id, 0) + 1
+            return heapq.nlargest(limit, counts, key=lambda p: (counts[p], p))
+
+    def __postings(self, hashtag_ids, visibility):
+        for hashtag_id in set(hashtag_ids):
+            for rnd, bucket in self.postings.get(hashtag_id, {}).items():
+                if rnd >= visibility:
+                    yield from bucket
+
+    def __insert(self, post_id, user_id, rnd, hashtag_ids):
+        self.post_hashtags[post_id] = hashtag_ids
+        self.post_author[post_id] = user_id
+        self.post_round[post_id] = rnd
+        self.authors.setdefault(user_id, set()).add(post_id)
+        for hashtag_id in hashtag_ids:
+            bucket = self.postings.setdefault(hashtag_id, {}).setdefault(rnd, [])
+            if len(bucket) == 0 or bucket[-1] < post_id:
+                bucket.append(post_id)
+            else:
+                bisect.insort(bucket, post_id)
+
+
+hashtag_index = HashtagIndex(retention=app.config["post_index_rounds"])
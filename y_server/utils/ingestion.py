@@ -0,0 +1,126 @@
+from y_server import db
+from y_server.modals import (
+    Mentions,
+    Post_emotions,
+    Post_hashtags,
+    Post_Sentiment,
+    Post_topics,
+)
+from y_server.utils.post_index import post_index
+from y_server.utils.hashtag_index import hashtag_index
+from y_server.utils.mention_queue import mention_queue
+from y_server.utils.user_cache import user_cache
+from y_server.utils.thread_store import thread_store
+from y_server.utils.feed_cache import feed_cache, FOLLOWERS_MODES
+from y_server.utils.follow_graph import follow_graph
+from y_server.utils import vocabulary
+from y_server.utils.post_counters import count_post
+
+
+def emotion_ids(names):
+    """
+    Resolve emotion names to ids. Unknown emotions are skipped.
+
+    :param names: the list of emotion names
+    :return: the list of emotion ids
+    """
+    ids = vocabulary.emotions.lookup([name for name in names if len(name) > 0], create=False)
+    return [emotion_id for emotion_id in ids if emotion_id is not None]
+
+
+def hashtag_ids(names):
+    """
+    Resolve hashtags to ids, adding the missing ones to the current transaction.
+
+    :param names: the list of hashtags
+    :return: the list of hashtag ids
+    """
+    return vocabulary.hashtags.lookup(names)
+
+
+def topic_ids(names):
+    """
+    Resolve topic names to interest ids, adding the missing ones to the current transaction.
+
+    :param names: the list of topic names
+    :return: the list of interest ids
+    """
+    return vocabulary.interests.lookup(names)
+
+
+def mentioned_users(mentions):
+    """
+    Resolve mentions (e.g., "@username") to user ids.
+
+    :param mentions: the list of mentions
+    :return: the list of user ids, None for unknown users
+    """
+    return [user_cache.user_id(mention.strip("@")) for mention in mentions]
+
+
+def ingest_post(
+    post, topics=(), sentiment=None, sentiment_topics=None, emotions=(), hashtags=(), mentions=(), **sentiment_fields
+):
+    """
+    Insert a post and its annotations with bulk inserts, committing once.
+
+    :param post: the new Post object, its thread is the post itself unless thread_id is set
+    :param topics: the ids of the post topics
+    :param sentiment: the vader sentiment of the post, None to skip the sentiment rows
+    :param sentiment_topics: the topic ids of the sentiment rows, defaults to the post topics
+    :param emotions: the emotion ids
+    :param hashtags: the hashtag ids
+    :param mentions: the ids of the mentioned users
+    :param sentiment_fields: additional Post_Sentiment fields (e.g., is_post, is_comment, sentiment_parent)
+    :return: the post
+    """
+    db.session.add(post)
+    db.session.flush()
+
+    if post.thread_id is None:
+        post.thread_id = post.id
+
+    db.session.bulk_insert_mappings(
+        Post_topics, [{"post_id": post.id, "topic_id": topic_id} for topic_id in topics]
+    )
+
+    if sentiment is not None:
+        sentiment_topics = topics if sentiment_topics is None else sentiment_topics
+        db.session.bulk_insert_mappings(
+            Post_Sentiment,
+            [
+                {
+                    "post_id": post.id,
+                    "user_id": post.user_id,
+                    "pos": sentiment["pos"],
+                    "neg": sentiment["neg"],
+                    "neu": sentiment["neu"],
+                    "compound": sentiment["compound"],
+                    "round": post.round,
+                    "topic_id": topic_id,
+                    **sentiment_fields,
+                }
+                for topic_id in sentiment_topics
+            ],
+        )
+
+    db.session.bulk_insert_mappings(
+        Post_emotions, [{"post_id": post.id, "emotion_id": emotion_id} for emotion_id in emotions]
+    )
+    db.session.bulk_insert_mappings(
+        Post_hashtags, [{"post_id": post.id, "hashtag_id": hashtag_id} for hashtag_id in hashtags]
+    )
+    db.session.bulk_insert_mappings(
+        Mentions, [{"user_id": user_id, "post_id": post.id, "round": post.round} for user_id in mentions]
+    )
+    count_post(post)
+
+    db.session.commit()
+
+    post_index.add(post.id, post.user_id, post.round)
+    hashtag_index.add(post.id, post.user_id, post.round, hashtags)
+    mention_queue.add(mentions, post.id, post.round)
+    thread_store.append(post, user_cache.get("username", post.user_id))
+    feed_cache.invalidate(uids=follow_graph.followers(post.user_id), modes=FOLLOWERS_MODES)
+    return post
+
@@ -0,0 +1,55 @@
+from y_server import app, db
+from y_server.modals import Post
+from y_server.translate import translate_batch
+from y_server.utils.batch_worker import BatchWorker
+
+
+class Localizer(BatchWorker):
+    """
+    Background worker filling the localized text (tweet_loc) of the new posts.
+
+    The request handlers only enqueue the post ids and texts: the worker translates them
+    in batches, one backend call per language pair, and updates the posts.
+    """
+
+    name = "localization-worker"
+
+    def submit(self, post_id, text, src_lang, tgt_lang, prefix="", suffix=""):
+        """
+        Enqueue a post to be localized.
+
+        :param post_id: the post id
+        :param text: the text to translate
+        :param src_lang: the source language name
+        :param tgt_lang: the target language name
+        :param prefix: the untranslated text preceding the translation (e.g., the mentions)
+        :param suffix: the untranslated text following the translation (e.g., the hashtags)
+        """
+        if not app.config.get("localize_posts", False):
+            return
+        super().submit((post_id, text, src_lang, tgt_lang, prefix, suffix))
+
+    def process(self, batch):
+        """
+        Translate a batch of posts and store their localized text.
+
+        :param batch: the list of (post id, text, source language, target language, prefix, suffix) tuples
+        :return: the number of localized posts
+        """
+        pairs = {}
+        for item in batch:
+            pairs.setdefault((item[2], item[3]), []).append(item)
+
+        rows = []
+        for (src_lang, tgt_lang), items in pairs.items():
+            translations = translate_batch([item[1] for item in items], src_lang, tgt_lang)
+            for (post_id, _, _, _, prefix, suffix), text_loc in zip(items, translations):
+                rows.append({"id": post_id, "tweet_loc": f"{prefix} {text_loc} {suffix}".strip()})
+
+        with app.app_context():
+            db.session.bulk_update_mappings(Post, rows)
+            db.session.commit()
+        return len(rows)
+
+
+localizer = Localizer()
@@ -0,0 +1,149 @@
+import threading
+from y_server import app, db
+from y_server.modals import Mentions
+from y_server.utils import sampling
+
+
+class MentionQueue(object):
+    """
+    Per-user queues of the unanswered mentions of the last rounds.
+
+    Each queue holds (post id, round) pairs in arrival order. New mentions are appended by
+    the ingestion of posts, comments and shares; /read_mentions pops a random entry within
+    the requested visibility window and marks it answered. Entries older than `retention`
+    rounds are dropped as the clock advances and are served from the database instead.
+    """
+
+    def __init__(self, retention=72):
+        self.retention = retention
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the queues: they will be reloaded from the database on the next use.
+        """
+        with self.lock:
+            self.loaded = False
+            self.horizon = None
+            self.queues = {}
+
+    def load(self, current_round):
+        """
+        Load the unanswered mentions of the last rounds from the database.
+
+        :param current_round: the current round id
+        """
+        with self.lock:
+            self.queues = {}
+            self.horizon = current_round - self.retention
+
+            mentions = (
+                db.session.query(Mentions.user_id, Mentions.post_id, Mentions.round)
+                .filter(Mentions.answered == 0, Mentions.round >= self.horizon)
+                .order_by(Mentions.id)
+            )
+            for user_id, post_id, rnd in mentions:
+                self.queues.setdefault(user_id, []).append((post_id, rnd))
+
+            self.loaded = True
+
+    def covers(self, visibility):
+        """
+        Check whether the queues hold every unanswered mention visible from the given round.
+
+        :param visibility: the first visible round
+        :return: True if the mentions can be served from memory
+        """
+        return self.loaded and visibility >= self.horizon
+
+    def add(self, user_ids, post_id, rnd):
+        """
+        Enqueue the mentions of a new post.
+
+        :param user_ids: the ids of the mentioned users
+        :param post_id: the post id
+        :param rnd: the round of the post
+        """
+        with self.lock:
+            if not self.loaded or rnd < self.horizon:
+                return
+            for user_id in user_ids:
+                self.queues.setdefault(user_id, []).append((post_id, rnd))
+
+    def advance(self, current_round):
+        """
+        Move the window forward, dropping the mentions that fell out of it.
+
+        :param current_round: the current round id
+        """
+        with self.lock:
+            if not self.loaded or current_round - self.retention <= self.horizon:
+                return
+            self.horizon = current_round - self.retention
+
+            for user_id in list(self.queues):
+                queue = [entry for entry in self.queues[user_id] if entry[1] >= self.horizon]
+                if len(queue) > 0:
+                    self.queues[user_id] = queue
+                else:
+                    del self.queues[user_id]
+
+    def pop(self, user_id, visibility, limit=1):
+        """
+        Take random unanswered mentions of a user (the caller marks them answered and commits).
+
+        :param user_id: the user id
+        :param visibility: the first visible round
+        :param limit: the maximum number of mentions
+        :return: the list of post ids
+        """
+        with self.lock:
+            queue = self.queues.get(user_id, [])
+            visible = [pos for pos, (_, rnd) in enumerate(queue) if rnd >= visibility]
+            taken = set(sampling.sample(visible, limit))
+            res = [queue[pos][0] for pos in visible if pos in taken]
+            if len(taken) > 0:
+                self.queues[user_id] = [entry for pos, entry in enumerate(queue) if pos not in taken]
+            return res
+
+
+def read_mentions(user_id, visibility, current_round, limit=1):
+    """
+    Consume the unanswered mentions of a user, marking them answered (the caller commits).
+
+    :param user_id: the user id
+    :param visibility: the first visible round
+    :param current_round: the current round id
+    :param limit: the maximum number of mentions
+    :return: the list of post ids mentioning the user
+    """
+    indexed = app.config["post_index"]
+    if indexed and not mention_queue.loaded:
+        mention_queue.load(current_round)
+    elif indexed:
+        # the clock may have been advanced by another server process
+        mention_queue.advance(current_round)
+
+    if indexed and mention_queue.covers(visibility):
+        post_ids = mention_queue.pop(user_id, visibility, limit)
+    else:
+        mentions = db.session.query(Mentions.post_id).filter(
+            Mentions.user_id == user_id,
+            Mentions.round >= visibility,
+            Mentions.answered == 0,
+        )
+        post_ids = sampling.sample([post_id for post_id, in mentions], limit)
+
+    res = []
+    for post_id in post_ids:
+        # skip the mentions already answered through another server process
+        answered = Mentions.query.filter_by(user_id=user_id, post_id=post_id, answered=0).update(
+            {"answered": 1}, synchronize_session=False
+        )
+        if answered > 0:
+            res.append(post_id)
+    return res
+
+
+mention_queue = MentionQueue(retention=app.config["post_index_rounds"])
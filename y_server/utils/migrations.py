@@ -0,0 +1,224 @@
+"""
+Versioned schema migrations of the experiment databases.
+
+This module only depends on SQLAlchemy, so that y_server_migrate.py can apply it to database
+files without starting the server configuration.
+"""
+import re
+from sqlalchemy import Integer, inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+
+def integer_news_ids(engine):
+    """
+    Store the news ids of the posts as integers, like the ids of the articles they reference, in
+    the databases whose post table declares them as text. The ids that are not numbers become -1.
+
+    SQLite cannot change the type of a column, so the table is rebuilt with its indexes.
+
+    :param engine: the SQLAlchemy engine
+    :return: the list of rebuilt tables
+    """
+    if "post" not in inspect(engine).get_table_names():
+        return []
+    column = next(column for column in inspect(engine).get_columns("post") if column["name"] == "news_id")
+    if isinstance(column["type"], Integer):
+        return []
+
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            table, indexes = conn.execute(
+                text("SELECT sql, (SELECT group_concat(sql, ';') FROM sqlite_master WHERE type = 'index' "
+                     "AND tbl_name = 'post' AND sql IS NOT NULL) FROM sqlite_master WHERE name = 'post'")
+            ).one()
+            table = re.sub(r'("?news_id"?\s+)\w+(\(\d+\))?', r"\1INTEGER", table, count=1)
+            table = re.sub(r'^(CREATE TABLE (IF NOT EXISTS )?)"?post"?', r"\1post_migrated", table, count=1)
+            conn.exec_driver_sql(table)
+            # the integer affinity of the new column converts the numeric texts
+            conn.execute(text("INSERT INTO post_migrated SELECT * FROM post"))
+            conn.execute(text("UPDATE post_migrated SET news_id = -1 WHERE typeof(news_id) = 'text'"))
+            conn.execute(text("DROP TABLE post"))
+            conn.execute(text("ALTER TABLE post_migrated RENAME TO post"))
+            for index in (indexes or "").split(";"):
+                if len(index) > 0:
+                    conn.exec_driver_sql(index)
+        else:
+            conn.execute(
+                text("ALTER TABLE post ALTER COLUMN news_id TYPE INTEGER USING "
+                     "CASE WHEN news_id ~ '^-?[0-9]+$' THEN news_id::integer ELSE -1 END")
+            )
+    return ["post"]
+
+
+def reaction_counts(engine):
+    """
+    Add the count of the reactions of every type to the post counters, in the databases whose
+    counters only hold the likes and the dislikes.
+
+    :param engine: the SQLAlchemy engine
+    :return: the list of rewritten tables
+    """
+    tables = inspect(engine).get_table_names()
+    if "post_counters" not in tables:
+        return []
+    if any(column["name"] == "reactions" for column in inspect(engine).get_columns("post_counters")):
+        return []
+
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE post_counters ADD COLUMN reactions INTEGER DEFAULT 0"))
+        if "reactions" in tables:
+            conn.execute(
+                text("UPDATE post_counters SET reactions = (SELECT count(*) FROM reactions "
+                     "WHERE reactions.post_id = post_counters.post_id)")
+            )
+    return ["post_counters"]
+
+
+# version -> (description, list of (table, index, columns, unique) or function(engine) rewriting the tables)
+MIGRATIONS = {
+    1: (
+        "indexes on the hot filter columns",
+        [
+            ("post", "post_round", ("round",), False),
+            ("post", "post_user_id", ("user_id",), False),
+            ("post", "post_thread_id", ("thread_id",), False),
+            ("post", "post_comment_to", ("comment_to",), False),
+            ("follow", "follow_user_follower_round", ("user_id", "follower_id", "round"), False),
+            ("reactions", "reactions_post_id", ("post_id",), False),
+            ("post_sentiment", "post_sentiment_post_id", ("post_id",), False),
+            ("mentions", "mentions_user_answered_round", ("user_id", "answered", "round"), False),
+            ("user_opinions", "user_opinions_user_topic_round", ("user_id", "topic_id", "round"), False),
+            ("post_hashtags", "post_hashtags_post_id", ("post_id",), False),
+            ("post_hashtags", "post_hashtags_hashtag_id", ("hashtag_id",), False),
+            ("post_topics", "post_topics_post_id", ("post_id",), False),
+        ],
+    ),
+    2: (
+        "unique names of the vocabularies",
+        [
+            ("hashtags", "hashtags_hashtag", ("hashtag",), True),
+            ("emotions", "emotions_emotion", ("emotion",), True),
+            ("interests", "interests_interest", ("interest",), True),
+        ],
+    ),
+    3: ("integer news ids of the posts", integer_news_ids),
+    4: ("reactions of every type in the post counters", reaction_counts),
+}
+
+# name -> representative query of the route handlers, with sample parameters
+HOT_QUERIES = {
+    "feed of the visible posts": ("SELECT id FROM post WHERE round >= :r AND user_id != :u", {"r": 0, "u": 1}),
+    "posts of a user": ("SELECT id FROM post WHERE user_id = :u", {"u": 1}),
+    "thread": ("SELECT id FROM post WHERE thread_id = :t ORDER BY id", {"t": 1}),
+    "comments of a post": ("SELECT id FROM post WHERE comment_to = :p", {"p": 1}),
+    "follow actions": (
+        "SELECT action FROM follow WHERE user_id = :u AND follower_id = :f ORDER BY round DESC",
+        {"u": 1, "f": 2},
+    ),
+    "reactions of a post": ("SELECT count(*) FROM reactions WHERE post_id = :p", {"p": 1}),
+    "sentiment of a post": ("SELECT compound FROM post_sentiment WHERE post_id = :p", {"p": 1}),
+    "unanswered mentions": (
+        "SELECT post_id FROM mentions WHERE user_id = :u AND answered = 0 AND round >= :r",
+        {"u": 1, "r": 0},
+    ),
+    "opinions of a user": (
+        "SELECT score FROM user_opinions WHERE user_id = :u AND topic_id = :t ORDER BY round DESC",
+        {"u": 1, "t": 1},
+    ),
+    "hashtags of a post": ("SELECT hashtag_id FROM post_hashtags WHERE post_id = :p", {"p": 1}),
+    "posts of a hashtag": ("SELECT post_id FROM post_hashtags WHERE hashtag_id = :h", {"h": 1}),
+    "topics of a post": ("SELECT topic_id FROM post_topics WHERE post_id = :p", {"p": 1}),
+}
+
+
+def version(conn):
+    """
+    Get the schema version of a database.
+
+    :param conn: the SQLAlchemy connection
+    :return: the version, 0 if no migration has been applied
+    """
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    res = conn.execute(text("SELECT max(version) FROM schema_version")).scalar()
+    return 0 if res is None else res
+
+
+def migrate(engine, target=None):
+    """
+    Apply the pending migrations to a database, in order.
+
+    Indexes on tables missing from the database are skipped (the tables created later get
+    them from the models). Unique indexes that the existing data violates are skipped too,
+    so that old databases keep working without them.
+
+    :param engine: the SQLAlchemy engine
+    :param target: the version to reach, the latest one if None
+    :return: a dictionary with the previous and the new version, the created and the skipped indexes,
+        and the rewritten tables
+    """
+    target = max(MIGRATIONS) if target is None else target
+    with engine.begin() as conn:
+        previous = version(conn)
+
+    created, skipped, rewritten = [], [], []
+    for number in sorted(MIGRATIONS):
+        if number <= previous or number > target:
+            continue
+
+        if callable(MIGRATIONS[number][1]):
+            rewritten.extend(MIGRATIONS[number][1](engine))
+            with engine.begin() as conn:
+                conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": number})
+            continue
+
+        tables = set(inspect(engine).get_table_names())
+        for table, index, columns, unique in MIGRATIONS[number][1]:
+            if table not in tables:
+                skipped.append(index)
+                continue
+            statement = (
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {index} ON {table} ({', '.join(columns)})"
+            )
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(statement))
+                created.append(index)
+            except (IntegrityError, OperationalError, ProgrammingError):
+                if not unique:
+                    raise
+                skipped.append(index)
+
+        with engine.begin() as conn:
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {"v": number})
+
+    with engine.begin() as conn:
+        current = version(conn)
+    return {"previous": previous, "version": current, "created": created, "skipped": skipped, "rewritten": rewritten}
+
+
+def full_scans(engine):
+    """
+    Report the hot queries whose plan still scans a whole table.
+
+    :param engine: the SQLAlchemy engine
+    :return: a dictionary query name -> list of the plan steps scanning a table
+    """
+    tables = set(inspect(engine).get_table_names())
+    res = {}
+    with engine.connect() as conn:
+        for name, (query, params) in HOT_QUERIES.items():
+            table = query.split(" FROM ")[1].split()[0]
+            if table not in tables:
+                continue
+
+            if engine.dialect.name == "sqlite":
+                plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {query}"), params)]
+                # "SCAN post" reads the table, "SCAN post USING INDEX ..." reads an index
+                scans = [step for step in plan if step.startswith("SCAN") and " USING " not in step]
+            else:
+                plan = [row[0] for row in conn.execute(text(f"EXPLAIN {query}"), params)]
+                scans = [step.strip() for step in plan if "Seq Scan" in step]
+
+            if len(scans) > 0:
+                res[name] = scans
+    return res
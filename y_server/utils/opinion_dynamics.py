@@ -1,6 +1,8 @@
 from sqlalchemy import desc
 from sqlalchemy import func, and_
-from y_server.modals import User_opinions, Follow, Reactions, Post_topics, Post
+from y_server.modals import User_opinions, Reactions, Post_topics, Post
+from y_server.utils.follow_graph import follow_graph
+from y_server.utils.opinion_store import latest_opinion, latest_opinions
 from y_server import db
 import numpy as np
 from collections import defaultdict
@@ -49,22 +51,14 @@ def friedkin_johnsen(user_id, topic, tid, susceptibility=0, is_state_dependent=F
     """
     # Get user's opinion
     initial_opinion = User_opinions.query.filter_by(user_id=user_id, topic_id=topic.iid, round=0).first().score
-    current_opinion = User_opinions.query.filter_by(user_id=user_id, topic_id=topic.iid).order_by(User_opinions.round.desc()).first().score
+    current_opinion = latest_opinion(user_id, topic.iid).score
     persistent_opinion = current_opinion if is_state_dependent else initial_opinion
 
     # Get the following user IDs
-    touched_users = (db.session.query(Follow.follower_id).filter(Follow.user_id == user_id).distinct().all())
-    following_ids = []
-    for (follower_id,) in touched_users:
-        last_action = (Follow.query.filter_by(user_id=user_id, follower_id=follower_id).order_by(Follow.round.desc()).first())
-        if last_action and last_action.action == "follow":
-            following_ids.append(follower_id)
+    following_ids = follow_graph.following(user_id)
 
     # Get latest opinions of peers 
-    peer_opinions = []
-    for fid in following_ids:
-        latest_opinion = User_opinions.query.filter_by(user_id=fid, topic_id=topic.iid).order_by(User_opinions.round.desc()).first()
-        peer_opinions.append(latest_opinion.score)
+    peer_opinions = [opinion.score for opinion in latest_opinions(following_ids, topic.iid).values()]
     
     if len(peer_opinions) == 0:
         return current_opinion  # No influence: return current opinion
@@ -82,7 +76,7 @@ def weighted_friedkin_johnsen(user_id, topic, susceptibility=0):
     """
 
     # Get user's persistent opinion (x_i(0))
-    user_opinion_entry = User_opinions.query.filter_by(user_id=user_id, topic_id=topic.iid).order_by(User_opinions.round.desc()).first()
+    user_opinion_entry = latest_opinion(user_id, topic.iid)
     persistent_opinion = user_opinion_entry.score if user_opinion_entry else 0.5  # Default if missing
 
     # Get neighbors' weights for this topic
@@ -90,8 +84,9 @@ def weighted_friedkin_johnsen(user_id, topic, susceptibility=0):
 
     # Get latest opinions of peers and compute the weighted sum
     weighted_sum = 0.0
+    neighbor_opinions = latest_opinions(weights.keys(), topic.iid)
     for neighbor_id, w in weights.items():
-        neighbor_opinion = User_opinions.query.filter_by(user_id=neighbor_id, topic_id=topic.iid).order_by(User_opinions.round.desc()).first()
+        neighbor_opinion = neighbor_opinions.get(neighbor_id)
         if neighbor_opinion:
             weighted_sum += w * neighbor_opinion.score
 
@@ -110,16 +105,11 @@ def compute_neighbor_weights(user_id, topic):
         dict[neighbor_id] = weight
     """
     # Get the user's last opinion update
-    user_last_opinion = User_opinions.query.filter_by(user_id=user_id, topic_id=topic.iid).order_by(desc(User_opinions.round)).first()
+    user_last_opinion = latest_opinion(user_id, topic.iid)
     last_tid = user_last_opinion.round if user_last_opinion else -1
     
     # Get the following user IDs
-    touched_users = (db.session.query(Follow.follower_id).filter(Follow.user_id == user_id).distinct().all())
-    following_ids = []
-    for (follower_id,) in touched_users:
-        last_action = (Follow.query.filter_by(user_id=user_id, follower_id=follower_id).order_by(Follow.round.desc()).first())
-        if last_action and last_action.action == "follow":
-            following_ids.append(follower_id)
+    following_ids = follow_graph.following(user_id)
 
     # Initialize weights
     weights = defaultdict(float)
@@ -0,0 +1,214 @@
+import numpy as np
+from scipy import sparse
+from sqlalchemy import func, and_
+from y_server import db
+from y_server.modals import User_opinions, User_opinions_latest, Reactions, Post_topics, Post
+from y_server.utils.follow_graph import follow_graph
+from y_server.utils.user_cache import user_cache
+from y_server.utils.opinion_dynamics import ACTION_WEIGHT
+from y_server.utils.opinion_store import add_opinions
+
+METHODS = ("friedkin_johnsen", "state_dependent_fj", "weighted_friedkin_johnsen")
+
+
+def load_opinions(topic):
+    """
+    Load the initial and the latest opinion of every user on a topic.
+
+    :param topic: the Interests object
+    :return: the list of user ids and the arrays of initial scores, latest scores, latest llm scores and latest rounds
+    """
+    latest = {
+        opinion.user_id: (opinion.round, opinion.score, opinion.score_llm)
+        for opinion in User_opinions_latest.query.filter_by(topic_id=topic.iid)
+    }
+
+    # the initial opinion is the one of round 0, the earliest one if missing
+    first_round = (
+        db.session.query(User_opinions.user_id, func.min(User_opinions.round).label("round"))
+        .filter(User_opinions.topic_id == topic.iid)
+        .group_by(User_opinions.user_id)
+        .subquery()
+    )
+    initial_opinions = (
+        db.session.query(User_opinions.user_id, User_opinions.score)
+        .join(
+            first_round,
+            and_(User_opinions.user_id == first_round.c.user_id, User_opinions.round == first_round.c.round),
+        )
+        .filter(User_opinions.topic_id == topic.iid)
+        .order_by(User_opinions.id.desc())
+    )
+    initial = dict(initial_opinions.all())
+
+    users = sorted(latest)
+    x0 = np.array([initial.get(u, latest[u][1]) for u in users], dtype=float)
+    x = np.array([latest[u][1] for u in users], dtype=float)
+    x_llm = np.array([latest[u][2] for u in users], dtype=float)
+    rounds = np.array([latest[u][0] for u in users], dtype=int)
+    return users, x0, x, x_llm, rounds
+
+
+def follow_matrix(users, index):
+    """
+    Build the adjacency matrix of the current follow relationships.
+
+    :param users: the list of user ids of the rows
+    :param index: a dictionary user id -> column
+    :return: a sparse matrix A, A[i, j] = 1 if users[i] follows the user of column j
+    """
+    rows, cols = [], []
+    for i, user_id in enumerate(users):
+        for target_id in follow_graph.following(user_id):
+            if target_id in index:
+                rows.append(i)
+                cols.append(index[target_id])
+    data = np.ones(len(rows), dtype=float)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(users), len(index)))
+
+
+def friedkin_johnsen(topic, susceptibility=None, user_ids=None, is_state_dependent=False):
+    """
+    Compute the Friedkin-Johnsen update of all the users having an opinion on a topic.
+
+        x(t+1) = (1 - λ) * x(0) + λ * D^-1 A x(t)
+
+    where A is the follow matrix restricted to the users having an opinion and D its out-degrees.
+    In the state-dependent version x(0) is replaced by x(t). Users not following anyone having
+    an opinion keep their current one.
+
+    :param topic: the Interests object
+    :param susceptibility: the susceptibility of all the users, read from their profile if None
+    :param user_ids: if given, restrict the update to these users
+    :param is_state_dependent: whether to use the state-dependent model
+    :return: the list of user ids, the array of new scores and the array of latest llm scores
+    """
+    users, x0, x, x_llm, _ = load_opinions(topic)
+    index = {user_id: i for i, user_id in enumerate(users)}
+
+    A = follow_matrix(users, index)
+    degree = np.asarray(A.sum(axis=1)).ravel()
+    peer_avg = np.divide(A @ x, degree, out=np.zeros_like(x), where=degree > 0)
+
+    lam = susceptibilities(users) if susceptibility is None else susceptibility
+    persistent = x if is_state_dependent else x0
+    scores = np.where(degree > 0, (1 - lam) * persistent + lam * peer_avg, x)
+
+    return __select(users, scores, x_llm, user_ids)
+
+
+def weighted_friedkin_johnsen(topic, susceptibility=None, user_ids=None):
+    """
+    Compute the weighted Friedkin-Johnsen update of all the users having an opinion on a topic.
+
+        x(t+1) = (1 - λ) * x(t) + λ * W x(t) / W 1
+
+    where W sums, for each pair of users, the follow weight and the weights of the reactions given
+    since the last opinion update on posts about the topic (see ACTION_WEIGHT). The normalization
+    also accounts for neighbors without an opinion; users with a null total weight keep their opinion.
+
+    :param topic: the Interests object
+    :param susceptibility: the susceptibility of all the users, read from their profile if None
+    :param user_ids: if given, restrict the update to these users
+    :return: the list of user ids, the array of new scores and the array of latest llm scores
+    """
+    users, _, x, x_llm, rounds = load_opinions(topic)
+    index = {user_id: i for i, user_id in enumerate(users)}
+
+    # neighbors without an opinion get a column after the users having one
+    rows, cols, data = [], [], []
+
+    def column(user_id):
+        if user_id not in index:
+            index[user_id] = len(index)
+        return index[user_id]
+
+    for i, user_id in enumerate(users):
+        for target_id in follow_graph.following(user_id):
+            rows.append(i)
+            cols.append(column(target_id))
+            data.append(ACTION_WEIGHT["follow"])
+
+    if len(users) > 0:
+        reactions = (
+            db.session.query(Reactions.user_id, Reactions.round, Reactions.type, Post.user_id)
+            .join(Post_topics, Reactions.post_id == Post_topics.post_id)
+            .join(Post, Reactions.post_id == Post.id)
+            .filter(Post_topics.topic_id == topic.iid, Reactions.round > int(rounds.min()))
+        )
+        for user_id, rnd, rtype, author_id in reactions:
+            i = index.get(user_id)
+            if i is None or i >= len(users) or rnd <= rounds[i]:
+                continue
+            rows.append(i)
+            cols.append(column(author_id))
+            data.append(ACTION_WEIGHT[rtype])
+
+    W = sparse.csr_matrix((data, (rows, cols)), shape=(len(users), len(index)))
+    total_weight = np.asarray(W.sum(axis=1)).ravel()
+    weighted_sum = W[:, : len(users)] @ x
+    peer_avg = np.divide(weighted_sum, total_weight, out=np.zeros_like(x), where=total_weight != 0)
+
+    lam = susceptibilities(users) if susceptibility is None else susceptibility
+    scores = np.where(total_weight != 0, (1 - lam) * x + lam * peer_avg, x)
+
+    return __select(users, scores, x_llm, user_ids)
+
+
+def update_opinions(topics, method, tid, susceptibility=None, user_ids=None):
+    """
+    Compute and record the opinions of all the users on the given topics in a single step
+    (the caller commits).
+
+    :param topics: the list of Interests objects
+    :param method: the update method (see METHODS)
+    :param tid: the round of the new opinions
+    :param susceptibility: the susceptibility of all the users, read from their profiles if None
+    :param user_ids: if given, restrict the update to these users
+    :return: the number of new opinions
+    """
+    if method not in METHODS:
+        raise ValueError(f"Method {method} not supported")
+
+    opinions = []
+    for topic in topics:
+        if method == "friedkin_johnsen":
+            users, scores, llm_scores = friedkin_johnsen(topic, susceptibility, user_ids)
+
+        elif method == "state_dependent_fj":
+            users, scores, llm_scores = friedkin_johnsen(topic, susceptibility, user_ids, is_state_dependent=True)
+
+        else:
+            users, scores, llm_scores = weighted_friedkin_johnsen(topic, susceptibility, user_ids)
+
+        for user_id, score, score_llm in zip(users, scores, llm_scores):
+            opinions.append(
+                {
+                    "score": round(float(score), 3),
+                    "score_llm": round(float(score_llm), 3),
+                    "user_id": user_id,
+                    "topic_id": topic.iid,
+                    "round": tid,
+                }
+            )
+
+    add_opinions(opinions)
+    return len(opinions)
+
+
+def susceptibilities(users):
+    """
+    Get the susceptibility of a list of users.
+
+    :param users: the list of user ids
+    :return: the array of susceptibilities, in the same order
+    """
+    return np.array([value or 0 for value in user_cache.bulk("susceptibility", users)], dtype=float)
+
+
+def __select(users, scores, x_llm, user_ids):
+    if user_ids is None:
+        return users, scores, x_llm
+    keep = set(user_ids)
+    mask = np.array([u in keep for u in users], dtype=bool)
+    return [u for u in users if u in keep], scores[mask], x_llm[mask]
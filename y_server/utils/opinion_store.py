@@ -0,0 +1,104 @@
+from y_server import db
+from y_server.modals import User_opinions, User_opinions_latest
+
+LATEST_FIELDS = ("score", "score_llm", "round", "description")
+
+
+def add_opinions(opinions):
+    """
+    Record new opinions: the rows are appended to the User_opinions history and upserted
+    in the User_opinions_latest table, in the current transaction (the caller commits).
+
+    :param opinions: a list of dictionaries with the User_opinions fields
+    """
+    if len(opinions) == 0:
+        return
+    db.session.bulk_insert_mappings(User_opinions, opinions)
+    __upsert_latest(opinions)
+
+
+def add_opinion(**opinion):
+    """
+    Record a new opinion (see add_opinions).
+
+    :param opinion: the User_opinions fields
+    """
+    add_opinions([opinion])
+
+
+def latest_opinion(user_id, topic_id):
+    """
+    Get the latest opinion of a user on a topic.
+
+    :param user_id: the user id
+    :param topic_id: the topic id
+    :return: the User_opinions_latest object, None if the user has no opinion on the topic
+    """
+    return User_opinions_latest.query.filter_by(user_id=user_id, topic_id=topic_id).first()
+
+
+def latest_opinions(user_ids, topic_id):
+    """
+    Get the latest opinion of many users on a topic.
+
+    :param user_ids: the list of user ids
+    :param topic_id: the topic id
+    :return: a dictionary user id -> User_opinions_latest object, for the users having an opinion
+    """
+    user_ids = list(user_ids)
+    if len(user_ids) == 0:
+        return {}
+    opinions = User_opinions_latest.query.filter(
+        User_opinions_latest.topic_id == topic_id, User_opinions_latest.user_id.in_(user_ids)
+    )
+    return {opinion.user_id: opinion for opinion in opinions}
+
+
+def sync_latest_opinions():
+    """
+    Fill the User_opinions_latest table from the history, if empty (e.g., databases created
+    before the table was introduced).
+    """
+    if User_opinions_latest.query.first() is not None or User_opinions.query.first() is None:
+        return
+
+    opinions = (
+        db.session.query(
+            User_opinions.user_id, User_opinions.topic_id, User_opinions.score,
+            User_opinions.score_llm, User_opinions.round, User_opinions.description,
+        )
+        .order_by(User_opinions.round, User_opinions.id)
+    )
+    __upsert_latest([opinion._asdict() for opinion in opinions])
+    db.session.commit()
+
+
+def __upsert_latest(opinions, chunk_size=500):
+    # keep a single opinion per (user, topic): the most recent one
+    latest = {}
+    for opinion in opinions:
+        key = (opinion["user_id"], opinion["topic_id"])
+        if key not in latest or opinion["round"] >= latest[key]["round"]:
+            latest[key] = opinion
+    rows = [
+        {
+            "user_id": user_id,
+            "topic_id": topic_id,
+            **{field: opinion.get(field) for field in LATEST_FIELDS},
+        }
+        for (user_id, topic_id), opinion in latest.items()
+    ]
+
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    for start in range(0, len(rows), chunk_size):
+        stmt = insert(User_opinions_latest).values(rows[start:start + chunk_size])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "topic_id"],
+            set_={field: stmt.excluded[field] for field in LATEST_FIELDS},
+            where=stmt.excluded.round >= User_opinions_latest.round,
+        )
+        db.session.execute(stmt)
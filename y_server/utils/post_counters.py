@@ -0,0 +1,124 @@
+from sqlalchemy import event, func
+from y_server import db
+from y_server.modals import Post, Post_counters, Reactions
+from y_server.utils.post_index import post_index
+from y_server.utils.feed_cache import feed_cache, POPULARITY_MODES
+
+COUNTERS = ("likes", "dislikes", "comments", "shares", "reactions")
+
+# reaction type -> counter, besides the reactions counter of every type
+REACTION_COUNTERS = {"like": "likes", "dislike": "dislikes"}
+
+# number of reactions of any type of a post, ranking the popularity feeds (in the database and in the post index)
+REACTIONS = Post_counters.reactions
+
+
+def count_reaction(post_id, rtype):
+    """
+    Count a new reaction to a post, in the current transaction (the caller commits).
+    The post index counts it (and the precomputed popularity feeds are dropped) once the
+    transaction is committed.
+
+    :param post_id: the post id
+    :param rtype: the reaction type
+    """
+    increment = {"post_id": post_id, "reactions": 1}
+    if rtype in REACTION_COUNTERS:
+        increment[REACTION_COUNTERS[rtype]] = 1
+    __increment([increment])
+    pending = db.session.info.setdefault("post_counters", {})
+    pending[post_id] = pending.get(post_id, 0) + 1
+
+
+def count_post(post):
+    """
+    Count a new comment or share on the post it refers to, in the current transaction (the caller commits).
+
+    :param post: the new Post object
+    """
+    if post.comment_to is not None and post.comment_to != -1:
+        __increment([{"post_id": post.comment_to, "comments": 1}])
+    if post.shared_from is not None and post.shared_from != -1:
+        __increment([{"post_id": post.shared_from, "shares": 1}])
+
+
+def counters(post_ids):
+    """
+    Get the counters of a list of posts.
+
+    :param post_ids: the list of post ids
+    :return: a dictionary post id -> dictionary counter -> value (posts without counters are omitted)
+    """
+    rows = Post_counters.query.filter(Post_counters.post_id.in_(post_ids))
+    return {row.post_id: {counter: getattr(row, counter) for counter in COUNTERS} for row in rows}
+
+
+def sync_post_counters():
+    """
+    Add the counters of the posts missing from the Post_counters table (e.g., databases created
+    before the table was introduced, or written by an older server).
+    """
+    counted = db.session.query(Post_counters.post_id)
+    rows = {}
+
+    def row(post_id):
+        return rows.setdefault(post_id, {"post_id": post_id, **{counter: 0 for counter in COUNTERS}})
+
+    reactions = (
+        db.session.query(Reactions.post_id, Reactions.type, func.count(Reactions.id))
+        .filter(Reactions.post_id.notin_(counted))
+        .group_by(Reactions.post_id, Reactions.type)
+    )
+    for post_id, rtype, total in reactions:
+        row(post_id)["reactions"] += total
+        if rtype in REACTION_COUNTERS:
+            row(post_id)[REACTION_COUNTERS[rtype]] += total
+
+    for column, counter in ((Post.comment_to, "comments"), (Post.shared_from, "shares")):
+        totals = (
+            db.session.query(column, func.count(Post.id))
+            .filter(column.isnot(None), column != -1, column.notin_(counted))
+            .group_by(column)
+        )
+        for post_id, total in totals:
+            row(post_id)[counter] += total
+
+    if len(rows) == 0:
+        return
+    db.session.bulk_insert_mappings(Post_counters, list(rows.values()))
+    db.session.commit()
+
+
+def __increment(increments):
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    for increment in increments:
+        stmt = insert(Post_counters).values(
+            {"post_id": increment["post_id"], **{counter: increment.get(counter, 0) for counter in COUNTERS}}
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["post_id"],
+            set_={
+                counter: getattr(Post_counters, counter) + stmt.excluded[counter]
+                for counter in COUNTERS
+                if counter in increment
+            },
+        )
+        db.session.execute(stmt)
+
+
+@event.listens_for(db.session, "after_commit")
+def __publish(session):
+    reacted = session.info.pop("post_counters", {})
+    for post_id, total in reacted.items():
+        post_index.react(post_id, total)
+    if len(reacted) > 0:
+        feed_cache.invalidate(modes=POPULARITY_MODES)
+
+
+@event.listens_for(db.session, "after_rollback")
+def __discard(session):
+    session.info.pop("post_counters", None)
@@ -0,0 +1,261 @@
+import bisect
+import heapq
+import threading
+from y_server import app, db
+from y_server.modals import Post, Post_counters
+from y_server.utils import sampling
+
+
+class PostIndex(object):
+    """
+    In-memory index of the most recent posts.
+
+    Post ids are kept in ascending order in per-round buckets and in per-author lists,
+    covering the last `retention` rounds. Buckets falling out of the window are dropped
+    as the simulation clock advances, so the index behaves as a ring buffer over rounds.
+
+    The number of reactions (of any type) received by each indexed post mirrors the
+    Post_counters table: it is loaded from it and incremented when the transactions counting
+    new reactions are committed. The posts having reactions are kept ranked by popularity in
+    per-round lists, so that the most popular visible posts are found by merging them.
+    """
+
+    def __init__(self, retention=72):
+        self.retention = retention
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the index content: it will be reloaded from the database on the next use.
+        """
+        with self.lock:
+            self.loaded = False
+            self.horizon = None
+            self.rounds = {}
+            self.authors = {}
+            self.post_round = {}
+            self.post_author = {}
+            self.reactions = {}
+            self.ranking = {}
+
+    def load(self, current_round):
+        """
+        Load the posts of the last rounds from the database.
+
+        :param current_round: the current round id
+        """
+        with self.lock:
+            self.rounds, self.authors = {}, {}
+            self.post_round, self.post_author, self.reactions, self.ranking = {}, {}, {}, {}
+            self.horizon = current_round - self.retention
+
+            posts = (
+                db.session.query(Post.id, Post.user_id, Post.round)
+                .filter(Post.round >= self.horizon)
+                .order_by(Post.id)
+                .all()
+            )
+            for post_id, user_id, rnd in posts:
+                self.__insert(post_id, user_id, rnd)
+
+            reactions = (
+                db.session.query(Post_counters.post_id, Post_counters.reactions)
+                .join(Post, Post.id == Post_counters.post_id)
+                .filter(Post.round >= self.horizon, Post_counters.reactions > 0)
+                .all()
+            )
+            for post_id, total in reactions:
+                if post_id in self.post_round:
+                    self.reactions[post_id] = total
+                    self.ranking.setdefault(self.post_round[post_id], []).append((-total, -post_id))
+            for ranking in self.ranking.values():
+                ranking.sort()
+
+            self.loaded = True
+
+    def covers(self, visibility):
+        """
+        Check whether the index holds every post visible from the given round.
+
+        :param visibility: the first visible round
+        :return: True if the feed can be computed from memory
+        """
+        return self.loaded and visibility >= self.horizon
+
+    def add(self, post_id, user_id, rnd):
+        """
+        Index a new post.
+
+        :param post_id: the post id
+        :param user_id: the author id
+        :param rnd: the round of the post
+        """
+        with self.lock:
+            if not self.loaded or post_id in self.post_round or rnd < self.horizon:
+                return
+            self.__insert(post_id, user_id, rnd)
+
+    def react(self, post_id, count=1):
+        """
+        Count new reactions to an indexed post.
+
+        :param post_id: the post id
+        :param count: the number of new reactions
+        """
+        with self.lock:
+            if post_id not in self.post_round:
+                return
+            ranking = self.ranking.setdefault(self.post_round[post_id], [])
+            total = self.reactions.get(post_id, 0)
+            if total > 0:
+                self.__discard_key(ranking, (-total, -post_id))
+            self.reactions[post_id] = total + count
+            bisect.insort(ranking, (-(total + count), -post_id))
+
+    def remove(self, post_id):
+        """
+        Remove a deleted post from the index.
+
+        :param post_id: the post id
+        """
+        with self.lock:
+            if post_id not in self.post_round:
+                return
+            rnd = self.post_round.pop(post_id)
+            user_id = self.post_author.pop(post_id)
+            total = self.reactions.pop(post_id, 0)
+            if total > 0:
+                self.__discard(self.ranking, rnd, (-total, -post_id))
+            self.__discard(self.rounds, rnd, post_id)
+            self.__discard(self.authors, user_id, post_id)
+
+    def advance(self, current_round):
+        """
+        Move the visibility window forward, dropping the rounds that fell out of it.
+
+        :param current_round: the current round id
+        """
+        with self.lock:
+            if not self.loaded or current_round - self.retention <= self.horizon:
+                return
+            self.horizon = current_round - self.retention
+
+            for rnd in [r for r in self.rounds if r < self.horizon]:
+                self.ranking.pop(rnd, None)
+                for post_id in self.rounds.pop(rnd):
+                    del self.post_round[post_id]
+                    self.reactions.pop(post_id, None)
+                    user_id = self.post_author.pop(post_id)
+                    self.__discard(self.authors, user_id, post_id)
+
+    def latest(self, visibility, limit, authors=None, exclude=None):
+        """
+        Get the most recent visible posts in reverse chronological order.
+
+        :param visibility: the first visible round
+        :param limit: the maximum number of posts
+        :param authors: if given, only posts authored by these users
+        :param exclude: if given, posts of this user are skipped
+        :return: the list of post ids
+        """
+        with self.lock:
+            if authors is not None:
+                sources = [self.authors[a] for a in set(authors) if a in self.authors]
+            else:
+                sources = [ids for rnd, ids in self.rounds.items() if rnd >= visibility]
+
+            res = []
+            for post_id in heapq.merge(*[reversed(ids) for ids in sources], reverse=True):
+                if len(res) >= limit:
+                    break
+                if self.post_round[post_id] < visibility or self.post_author[post_id] == exclude:
+                    continue
+                res.append(post_id)
+            return res
+
+    def popular(self, visibility, limit, authors=None, exclude=None):
+        """
+        Get the visible posts having received the most reactions, most recent first on ties.
+        Posts without reactions are not returned.
+
+        :param visibility: the first visible round
+        :param limit: the maximum number of posts
+        :param authors: if given, only posts authored by these users
+        :param exclude: if given, posts of this user are skipped
+        :return: the list of post ids
+        """
+        with self.lock:
+            if authors is not None:
+                candidates = [
+                    post_id
+                    for author in set(authors)
+                    if author != exclude
+                    for post_id in self.authors.get(author, ())
+                    if post_id in self.reactions and self.post_round[post_id] >= visibility
+                ]
+                return heapq.nlargest(limit, candidates, key=lambda p: (self.reactions[p], p))
+
+            res = []
+            rankings = [ranking for rnd, ranking in self.ranking.items() if rnd >= visibility]
+            for _, post_id in heapq.merge(*rankings):
+                if len(res) >= limit:
+                    break
+                if self.post_author[-post_id] != exclude:
+                    res.append(-post_id)
+            return res
+
+    def visible(self, visibility):
+        """
+        Get the ids of the visible posts.
+
+        :param visibility: the first visible round
+        :return: the list of post ids
+        """
+        with self.lock:
+            return [post_id for rnd, ids in self.rounds.items() if rnd >= visibility for post_id in ids]
+
+    def sample(self, visibility, limit, exclude=None, candidates=None, rng=None):
+        """
+        Get a uniform random sample of the visible posts.
+
+        :param visibility: the first visible round
+        :param limit: the maximum number of posts
+        :param exclude: if given, posts of this user are skipped
+        :param candidates: the visible post ids, if already computed
+        :param rng: the random.Random generator to draw from, the shared one if None
+        :return: the list of post ids
+        """
+        with self.lock:
+            if candidates is None:
+                candidates = self.visible(visibility)
+            if exclude is None:
+                return sampling.sample(candidates, limit, rng=rng)
+            return sampling.sample(candidates, limit, exclude=lambda p: self.post_author.get(p) == exclude, rng=rng)
+
+    def __insert(self, post_id, user_id, rnd):
+        self.post_round[post_id] = rnd
+        self.post_author[post_id] = user_id
+        for bucket in (self.rounds.setdefault(rnd, []), self.authors.setdefault(user_id, [])):
+            if len(bucket) == 0 or bucket[-1] < post_id:
+                bucket.append(post_id)
+            else:
+                bisect.insort(bucket, post_id)
+
+    @staticmethod
+    def __discard(buckets, key, item):
+        bucket = buckets.get(key)
+        if bucket is None:
+            return
+        PostIndex.__discard_key(bucket, item)
+        if len(bucket) == 0:
+            del buckets[key]
+
+    @staticmethod
+    def __discard_key(bucket, item):
+        pos = bisect.bisect_left(bucket, item)
+        if pos < len(bucket) and bucket[pos] == item:
+            del bucket[pos]
+
+
+post_index = PostIndex(retention=app.config["post_index_rounds"])
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import case, func
+from y_server import app, db
+from y_server.modals import Follow, Interests, Post, Reactions
+from y_server.utils import opinion_engine
+from y_server.utils.clock import clock
+
+# job name -> function(round, **params)
+JOBS = {}
+
+
+def round_job(name):
+    """
+    Register a round-boundary job.
+
+    :param name: the job name, used in the round_jobs configuration
+    :return: the decorator
+    """
+    def register(function):
+        JOBS[name] = function
+        return function
+
+    return register
+
+
+class RoundPipeline(object):
+    """
+    Ordered pipeline of jobs fired when the simulation clock moves to a new round.
+
+    The pipelines run on a single background thread, so the jobs of consecutive rounds never
+    overlap. The status of the last `history` rounds is kept with the timing, the result and
+    the error (if any) of each job. Each server process runs the jobs of the rounds it
+    triggered; with several processes, their status is shared through a file next to the
+    simulation clock.
+    """
+
+    def __init__(self, history=100):
+        self.history = history
+        self.lock = threading.RLock()
+        self.executor = None
+        self.rounds = OrderedDict()
+
+    def configured_jobs(self):
+        """
+        Get the configured jobs, in order.
+
+        :return: the list of (name, params) pairs
+        """
+        jobs = []
+        for job in app.config.get("round_jobs", []):
+            if isinstance(job, str):
+                jobs.append((job, {}))
+            else:
+                params = dict(job)
+                jobs.append((params.pop("job"), params))
+        return jobs
+
+    def trigger(self, round_id):
+        """
+        Schedule the configured jobs for a new round.
+
+        :param round_id: the id of the new round
+        :return: the status of the round
+        """
+        jobs = self.configured_jobs()
+        with self.lock:
+            if len(jobs) == 0 or round_id in self.rounds:
+                return self.status(round_id)
+
+            self.rounds[round_id] = {
+                "round": round_id,
+                "state": "pending",
+                "jobs": [{"job": name, "status": "pending", "seconds": None} for name, _ in jobs],
+            }
+            while len(self.rounds) > self.history:
+                self.rounds.popitem(last=False)
+            self.__share()
+
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="round-jobs")
+            self.executor.submit(self.__run, round_id, jobs)
+            return self.status(round_id)
+
+    def status(self, round_id=None):
+        """
+        Get the status of the jobs of a round.
+
+        :param round_id: the round id, the last triggered round if None
+        :return: a dictionary with the round, its state (pending, running, done or failed) and the jobs, None if unknown
+        """
+        with self.lock:
+            rounds = self.rounds if app.config["workers"] == 1 else self.__shared()
+            if round_id is None and len(rounds) > 0:
+                round_id = next(reversed(rounds))
+            state = rounds.get(round_id)
+            if state is None:
+                return None
+            return {**state, "jobs": [dict(job) for job in state["jobs"]]}
+
+    def wait(self, timeout=None):
+        """
+        Wait until the scheduled pipelines have completed.
+
+        :param timeout: the maximum waiting time in seconds, None to wait indefinitely
+        :return: True if every pipeline has completed
+        """
+        with self.lock:
+            executor = self.executor
+        if executor is None:
+            return True
+        return executor.submit(lambda: None).exception(timeout) is None
+
+    def reset(self):
+        """
+        Forget the status of the past rounds.
+        """
+        with self.lock:
+            self.rounds = OrderedDict()
+
+    def __run(self, round_id, jobs):
+        with self.lock:
+            state = self.rounds.get(round_id)
+            if state is None:
+                return
+            state["state"] = "running"
+            self.__share()
+
+        failed = False
+        for (name, params), job in zip(jobs, state["jobs"]):
+            with self.lock:
+                job["status"] = "running"
+                self.__share()
+            start = time.perf_counter()
+            try:
+                with app.app_context():
+                    if name not in JOBS:
+                        raise KeyError(f"Round job {name} does not exist")
+                    result = JOBS[name](round_id, **params)
+                status, error = "done", None
+            except Exception as e:
+                result, status, error = None, "failed", repr(e)
+                failed = True
+            with self.lock:
+                job.update(status=status, seconds=round(time.perf_counter() - start, 4))
+                if result is not None:
+                    job["result"] = result
+                if error is not None:
+                    job["error"] = error
+                self.__share()
+
+        with self.lock:
+            state["state"] = "failed" if failed else "done"
+            self.__share()
+
+    def __shared(self):
+        # the status of the rounds triggered by all the server processes, in round order
+        path = clock.shared_file("jobs")
+        with clock.exclusive():
+            shared = {}
+            if os.path.exists(path):
+                with open(path) as f:
+                    shared = json.load(f)
+        if shared.get("epoch") != clock.epoch:
+            return OrderedDict()
+        return OrderedDict((state["round"], state) for state in shared["rounds"])
+
+    def __share(self):
+        # publish the status of the rounds of this process, the caller holds the lock
+        if app.config["workers"] == 1:
+            return
+        path = clock.shared_file("jobs")
+        with clock.exclusive():
+            rounds = OrderedDict()
+            if os.path.exists(path):
+                with open(path) as f:
+                    shared = json.load(f)
+                if shared["epoch"] == clock.epoch:
+                    rounds.update((state["round"], state) for state in shared["rounds"])
+            rounds.update(self.rounds)
+            states = [rounds[round_id] for round_id in sorted(rounds)][-self.history:]
+            with open(f"{path}.tmp", "w") as f:
+                json.dump({"epoch": clock.epoch, "rounds": states}, f)
+            os.replace(f"{path}.tmp", path)
+
+
+@round_job("opinions")
+def update_opinions(round_id, method="friedkin_johnsen", interests=None):
+    """
+    Update the opinions of all the users (see opinion_engine.update_opinions).
+
+    :param round_id: the new round
+    :param method: the opinion update method
+    :param interests: the topic names, all the topics if None
+    :return: the number of new opinions
+    """
+    topics = Interests.query
+    if interests is not None:
+        topics = topics.filter(Interests.interest.in_(interests))
+    updated = opinion_engine.update_opinions(topics.all(), method, round_id)
+    db.session.commit()
+    return {"updated": updated}
+
+
+@round_job("rollup")
+def rollup(round_id):
+    """
+    Count the activity of the round just ended.
+
+    :param round_id: the new round
+    :return: the number of posts, comments, shares, reactions and follow actions of the previous round
+    """
+    previous = round_id - 1
+    posts = (
+        db.session.query(
+            func.count(Post.id),
+            func.count(case((func.coalesce(Post.comment_to, -1) != -1, 1))),
+            func.count(case((func.coalesce(Post.shared_from, -1) != -1, 1))),
+        )
+        .filter(Post.round == previous)
+        .one()
+    )
+    return {
+        "round": previous,
+        "posts": posts[0] or 0,
+        "comments": int(posts[1] or 0),
+        "shares": int(posts[2] or 0),
+        "reactions": Reactions.query.filter(Reactions.round == previous).count(),
+        "follows": Follow.query.filter(Follow.round == previous).count(),
+    }
+
+
+round_pipeline = RoundPipeline()
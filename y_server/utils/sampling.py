@@ -0,0 +1,114 @@
+import random
+import threading
+from y_server import app
+
+# the shared generator, seeded with the experiment seed on first use
+__rng = None
+__lock = threading.RLock()
+
+
+def generator():
+    """
+    Get the shared random generator of the server.
+
+    :return: the random.Random object
+    """
+    global __rng
+    with __lock:
+        if __rng is None:
+            __rng = random.Random(app.config["seed"])
+        return __rng
+
+
+def reset(seed=None):
+    """
+    Seed the shared random generator again.
+
+    :param seed: the new seed, the experiment seed if None
+    """
+    global __rng
+    with __lock:
+        __rng = random.Random(app.config["seed"] if seed is None else seed)
+
+
+def sample(candidates, k, exclude=None, rng=None):
+    """
+    Draw k distinct items uniformly from an in-memory array.
+
+    Excluded items are rejected and replaced by new draws; after 2k draws the remaining
+    candidates are filtered and sampled in one pass (e.g., when most of them are excluded).
+
+    :param candidates: the list of candidates
+    :param k: the number of items
+    :param exclude: a predicate on the items to skip, None to accept all the candidates
+    :param rng: the random.Random generator, the shared one if None
+    :return: the list of items, in draw order
+    """
+    rng = rng or generator()
+    if exclude is None:
+        with __lock:
+            return rng.sample(candidates, min(k, len(candidates)))
+
+    res, tried = [], set()
+    with __lock:
+        while len(res) < k and len(tried) < len(candidates) and len(tried) < 2 * k:
+            pos = rng.randrange(len(candidates))
+            if pos in tried:
+                continue
+            tried.add(pos)
+            if not exclude(candidates[pos]):
+                res.append(candidates[pos])
+        if len(res) < k and len(tried) < len(candidates):
+            rest = [c for pos, c in enumerate(candidates) if pos not in tried and not exclude(c)]
+            res += rng.sample(rest, min(k - len(res), len(rest)))
+    return res
+
+
+def sample_rows(query, column, k, low, high, rng=None, attempts=4):
+    """
+    Draw k rows uniformly from a query, by rejection sampling over an integer key range.
+
+    Random keys in [low, high] are drawn in batches and kept if they match a row of the query
+    (the query filters act as the rejection test), so that the cost depends on k and on the
+    share of matching keys rather than on the table size. When few keys match, the matching
+    keys are loaded and sampled in memory.
+
+    :param query: the query selecting the candidate rows
+    :param column: the integer key column (e.g., Post.id)
+    :param k: the number of rows
+    :param low: the smallest key, None if the query is empty
+    :param high: the largest key, None if the query is empty
+    :param rng: the random.Random generator, the shared one if None
+    :param attempts: the number of batches drawn before falling back to the in-memory sampling
+    :return: the list of rows, in draw order
+    """
+    if low is None or high is None or k <= 0:
+        return []
+
+    rng = rng or generator()
+    size = high - low + 1
+    found, drawn = {}, set()
+    batch = 2 * k
+    for _ in range(attempts):
+        with __lock:
+            keys = [key for key in rng.sample(range(low, high + 1), min(batch, size)) if key not in drawn]
+        drawn.update(keys)
+        for row in query.filter(column.in_(keys)):
+            found[getattr(row, column.key)] = row
+        if len(found) >= k or len(drawn) >= size:
+            break
+        # grow the batch with the observed acceptance rate
+        rate = max(len(found), 1) / len(drawn)
+        batch = min(int((k - len(found)) / rate * 1.5) + 1, 10 * batch)
+
+    if len(found) < k and len(drawn) < size:
+        keys = [key for key, in query.with_entities(column) if key not in drawn]
+        with __lock:
+            keys = rng.sample(keys, min(k - len(found), len(keys)))
+        for row in query.filter(column.in_(keys)):
+            found[getattr(row, column.key)] = row
+
+    rows = list(found.values())
+    with __lock:
+        rng.shuffle(rows)
+    return rows[:k]
@@ -0,0 +1,199 @@
+"""
+Lifecycle of the in-memory state of a server process.
+
+Each server process (one per worker in the multi-worker mode of y_server_run.py) keeps its
+own caches of the database: they are kept current by the writes of the process itself, and
+invalidated through the shared simulation clock for the writes of the other processes:
+
+- a /reset or a restart moves the clock to a new epoch: every process drops all its caches
+  (reset_caches) on its next request;
+- with several workers, the caches of the data written on every agent action (the indexes of
+  the recent posts, hashtags and mentions, the threads and the precomputed feeds) are disabled
+  and read from the database (serve_workers);
+- the writes to the follows and the users are published on the clock: the other processes
+  drop their follow graph and user cache (refresh_shared_caches) on their next request, and
+  all the other caches when they see a new round (refresh_caches). The vocabularies resolve
+  the names added by the others from the database;
+- the mentions are marked answered with a conditional update, so that a mention is never
+  served twice; the round job status is shared through a file next to the clock;
+- the drain requests (drain_all) are published on the clock: a thread of every worker drains
+  its queues and acknowledges the request in a file next to the clock.
+"""
+import json
+import os
+import threading
+import time
+from y_server import app
+from y_server.utils import sampling, storage, vocabulary
+from y_server.utils.clock import clock
+from y_server.utils.feed_cache import feed_cache
+from y_server.utils.follow_graph import follow_graph
+from y_server.utils.hashtag_index import hashtag_index
+from y_server.utils.localizer import localizer
+from y_server.utils.mention_queue import mention_queue
+from y_server.utils.post_index import post_index
+from y_server.utils.round_jobs import round_pipeline
+from y_server.utils.thread_store import thread_store
+from y_server.utils.toxicity_worker import toxicity_worker
+from y_server.utils.user_cache import user_cache
+
+
+# seconds between two checks of the drain requests
+DRAIN_POLL = 0.05
+
+
+def drain(timeout=None):
+    """
+    Wait for the background work of the process: toxicity scores, translations, round jobs and
+    deferred writes.
+
+    :param timeout: the maximum waiting time in seconds for each queue, None to wait indefinitely
+    :return: True if every queue has been drained
+    """
+    drained = toxicity_worker.drain(timeout)
+    drained = localizer.drain(timeout) and drained
+    drained = round_pipeline.wait(timeout) and drained
+    return storage.write_queue.drain(timeout) and drained
+
+
+def drain_all(timeout=None):
+    """
+    Wait for the background work of every server process (see drain).
+
+    :param timeout: the maximum waiting time in seconds, None to wait indefinitely
+    :return: True if every process has drained its queues
+    """
+    if app.config["workers"] == 1:
+        return drain(timeout)
+
+    request = clock.request_drain()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        workers = {
+            pid: ack for pid, ack in __acknowledgements().items() if __alive(int(pid))
+        }
+        if all(ack["request"] >= request for ack in workers.values()):
+            return all(ack["drained"] for ack in workers.values())
+        if deadline is not None and time.monotonic() > deadline:
+            return False
+        time.sleep(DRAIN_POLL)
+
+
+def start_worker():
+    """
+    Register a worker process: its drain thread completes the background work of the process
+    when drain_all is called by any worker.
+    """
+    __acknowledge(clock.drain_requests(), True)
+    threading.Thread(target=__watch_drains, name="drain-requests", daemon=True).start()
+
+
+def stop_worker():
+    """
+    Unregister a worker process.
+    """
+    with clock.exclusive():
+        acks = __read_acknowledgements()
+        acks.pop(str(os.getpid()), None)
+        __write_acknowledgements(acks)
+
+
+def serve_workers(workers):
+    """
+    Configure the process for the given number of server processes sharing the database.
+
+    :param workers: the number of server processes
+    """
+    app.config["workers"] = workers
+    if workers > 1:
+        # the writes of the other processes would not reach these caches
+        app.config["post_index"] = False
+        thread_store.max_threads = 0
+
+
+def refresh_shared_caches():
+    """
+    Drop the caches of the follows and the users: they are reloaded on their next use.
+    """
+    follow_graph.reset()
+    user_cache.reset()
+
+
+def refresh_caches():
+    """
+    Drop the caches of the data written by the agents: they are reloaded on their next use.
+    """
+    post_index.reset()
+    hashtag_index.reset()
+    mention_queue.reset()
+    follow_graph.reset()
+    user_cache.reset()
+    thread_store.reset()
+    vocabulary.reset()
+
+
+def reset_caches():
+    """
+    Drop all the in-memory state derived from the experiment database.
+    """
+    refresh_caches()
+    round_pipeline.reset()
+    feed_cache.reset()
+    sampling.reset()
+
+
+@app.before_request
+def __sync():
+    if app.config["workers"] > 1:
+        clock.sync()
+
+
+clock.subscribe(reset_caches)
+clock.subscribe(refresh_caches, every_round=True)
+clock.subscribe(refresh_shared_caches, every_write=True)
+
+
+def __watch_drains():
+    acknowledged = clock.drain_requests()
+    while True:
+        time.sleep(DRAIN_POLL)
+        request = clock.drain_requests()
+        if request > acknowledged:
+            __acknowledge(request, drain())
+            acknowledged = request
+
+
+def __acknowledge(request, drained):
+    with clock.exclusive():
+        acks = __read_acknowledgements()
+        acks[str(os.getpid())] = {"request": request, "drained": drained}
+        __write_acknowledgements(acks)
+
+
+def __acknowledgements():
+    with clock.exclusive():
+        return __read_acknowledgements()
+
+
+def __read_acknowledgements():
+    # worker pid -> last drain request completed, the caller holds the clock lock
+    path = clock.shared_file("drains")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def __write_acknowledgements(acks):
+    path = clock.shared_file("drains")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(acks, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def __alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
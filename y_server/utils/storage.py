@@ -0,0 +1,252 @@
+import os
+import sqlite3
+import threading
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import Pool
+from y_server import app, db
+from y_server.utils import migrations
+from y_server.utils.batch_worker import BatchWorker
+
+# the clean database, holding the rows every experiment starts with (e.g., the emotions)
+TEMPLATE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data_schema",
+    "database_clean_server.db",
+)
+
+# pragmas of the storage profile, in the order they are applied to each connection
+PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store", "busy_timeout")
+
+# the statements that do not write to the database
+READ_STATEMENTS = ("SELECT", "PRAGMA", "BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK")
+
+
+def profile():
+    """
+    Get the SQLite storage profile of the server.
+
+    :return: a dictionary with the configured pragmas (None if unset) and the single_writer flag
+    """
+    return app.config["sqlite"]
+
+
+def engine_options():
+    """
+    Get the engine options of the configured database: a pool of connections kept open and
+    checked before use for the database servers, the defaults for SQLite.
+
+    :return: the dictionary of engine options
+    """
+    if app.config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": 20,
+        "max_overflow": 20,
+        "pool_timeout": 30,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        **app.config["pool"],
+    }
+
+
+def bootstrap(reset=False):
+    """
+    Create the schema of the experiment database: the tables missing from the database, with
+    the rows of the clean template, and the indexes of the migrations.
+
+    SQLite experiments start from a copy of the template, so only the tables added after it
+    are created; on the other backends (e.g., PostgreSQL) the whole schema is built here.
+
+    :param reset: drop every table first
+    """
+    if reset:
+        db.drop_all()
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS schema_version"))
+
+    existing = set(inspect(db.engine).get_table_names())
+    db.create_all()
+    migrations.migrate(db.engine)
+
+    created = [table for table in db.metadata.sorted_tables if table.name not in existing]
+    if len(created) == 0 or not os.path.exists(TEMPLATE):
+        return
+
+    with db.engine.begin() as conn:
+        copy_template(conn, created)
+
+
+def copy_template(conn, tables):
+    """
+    Copy the rows of the clean template into newly created tables.
+
+    :param conn: the SQLAlchemy connection of the experiment database
+    :param tables: the list of created tables
+    """
+    template = sqlite3.connect(TEMPLATE)
+    try:
+        template_tables = {name for name, in template.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        for table in tables:
+            if table.name not in template_tables:
+                continue
+            cursor = template.execute(f"SELECT * FROM {table.name}")
+            columns = [column[0] for column in cursor.description]
+            rows = [
+                {column: value for column, value in zip(columns, row) if column in table.columns}
+                for row in cursor
+            ]
+            if len(rows) == 0:
+                continue
+            conn.execute(table.insert(), rows)
+            if conn.dialect.name == "postgresql" and "id" in table.columns:
+                # the template rows keep their ids, move the sequence past them
+                conn.execute(
+                    text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), max(id)) FROM {table.name}")
+                )
+    finally:
+        template.close()
+
+
+def checkpoint():
+    """
+    Move the content of the write-ahead log into the database file (e.g., before copying it).
+    """
+    if db.engine.dialect.name == "sqlite":
+        with db.engine.connect() as conn:
+            conn.execute(text("PRAGMA wal_checkpoint(TRUNCATE)"))
+
+
+class WriterGate(object):
+    """
+    Process-wide lock letting a single connection at a time hold a write transaction.
+
+    With single_writer enabled, a connection takes the gate before its first write statement
+    and releases it when its transaction ends, so that the request threads queue up in the
+    server instead of failing with "database is locked"; in WAL mode the readers never wait.
+    Waiting longer than the busy timeout raises the same error SQLite would.
+
+    The gate only covers the threads of one server process: the writers of different
+    processes (e.g., gunicorn workers) wait for each other on the SQLite lock, up to the
+    busy_timeout of the profile.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+    def acquire(self, info):
+        """
+        Take the gate for a connection, if not already held.
+
+        :param info: the info dictionary of the connection
+        """
+        if info.get("writer", False):
+            return
+        timeout = (profile()["busy_timeout"] or 5000) / 1000
+        if not self.lock.acquire(timeout=timeout):
+            raise sqlite3.OperationalError("database is locked")
+        info["writer"] = True
+
+    def release(self, info):
+        """
+        Release the gate held by a connection, if any.
+
+        :param info: the info dictionary of the connection
+        """
+        if info.pop("writer", False):
+            self.lock.release()
+
+
+class WriteQueue(BatchWorker):
+    """
+    Background writer group-committing deferred inserts: the rows of a batch are inserted in a
+    single transaction. Only the recommendations logged by the feed requests are deferred, the
+    other writes are committed by their request.
+    """
+
+    name = "write-queue"
+
+    def submit(self, model, row):
+        """
+        Enqueue a row to insert.
+
+        :param model: the model class
+        :param row: the dictionary of column values
+        """
+        super().submit((model, row))
+
+    def process(self, batch):
+        """
+        Insert a batch of rows, committing once.
+
+        :param batch: the list of (model, row) pairs
+        :return: the number of inserted rows
+        """
+        models = {}
+        for model, row in batch:
+            models.setdefault(model, []).append(row)
+
+        with app.app_context():
+            for model, rows in models.items():
+                db.session.bulk_insert_mappings(model, rows)
+            db.session.commit()
+        return len(batch)
+
+
+def insert(model, rows):
+    """
+    Insert rows written on the read paths: through the write queue with single_writer
+    enabled, in the current transaction otherwise (the caller commits).
+
+    :param model: the model class
+    :param rows: the list of dictionaries of column values
+    """
+    if profile()["single_writer"]:
+        for row in rows:
+            write_queue.submit(model, row)
+    else:
+        db.session.bulk_insert_mappings(model, rows)
+
+
+@compiles(db.String, "postgresql")
+def __unbounded_string(type_, compiler, **kw):
+    # SQLite never enforced the declared lengths, the stored texts may exceed them
+    return "VARCHAR"
+
+
+@event.listens_for(Engine, "connect")
+def __configure(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    settings = profile()
+    cursor = dbapi_connection.cursor()
+    for pragma in PRAGMAS:
+        if settings[pragma] is not None:
+            cursor.execute(f"PRAGMA {pragma}={settings[pragma]}")
+    cursor.close()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def __before_write(conn, cursor, statement, parameters, context, executemany):
+    if conn.dialect.name != "sqlite" or not profile()["single_writer"]:
+        return
+    if not statement.lstrip().upper().startswith(READ_STATEMENTS):
+        writer_gate.acquire(conn.connection.info)
+
+
+@event.listens_for(Engine, "commit")
+@event.listens_for(Engine, "rollback")
+def __end_transaction(conn):
+    if conn.dialect.name == "sqlite":
+        writer_gate.release(conn.connection.info)
+
+
+@event.listens_for(Pool, "checkin")
+def __checkin(dbapi_connection, connection_record):
+    # transactions closed without an explicit commit or rollback
+    writer_gate.release(connection_record.info)
+
+
+writer_gate = WriterGate()
+write_queue = WriteQueue(batch_size=256, interval=0.2)
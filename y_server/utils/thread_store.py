@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+from y_server import db
+from y_server.modals import Post, User_mgmt
+
+
+class ThreadStore(object):
+    """
+    Cache of the rendered comment threads, keyed by thread id.
+
+    Each thread holds its posts in chronological order with their parent and depth, the
+    rendered lines ("@username - text") and the id of the latest post of each author.
+    Threads are built with a single join on a miss, extended when a post is appended and
+    evicted in least recently used order.
+    """
+
+    def __init__(self, max_threads=10000):
+        self.max_threads = max_threads
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the cached threads.
+        """
+        with self.lock:
+            self.threads = OrderedDict()
+
+    def get(self, thread_id):
+        """
+        Get a thread.
+
+        :param thread_id: the thread id
+        :return: a dictionary with the posts (id, user_id, username, tweet, parent, depth), the lines and the latest_post map
+        """
+        with self.lock:
+            thread = self.threads.get(thread_id)
+            if thread is not None:
+                self.threads.move_to_end(thread_id)
+                return self.__snapshot(thread)
+
+            # built under the lock, so that no post appended meanwhile is lost
+            posts = (
+                db.session.query(Post.id, Post.user_id, User_mgmt.username, Post.tweet, Post.comment_to)
+                .join(User_mgmt, User_mgmt.id == Post.user_id)
+                .filter(Post.thread_id == thread_id)
+                .order_by(Post.id)
+                .all()
+            )
+
+            thread = {"posts": [], "lines": [], "latest_post": {}, "depth": {}}
+            for post_id, user_id, username, tweet, comment_to in posts:
+                self.__append(thread, post_id, user_id, username, tweet, comment_to)
+            self.threads[thread_id] = thread
+            while len(self.threads) > self.max_threads:
+                self.threads.popitem(last=False)
+            return self.__snapshot(thread)
+
+    def append(self, post, username):
+        """
+        Add a new post to its thread, if cached.
+
+        :param post: the Post object
+        :param username: the username of the author
+        """
+        with self.lock:
+            thread = self.threads.get(post.thread_id)
+            if thread is not None and post.id not in thread["depth"]:
+                self.__append(thread, post.id, post.user_id, username, post.tweet, post.comment_to)
+
+    @staticmethod
+    def __snapshot(thread):
+        return {
+            "posts": list(thread["posts"]),
+            "lines": list(thread["lines"]),
+            "latest_post": dict(thread["latest_post"]),
+        }
+
+    @staticmethod
+    def __append(thread, post_id, user_id, username, tweet, comment_to):
+        parent = comment_to if comment_to in thread["depth"] else None
+        depth = thread["depth"][parent] + 1 if parent is not None else 0
+        thread["depth"][post_id] = depth
+        thread["posts"].append(
+            {
+                "id": post_id,
+                "user_id": user_id,
+                "username": username,
+                "tweet": tweet,
+                "parent": parent,
+                "depth": depth,
+            }
+        )
+        thread["lines"].append(f"@{username} - {tweet}\n")
+        if post_id > thread["latest_post"].get(username, -1):
+            thread["latest_post"][username] = post_id
+
+
+thread_store = ThreadStore()
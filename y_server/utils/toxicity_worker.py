@@ -0,0 +1,161 @@
+import hashlib
+from collections import OrderedDict
+from perspective import PerspectiveAPI
+from y_server import app, db
+from y_server.modals import Post_Toxicity
+from y_server.utils.batch_worker import BatchWorker
+
+ATTRIBUTES = (
+    "toxicity",
+    "severe_toxicity",
+    "identity_attack",
+    "insult",
+    "profanity",
+    "threat",
+    "sexually_explicit",
+    "flirtation",
+)
+
+
+class PerspectiveScorer(object):
+    """
+    Toxicity scorer backed by the Perspective API.
+    """
+
+    def __init__(self, api_key):
+        self.api = PerspectiveAPI(api_key)
+
+    def score(self, texts):
+        """
+        Score a list of texts.
+
+        :param texts: the list of texts
+        :return: the list of dictionaries attribute -> score, in the same order
+        """
+        tests = [attribute.upper() for attribute in ATTRIBUTES]
+        res = []
+        for text in texts:
+            scores = self.api.score(text, tests=tests)
+            res.append({attribute: scores[attribute.upper()] for attribute in ATTRIBUTES})
+        return res
+
+
+class LocalScorer(object):
+    """
+    Local stand-in for the Perspective API (e.g., for tests and offline runs):
+    every attribute is the fraction of words of the text found in a small word list.
+    """
+
+    WORDS = {"idiot", "stupid", "hate", "moron", "dumb", "kill", "loser", "shut", "trash", "disgusting"}
+
+    def score(self, texts):
+        """
+        Score a list of texts.
+
+        :param texts: the list of texts
+        :return: the list of dictionaries attribute -> score, in the same order
+        """
+        res = []
+        for text in texts:
+            words = [w.strip(".,;:!?\"'()#@").lower() for w in text.split()]
+            value = sum(1 for w in words if w in self.WORDS) / max(len(words), 1)
+            res.append({attribute: value for attribute in ATTRIBUTES})
+        return res
+
+
+class ToxicityWorker(BatchWorker):
+    """
+    Background worker scoring the toxicity of the new posts.
+
+    The request handlers only enqueue the post ids and texts: the worker scores them in
+    batches (memoized by text hash) and writes the Post_Toxicity rows.
+    """
+
+    name = "toxicity-worker"
+
+    def __init__(self, batch_size=32, interval=0.5, cache_size=10000):
+        super().__init__(batch_size, interval)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.scorer = None
+        self.configured = False
+        self.cache_hits = 0
+
+    def set_scorer(self, scorer):
+        """
+        Set the toxicity scorer.
+
+        :param scorer: an object with a score(texts) method, None to disable the scoring
+        """
+        with self.condition:
+            self.scorer = scorer
+            self.configured = True
+
+    def submit(self, post_id, text):
+        """
+        Enqueue a post to be scored.
+
+        :param post_id: the post id
+        :param text: the post text
+        """
+        with self.condition:
+            if not self.configured:
+                self.set_scorer(self.__default_scorer())
+            if self.scorer is None:
+                return
+            super().submit((post_id, text))
+
+    def metrics(self):
+        """
+        Get the worker metrics.
+
+        :return: a dictionary with the queue depth, the posts being scored, the scored and failed posts and the cache hits
+        """
+        with self.condition:
+            return {**super().metrics(), "cache_hits": self.cache_hits}
+
+    def process(self, batch):
+        """
+        Score a batch of posts and store their toxicity.
+
+        :param batch: the list of (post id, text) pairs
+        :return: the number of scored posts
+        """
+        rows = self.__score(self.scorer, batch)
+        with app.app_context():
+            db.session.bulk_insert_mappings(Post_Toxicity, rows)
+            db.session.commit()
+        return len(rows)
+
+    @staticmethod
+    def __default_scorer():
+        if app.config.get("toxicity_scorer") == "local":
+            return LocalScorer()
+        if app.config.get("perspective_api") is not None:
+            return PerspectiveScorer(app.config["perspective_api"])
+        return None
+
+    def __score(self, scorer, batch):
+        keys = [hashlib.sha1(text.encode("utf-8")).digest() for _, text in batch]
+
+        with self.condition:
+            scores = {}
+            for key in keys:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+                    scores[key] = self.cache[key]
+                    self.cache_hits += 1
+
+        missing = {key: text for key, (_, text) in zip(keys, batch) if key not in scores}
+        if len(missing) > 0:
+            computed = dict(zip(missing, scorer.score(list(missing.values()))))
+            scores.update(computed)
+            with self.condition:
+                self.cache.update(computed)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        return [{"post_id": post_id, **scores[key]} for key, (post_id, _) in zip(keys, batch)]
+
+
+toxicity_worker = ToxicityWorker()
@@ -0,0 +1,165 @@
+import threading
+from y_server import db
+from y_server.modals import User_mgmt
+
+ATTRIBUTES = (
+    "username",
+    "leaning",
+    "is_page",
+    "language",
+    "recsys_type",
+    "frecsys_type",
+    "left_on",
+    "susceptibility",
+)
+
+
+class UserCache(object):
+    """
+    In-memory copy of the user attributes that rarely change during a simulation.
+
+    Each attribute is stored as a column (a list indexed by user id), so that the attributes
+    of many users can be read at once without querying User_mgmt.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the cache content: it will be reloaded from the database on the next use.
+        """
+        with self.lock:
+            self.loaded = False
+            self.columns = {attribute: [] for attribute in ATTRIBUTES}
+            self.usernames = {}
+            self.pages = None
+
+    def load(self):
+        """
+        Load the attributes of all the users from the database.
+        """
+        with self.lock:
+            self.columns = {attribute: [] for attribute in ATTRIBUTES}
+            self.usernames = {}
+            self.pages = None
+
+            users = db.session.query(User_mgmt.id, *[getattr(User_mgmt, a) for a in ATTRIBUTES])
+            for user_id, *values in users:
+                self.__set(user_id, dict(zip(ATTRIBUTES, values)))
+
+            self.loaded = True
+
+    def add(self, user):
+        """
+        Cache the attributes of a new user.
+
+        :param user: the User_mgmt object
+        """
+        self.update(user.id, **{attribute: getattr(user, attribute) for attribute in ATTRIBUTES})
+
+    def update(self, user_id, **values):
+        """
+        Update the cached attributes of a user.
+
+        :param user_id: the user id
+        :param values: the new attribute values
+        """
+        with self.lock:
+            if self.loaded:
+                self.__set(user_id, values)
+
+    def get(self, attribute, user_id):
+        """
+        Get an attribute of a user.
+
+        :param attribute: the attribute name
+        :param user_id: the user id
+        :return: the attribute value, None for unknown users
+        """
+        return self.bulk(attribute, [user_id])[0]
+
+    def bulk(self, attribute, user_ids):
+        """
+        Get an attribute of many users.
+
+        :param attribute: the attribute name
+        :param user_ids: the list of user ids
+        :return: the list of attribute values, in the same order (None for unknown users)
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            column = self.columns[attribute]
+            return [column[u] if 0 <= u < len(column) else None for u in user_ids]
+
+    def user_id(self, username):
+        """
+        Resolve a username.
+
+        :param username: the username
+        :return: the user id, None if no user has the given username
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return self.usernames.get(username)
+
+    def user_ids(self):
+        """
+        Get the ids of all the users.
+
+        :return: the list of user ids, in ascending order
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return [user_id for user_id, username in enumerate(self.columns["username"]) if username is not None]
+
+    def active_users(self):
+        """
+        Get the users still taking part in the simulation (not churned, pages excluded).
+
+        :return: the list of user ids
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            return [
+                user_id
+                for user_id, (username, left_on, is_page) in enumerate(
+                    zip(self.columns["username"], self.columns["left_on"], self.columns["is_page"])
+                )
+                if username is not None and left_on is None and is_page != 1
+            ]
+
+    def news_pages(self, leaning):
+        """
+        Get the news pages having a given leaning.
+
+        :param leaning: the political leaning
+        :return: the list of page ids
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            if self.pages is None:
+                self.pages = {}
+                for user_id, is_page in enumerate(self.columns["is_page"]):
+                    if is_page == 1:
+                        self.pages.setdefault(self.columns["leaning"][user_id], []).append(user_id)
+            return list(self.pages.get(leaning, []))
+
+    def __ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def __set(self, user_id, values):
+        for column in self.columns.values():
+            if len(column) <= user_id:
+                column.extend([None] * (user_id + 1 - len(column)))
+        for attribute, value in values.items():
+            self.columns[attribute][user_id] = value
+        if "username" in values:
+            self.usernames[values["username"]] = user_id
+        if "is_page" in values or "leaning" in values:
+            self.pages = None
+
+
+user_cache = UserCache()
@@ -0,0 +1,186 @@
+import threading
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from y_server import db
+from y_server.modals import Emotions, Hashtags, Interests
+
+
+class Vocabulary(object):
+    """
+    Interning table of the names stored in a lookup table (e.g., hashtags).
+
+    The name -> id dictionary is preloaded, so that known names are resolved without
+    querying the database. Missing names are created with an atomic insert-or-ignore on
+    the unique index of the name column, so that concurrent writers (threads or server
+    processes) agree on a single id per name. Names created in a transaction are published
+    to the dictionary only once the transaction is committed.
+    """
+
+    def __init__(self, model, column, key):
+        self.model = model
+        self.column = column
+        self.key = key
+        self.index = f"{model.__tablename__}_{column.key}"
+        self.unique = False
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the vocabulary content: it will be reloaded from the database on the next use.
+        """
+        with self.lock:
+            self.loaded = False
+            self.ids = {}
+            self.names = {}
+
+    def load(self):
+        """
+        Load all the names from the database.
+        """
+        with self.lock:
+            self.ids, self.names = {}, {}
+            # the oldest entry wins on duplicated names
+            for name, key in db.session.query(self.column, self.key).order_by(self.key.desc()):
+                self.ids[name] = key
+                self.names[key] = name
+            self.loaded = True
+
+    def ensure_unique(self):
+        """
+        Create the unique index on the name column, if missing.
+        Databases already holding duplicated names keep working without it.
+        """
+        table = self.model.__tablename__
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(
+                    text(f"CREATE UNIQUE INDEX IF NOT EXISTS {self.index} ON {table} ({self.column.key})")
+                )
+            self.unique = True
+        except (IntegrityError, OperationalError):
+            self.unique = False
+
+    def id(self, name):
+        """
+        Resolve a name, without creating it.
+
+        :param name: the name
+        :return: the id, None if the name is unknown
+        """
+        return self.lookup([name], create=False)[0]
+
+    def lookup(self, names, create=True):
+        """
+        Resolve a list of names.
+
+        :param names: the list of names
+        :param create: whether to add the missing names in the current transaction
+        :return: the list of ids, in the same order (None for unknown names if create is False)
+        """
+        names = list(names)
+        with self.lock:
+            self.__ensure_loaded()
+            pending = db.session.info.setdefault("vocabulary", {}).setdefault(self.index, {})
+            known = {name: self.ids.get(name, pending.get(name)) for name in names}
+            missing = [name for name, key in known.items() if key is None]
+
+            if len(missing) > 0 and create:
+                created = self.__insert(missing)
+                pending.update(created)
+                known.update(created)
+            elif len(missing) > 0:
+                # names added by another process
+                found = self.__select(missing)
+                self.publish(found)
+                known.update(found)
+
+        return [known[name] for name in names]
+
+    def name(self, key):
+        """
+        Get the name of an id.
+
+        :param key: the id
+        :return: the name, None if the id is unknown
+        """
+        with self.lock:
+            self.__ensure_loaded()
+            if key not in self.names:
+                # name added by another process
+                self.publish(dict(db.session.query(self.column, self.key).filter(self.key == key)))
+            return self.names.get(key)
+
+    def publish(self, created):
+        """
+        Add the names created by a committed transaction.
+
+        :param created: a dictionary name -> id
+        """
+        with self.lock:
+            if not self.loaded:
+                return
+            for name, key in created.items():
+                self.ids.setdefault(name, key)
+                self.names[key] = name
+
+    def __ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def __insert(self, names):
+        rows = [{self.column.key: name} for name in names]
+        if self.unique:
+            if db.engine.dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            stmt = insert(self.model).values(rows).on_conflict_do_nothing(index_elements=[self.column.key])
+            db.session.execute(stmt)
+        else:
+            db.session.bulk_insert_mappings(self.model, rows)
+
+        return self.__select(names)
+
+    def __select(self, names):
+        return dict(
+            db.session.query(self.column, self.key)
+            .filter(self.column.in_(names))
+            .order_by(self.key.desc())
+        )
+
+
+hashtags = Vocabulary(Hashtags, Hashtags.hashtag, Hashtags.id)
+emotions = Vocabulary(Emotions, Emotions.emotion, Emotions.id)
+interests = Vocabulary(Interests, Interests.interest, Interests.iid)
+
+VOCABULARIES = (hashtags, emotions, interests)
+
+
+def setup():
+    """
+    Create the unique indexes of the vocabularies and preload them.
+    """
+    for vocabulary in VOCABULARIES:
+        vocabulary.ensure_unique()
+        vocabulary.load()
+
+
+def reset():
+    """
+    Drop the content of all the vocabularies.
+    """
+    for vocabulary in VOCABULARIES:
+        vocabulary.reset()
+
+
+@event.listens_for(db.session, "after_commit")
+def __publish(session):
+    created = session.info.pop("vocabulary", {})
+    for vocabulary in VOCABULARIES:
+        vocabulary.publish(created.get(vocabulary.index, {}))
+
+
+@event.listens_for(db.session, "after_rollback")
+def __discard(session):
+    session.info.pop("vocabulary", None)
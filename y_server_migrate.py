@@ -0,0 +1,47 @@
+import importlib.util
+import json
+import os
+from sqlalchemy import create_engine
+
+
+def load_migrations():
+    """
+    Load the migrations module without importing the y_server package, whose import configures
+    (and possibly resets) the experiment database.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "y_server", "utils", "migrations.py")
+    spec = importlib.util.spec_from_file_location("y_server_migrations", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Create the indexes of the experiment databases, in place")
+
+    parser.add_argument(
+        "databases",
+        nargs="*",
+        default=[f"data_schema{os.sep}database_clean_server.db"],
+        help="the SQLite database files (or SQLAlchemy URIs) to migrate, the clean template by default",
+    )
+    parser.add_argument("--to", type=int, default=None, help="the schema version to reach, the latest by default")
+    parser.add_argument(
+        "--check", action="store_true", help="only report the hot queries still scanning a whole table"
+    )
+    args = parser.parse_args()
+
+    migrations = load_migrations()
+    for database in args.databases:
+        uri = database if "://" in database else f"sqlite:///{os.path.abspath(database)}"
+        if uri.startswith("sqlite:///") and not os.path.exists(uri[len("sqlite:///"):]):
+            print(f"{database}: not found")
+            continue
+
+        engine = create_engine(uri)
+        res = {} if args.check else migrations.migrate(engine, args.to)
+        res["full_scans"] = migrations.full_scans(engine)
+        engine.dispose()
+        print(f"{database}: {json.dumps(res, indent=2)}")
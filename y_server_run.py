@@ -1,12 +1,19 @@
 import json
 import os
+import signal
 
 
-def start_server(config):
+def start_server(config, workers=None, threads=1, timeout=120):
     """
     Start the app
+
+    :param config: the experiment configuration
+    :param workers: the number of server processes, None to use the Flask development server
+    :param threads: the number of request threads of each server process (multi-worker mode)
+    :param timeout: the seconds given to a worker to complete its requests (and its background work) before being killed
     """
     from y_server import app
+    from y_server.content_analysis import start_sentiment_pool
     import nltk
 
     try:
@@ -16,7 +23,67 @@ def start_server(config):
 
     debug = False
     app.config["perspective_api"] = config["perspective_api"]
-    app.run(debug=debug, port=int(config["port"]), host=config["host"])
+
+    if workers is None:
+        # forked before the server threads start
+        start_sentiment_pool(app.config["sentiment_processes"])
+        app.run(debug=debug, port=int(config["port"]), host=config["host"])
+        return
+
+    __serve(app, config, workers, threads, timeout)
+
+
+def __serve(app, config, workers, threads, timeout):
+    """
+    Serve the app with a pre-fork WSGI server (gunicorn): the app is loaded once in the master
+    process and forked into the workers.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("The multi-worker mode requires gunicorn: pip install gunicorn")
+
+    from y_server import db
+    from y_server.content_analysis import start_sentiment_pool
+    from y_server.utils import serving
+
+    serving.serve_workers(workers)
+    # /shutdown stops the master process, which stops the workers gracefully
+    app.config["server_pid"] = os.getpid()
+    app.config["shutdown_signal"] = signal.SIGTERM
+
+    def post_fork(server, worker):
+        # the connections opened by the master process must not be shared with the workers
+        with app.app_context():
+            db.engine.dispose()
+        # the worker has no request threads yet
+        start_sentiment_pool(app.config["sentiment_processes"])
+        serving.start_worker()
+
+    def worker_exit(server, worker):
+        serving.drain(timeout)
+        serving.stop_worker()
+
+    class YServer(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": f"{config['host']}:{config['port']}",
+                "workers": workers,
+                "threads": threads,
+                "worker_class": "gthread" if threads > 1 else "sync",
+                "preload_app": True,
+                "timeout": timeout,
+                "graceful_timeout": timeout,
+                "post_fork": post_fork,
+                "worker_exit": worker_exit,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    YServer().run()
 
 
 if __name__ == "__main__":
@@ -30,9 +97,29 @@ if __name__ == "__main__":
         default=f"config_files{os.sep}exp_config.json",
         help="JSON file describing the simulation configuration",
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=None,
+        help="number of server processes (requires gunicorn), the Flask development server if not set",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        default=1,
+        help="number of request threads of each server process",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=120,
+        help="seconds given to a worker to finish its requests before being restarted or stopped",
+    )
     args = parser.parse_args()
 
     config_file = args.config_file
     config = json.load(open(config_file, "r"))
 
-    start_server(config)
+    start_server(config, workers=args.workers, threads=args.threads, timeout=args.timeout)